@@ -0,0 +1,125 @@
+"""
+The store parsers as they were before the lxml/SoupStrainer rewrite, kept as
+the reference for benchmarks/parse_bench.py.
+
+Copied from scrapers/scrapers.py at the baseline commit. Only translation is
+stubbed: the baseline translated each name inline with MarianMT, while the
+current parsers leave name_translated empty for the batch translator, so the
+bench compares every field except name_translated.
+"""
+from bs4 import BeautifulSoup
+
+
+def translate_name(name: str) -> str:
+    """Stand-in for the inline MarianMT translation (returns the Dutch name)"""
+    if not name:
+        return None
+    return name
+
+
+def parse_plus(soup: BeautifulSoup):
+    all_items = []
+    main_list = soup.select("div.list.list-group.promotions-category-list")
+    if not main_list:
+        return all_items
+    containers = main_list[0].select("div[data-container].plp-results-wrapper")[1:-3]
+    for container in containers:
+        links = container.select("a[data-link]")
+        hrefs = [link["href"] for link in links]
+        items = container.select("div[data-container].list-item-content-center")
+        for item in items:
+            name_tag = item.select_one('.plp-item-name span')
+            name = name_tag.get_text(strip=True) if name_tag else None
+            translated = translate_name(name)
+            extra_info_tag = item.select_one('.plp-item-complementary .multiline-truncation-text-1 span.OSFillParent')
+            extra_info = extra_info_tag.get_text(strip=True) if extra_info_tag else None
+            promo_tag = item.select_one('.promo-offer-label span')
+            promotion = promo_tag.get_text(strip=True) if promo_tag else None
+            price_int = item.select_one('.product-header-price-integer span')
+            price_dec = item.select_one('.product-header-price-decimals span')
+            discounted = f"{price_int.get_text(strip=True)}{price_dec.get_text(strip=True)}" if price_int and price_dec else None
+            original_price_tag = item.select_one('.product-header-price-previous span')
+            original = original_price_tag.get_text(strip=True) if original_price_tag else None
+            all_items.append({
+                "name": name,
+                "name_translated": translated,
+                "extra_info": extra_info,
+                "promotion": promotion,
+                "discounted_price": discounted,
+                "original_price": original,
+                "href": hrefs[0] if hrefs else None
+            })
+    return all_items
+
+def parse_ah(soup: BeautifulSoup):
+    all_items = []
+    categories = soup.select("section.area-lane_root__If70y")
+    cutoff = next((i for i, c in enumerate(categories) if c.get("id") == "drogisterij"), len(categories))
+    for cat in categories[:cutoff]:
+        for card in cat.select('a[data-testhook="promotion-card"]'):
+            name_tag = card.select_one('[data-testhook="promotion-card-title"] span')
+            name = name_tag.get_text(strip=True) if name_tag else None
+            translated = translate_name(name)
+            extra_info_tag = card.select_one('[data-testhook="card-description"] span')
+            extra_info = extra_info_tag.get_text(strip=True) if extra_info_tag else None
+            promo_tag = card.select_one('[data-testhook="promotion-labels"] div[aria-label]')
+            promotion = promo_tag["aria-label"] if promo_tag else None
+            price_container = card.select_one('[data-testhook="price"]')
+            discounted = price_container.get("data-testpricenow") if price_container else None
+            original = price_container.get("data-testpricewas") if price_container else None
+            href = card.get("href")
+            all_items.append({
+                "name": name,
+                "name_translated": translated,
+                "extra_info": extra_info,
+                "promotion": promotion,
+                "discounted_price": discounted,
+                "original_price": original,
+                "href": href
+            })
+    return all_items
+
+def parse_dm(soup: BeautifulSoup):
+    all_items = []
+    categories = soup.select("section.offers__department")
+    cutoff = next((i for i, c in enumerate(categories) if "Snoep" in c.get_text()), len(categories))
+    for cat in categories[:cutoff]:
+        if "Dranken" in cat.get_text():
+            continue
+        for card in cat.select("div.product__card--content"):
+            name_tag = card.select_one("p.title")
+            name = name_tag.get_text(strip=True) if name_tag else None
+            translated = translate_name(name)
+            if '/' in translated:
+                translated = translated.split('/')[0].strip()
+            extra_info_tag = card.select_one("span.addition")
+            extra_info = extra_info_tag.get_text(strip=True) if extra_info_tag else None
+            promo_tag = card.select_one("span.chip")
+            promotion = promo_tag.get_text(strip=True) if promo_tag else None
+            price_int = card.select_one("div.prices__offer span")
+            price_dec = card.select_one("div.prices__offer small span")
+            discounted = f"{price_int.get_text(strip=True)}{price_dec.get_text(strip=True)}" if price_int and price_dec else None
+            original_price_tag = card.select_one("span.regular.regular-strike")
+            original = original_price_tag.get_text(strip=True) if original_price_tag else None
+            all_items.append({
+                "name": name,
+                "name_translated": translated,
+                "extra_info": extra_info,
+                "promotion": promotion,
+                "discounted_price": discounted,
+                "original_price": original,
+                "href": None
+            })
+    return all_items
+
+
+parsers = {
+    "plus": parse_plus,
+    "ah": parse_ah,
+    "dm": parse_dm,
+}
+
+
+def parse(store: str, html: str):
+    """Baseline path: a full html.parser tree of the whole page"""
+    return parsers[store](BeautifulSoup(html, "html.parser"))
@@ -0,0 +1,116 @@
+"""
+Recipe cleaning benchmark.
+
+Runs `process_recipes` over the raw dataset three ways and reports recipes
+per second:
+
+    before      single process, substring diet classifier (the previous code)
+    compiled    single process, compiled word-boundary classifier
+    pool        compiled classifier, files cleaned across a process pool
+
+Also counts recipes whose diet label changed between the two classifiers,
+with a few examples, so the effect of whole-word matching can be reviewed.
+
+    python -m benchmarks.classify_bench
+    python -m benchmarks.classify_bench --synthetic 50000   # no dataset needed
+"""
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+
+import misc_utils.recipe_processing as recipe_processing
+from misc_utils.recipe_processing import (
+    INPUT_FOLDER, CLEAN_WORKERS, NON_VEG_KEYWORDS, DAIRY_EGG_KEYWORDS, process_recipes,
+)
+
+# Keyword lists as they were before whole-word matching
+LEGACY_NON_VEG = [k for k in NON_VEG_KEYWORDS if k not in ("meatball", "meatloaf", "crabmeat", "shellfish")]
+LEGACY_DAIRY_EGG = [k for k in DAIRY_EGG_KEYWORDS if k != "buttermilk"]
+
+SYNTHETIC_INGREDIENTS = [
+    "2 cups all-purpose flour", "1 teaspoon salt", "3 eggs, beaten", "1 large eggplant, cubed",
+    "1 pound chicken breasts", "1/2 cup buttermilk", "2 tablespoons butter", "1 cup heavy cream",
+    "12 frozen meatballs", "1 (15 ounce) can chickpeas", "1 onion, chopped", "2 cloves garlic",
+    "1 cup shredded Cheddar cheese", "1/4 cup olive oil", "1 pound ground beef", "ADVERTISEMENT",
+    "1 cup milk", "1 tablespoon soy sauce", "2 salmon fillets", "1 cup butternut squash, cubed",
+    "1 cup cooked rice", "1 tablespoon creamed horseradish", "1 pound shrimp, peeled",
+    "1 cup fresh spinach", "1/2 cup plain yogurt", "2 tomatoes, diced", "1 teaspoon cumin",
+]
+
+
+def legacy_classify_diet(ingredients: list[str]) -> str:
+    """The previous classifier: substring search per keyword"""
+    ing_text = " ".join(ingredients).lower()
+    if any(word in ing_text for word in LEGACY_NON_VEG):
+        return "nonveg"
+    elif any(word in ing_text for word in LEGACY_DAIRY_EGG):
+        return "vegetarian"
+    return "vegan"
+
+
+def write_synthetic(folder: str, count: int, seed: int = 0):
+    """Raw dataset files shaped like the Eight Portions dumps, split over ar/epi/fn"""
+    rng = random.Random(seed)
+    per_file = count // 3
+    for source in ("ar", "epi", "fn"):
+        recipes = {}
+        for i in range(per_file):
+            recipes[f"{source}{i}"] = {
+                "title": f"Synthetic {source} recipe {i}",
+                "ingredients": rng.sample(SYNTHETIC_INGREDIENTS, rng.randint(4, 12)),
+                "instructions": "Mix everything together and bake until golden. " * rng.randint(2, 10),
+                "picture_link": None,
+            }
+        with open(os.path.join(folder, f"recipes_raw_nosource_{source}.json"), "w", encoding="utf-8") as f:
+            json.dump(recipes, f)
+
+
+def run(folder: str, workers: int, label: str):
+    start = time.perf_counter()
+    recipes = [(r["title"], r["diet"]) for r in process_recipes(folder, workers=workers)]
+    seconds = time.perf_counter() - start
+    print(f"[{label}] {len(recipes)} recipes in {seconds:.2f}s -> {len(recipes) / seconds:,.0f} recipes/s\n")
+    return recipes, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recipe cleaning and diet classification")
+    parser.add_argument("--input", default=INPUT_FOLDER, help="Folder with the raw dataset files")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many synthetic recipes instead")
+    parser.add_argument("--workers", type=int, default=max(2, CLEAN_WORKERS), help="Processes for the pool run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.input
+        if args.synthetic:
+            folder = tmp
+            write_synthetic(folder, args.synthetic)
+        elif not os.path.isdir(folder):
+            parser.error(f"{folder} not found; download the dataset or pass --synthetic N")
+
+        compiled_classify = recipe_processing.classify_diet
+        recipe_processing.classify_diet = legacy_classify_diet
+        try:
+            before, before_s = run(folder, 1, "before")
+        finally:
+            recipe_processing.classify_diet = compiled_classify
+        compiled, compiled_s = run(folder, 1, "compiled")
+        pooled, pooled_s = run(folder, args.workers, f"pool x{args.workers}")
+
+    if pooled != compiled:
+        raise SystemExit("process pool output differs from the single-process output")
+
+    changed = [(title, old, new) for (title, old), (_, new) in zip(before, compiled) if old != new]
+    print(f"{'path':<12} {'recipes/s':>12} {'speedup':>8}")
+    for label, seconds in (("before", before_s), ("compiled", compiled_s), ("pool", pooled_s)):
+        print(f"{label:<12} {len(compiled) / seconds:>12,.0f} {before_s / seconds:>7.2f}x")
+    print(f"\nDiet label changed for {len(changed)} of {len(compiled)} recipes")
+    for title, old, new in changed[:10]:
+        print(f"  {old:>10} -> {new:<10} {title}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Offer parsing benchmark.
+
+Two kinds of saved pages in benchmarks/fixtures:
+
+    recorded/   real store pages saved with --record. On these the lxml +
+                SoupStrainer path (`parse_html`) must yield the same item
+                dicts as the parsers from before the rewrite
+                (benchmarks/baseline_parsers.py, on a full `html.parser` tree).
+    synthetic/  pages built from the selectors the parsers use. They only show
+                that the code agrees with itself, so they are used for timing,
+                never as evidence of equivalence.
+
+On both, every parsed offer must come back unchanged and in order from the
+offer store (`save_day` then `load_day`). Parse time is reported per page.
+`top_offers` must not give negative savings, also when a scraped "original"
+is below the offer price.
+
+    python -m benchmarks.parse_bench
+    python -m benchmarks.parse_bench --record   # save the live pages to recorded/ (Firefox + network)
+    python -m benchmarks.parse_bench --require-recorded   # fail if a store has no recorded page
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+from scrapers.scrapers import parsers, parse_html, get_html, url_maps, ready_selectors
+from scrapers.offer_store import OfferStore
+from scrapers.pricing import top_offers
+from benchmarks import baseline_parsers
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_KINDS = ["recorded", "synthetic"]
+
+
+def fixture_path(store: str, kind: str = "recorded") -> str:
+    return os.path.join(FIXTURE_DIR, kind, f"{store}.html")
+
+
+def load_fixture(store: str, kind: str = None):
+    """A saved page for a store; without `kind`, the recorded page if there is one, else the synthetic one"""
+    for k in [kind] if kind else FIXTURE_KINDS:
+        path = fixture_path(store, k)
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+    return None
+
+
+def record_fixtures(stores):
+    """Save the current live store pages as recorded fixtures"""
+    os.makedirs(os.path.join(FIXTURE_DIR, "recorded"), exist_ok=True)
+    for store in stores:
+        html = get_html(url_maps[store], ready_selectors.get(store))
+        with open(fixture_path(store), "w", encoding="utf-8") as f:
+            f.write(html)
+        print(f"Recorded {store} -> {fixture_path(store)}")
+
+
+def comparable(items: list[dict]) -> list[dict]:
+    """Items without name_translated, which the batch translator fills in after parsing"""
+    return [{k: v for k, v in item.items() if k != "name_translated"} for item in items]
+
+
+def reference_parse(store: str, html: str):
+    """The parsers from before the rewrite, on a full html.parser tree"""
+    return comparable(baseline_parsers.parse(store, html))
+
+
+def diff_items(actual: list[dict], expected: list[dict]) -> list[str]:
+    """Item-by-item differences between the new and the baseline output, one line per field"""
+    lines = []
+    for i in range(max(len(actual), len(expected))):
+        if i >= len(actual):
+            lines.append(f"item {i}: missing, baseline has {expected[i]}")
+            continue
+        if i >= len(expected):
+            lines.append(f"item {i}: extra, not in baseline: {actual[i]}")
+            continue
+        for field in sorted(set(actual[i]) | set(expected[i])):
+            if actual[i].get(field) != expected[i].get(field):
+                lines.append(f"item {i} {field}: {actual[i].get(field)!r} != baseline {expected[i].get(field)!r}")
+    return lines
+
+
+def roundtrip(store: str, items: list[dict]) -> list[dict]:
+    """Items as read back from a fresh offer store after saving them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        offer_store = OfferStore(os.path.join(tmp, "offers.sqlite3"))
+        offer_store.save_day(store, "2000-01-01", items)
+        loaded = offer_store.load_day(store, "2000-01-01")
+        offer_store._conn.close()
+    return loaded
+
+
+def translated(store: str) -> list[dict]:
+    """Parsed offers of a store's saved page, with the Dutch name standing in for the translation"""
+    html = load_fixture(store)
+    return [{**item, "name_translated": item["name"]} for item in parse_html(store, html)] if html else []
+
+
+def ranking_problems(items: list[dict]) -> list[str]:
+    """Sanity checks on `top_offers` for parsed items plus a scraped 'original' below the offer price"""
+    problems = []
+    bad_original = {"name_translated": "bad original", "discounted_price": "3.00", "original_price": "2.00", "promotion": None}
+    percent_only = {"name_translated": "percent only", "discounted_price": None, "original_price": None, "promotion": "25% korting"}
+    ranked = top_offers([bad_original, percent_only], 2)
+    names = [o["name_translated"] for o in ranked]
+    if names != ["percent only", "bad original"]:
+        problems.append(f"an original below the offer price outranks a real discount: {names}")
+    if ranked and ranked[-1]["savings_eur"] is not None:
+        problems.append(f"an original below the offer price has savings {ranked[-1]['savings_eur']}")
+    negative = [o for o in top_offers(items, len(items)) if (o["savings_eur"] or 0) < 0]
+    if negative:
+        problems.append(f"{len(negative)} parsed offers have negative savings")
+    return problems
+
+
+def time_call(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offer parsing per store")
+    parser.add_argument("--stores", nargs="*", default=list(parsers), help="Stores to benchmark")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per store and path")
+    parser.add_argument("--show", type=int, default=10, help="Differences to print per store on a mismatch")
+    parser.add_argument("--record", action="store_true", help="Record fresh pages with Selenium first")
+    parser.add_argument("--require-recorded", action="store_true", help="Fail when a store has no recorded page")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures(args.stores)
+
+    failed = False
+    unchecked = []
+    print(f"{'store':<6} {'page':<10} {'items':>6} {'baseline':>12} {'lxml+strainer':>14} {'speedup':>8}  equivalence")
+    for store in args.stores:
+        for kind in FIXTURE_KINDS:
+            html = load_fixture(store, kind)
+            if html is None:
+                if kind == "recorded":
+                    unchecked.append(store)
+                continue
+
+            actual = parse_html(store, html)
+            check = "timing only"
+            if kind == "recorded":
+                expected = reference_parse(store, html)
+                differences = diff_items(comparable(actual), expected)
+                if differences:
+                    failed = True
+                    print(f"{store:<6} {kind:<10} MISMATCH: {len(actual)} items vs {len(expected)} in the baseline, "
+                          f"{len(differences)} differences")
+                    for line in differences[:args.show]:
+                        print(f"       {line}")
+                    continue
+                check = "matches baseline"
+
+            stored = roundtrip(store, actual)
+            if stored != actual:
+                failed = True
+                print(f"{store:<6} {kind:<10} OFFER STORE lost items: {len(actual)} parsed, {len(stored)} loaded")
+                continue
+
+            slow = time_call(lambda: reference_parse(store, html), args.repeat)
+            fast = time_call(lambda: parse_html(store, html), args.repeat)
+            print(f"{store:<6} {kind:<10} {len(actual):>6} {slow * 1000:>10.1f}ms {fast * 1000:>12.1f}ms "
+                  f"{slow / fast:>7.1f}x  {check}")
+
+    for problem in ranking_problems([item for store in args.stores for item in translated(store)]):
+        failed = True
+        print(f"RANKING: {problem}")
+
+    if unchecked:
+        print(f"\nNo recorded page for {', '.join(unchecked)}: equivalence with the baseline parsers is NOT checked "
+              f"for these stores. Record them with --record.")
+        failed = failed or args.require_recorded
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
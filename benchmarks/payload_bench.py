@@ -0,0 +1,156 @@
+"""
+Payload benchmark: full recipe payloads vs slim payloads backed by the recipe store.
+
+Builds the same synthetic recipes (realistic title, ingredient and
+instruction lengths) into two Qdrant local-path collections, one with the
+whole recipe as payload (before) and one with only title/diet/source plus
+a RecipeStore (after). Each is then opened in a fresh process, which reports
+size on disk, load time, resident memory and latency of the `$plan` search
+(a batch of per-offer queries with payloads) and of reading the full text
+of the recipes the LLM picks.
+
+    python -m benchmarks.payload_bench --points 50000
+"""
+import os
+import time
+import uuid
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import psutil
+from qdrant_client import QdrantClient, models
+
+from benchmarks.qdrant_bench import clustered_vectors, DIETS
+from misc_utils.recipe_processing import QDRANT_COLLECTION, PAYLOAD_FIELDS, collection_config, slim_payload
+from misc_utils.recipe_store import RecipeStore, RecipeStoreWriter
+
+WORDS = (
+    "add stir heat pan oil onion garlic minutes until golden season salt pepper simmer cover "
+    "remove serve bowl mix flour butter sugar bake oven degrees whisk eggs milk pour tray "
+    "chop slice boil water drain pasta sauce tomato cheese sprinkle fresh herbs lemon juice"
+).split()
+
+
+def synthetic_recipe(idx: int, rng) -> dict:
+    return {
+        "title": f"Recipe {idx} with " + " ".join(rng.choice(WORDS, 3)),
+        "ingredients": [f"{rng.integers(1, 5)} cup " + " ".join(rng.choice(WORDS, 3)) for _ in range(10)],
+        # ~1.2k characters, about the dataset's median
+        "instructions": " ".join(rng.choice(WORDS, 200)) + ".",
+        "diet": DIETS[idx % 3],
+        "source": "synthetic",
+    }
+
+
+def build(points: int, full_path: str, slim_path: str, store_dir: str):
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(points, seed=0)
+    full = QdrantClient(path=full_path)
+    slim = QdrantClient(path=slim_path)
+    for client in (full, slim):
+        client.create_collection(collection_name=QDRANT_COLLECTION, **collection_config())
+    store = RecipeStoreWriter(store_dir)
+    for i in range(0, points, 2000):
+        rows = range(i, min(i + 2000, points))
+        recipes = [synthetic_recipe(idx, rng) for idx in rows]
+        ids = [str(uuid.UUID(int=idx)) for idx in rows]
+        full.upsert(collection_name=QDRANT_COLLECTION, points=[
+            models.PointStruct(id=pid, vector=vectors[idx].tolist(), payload=r) for pid, idx, r in zip(ids, rows, recipes)
+        ])
+        slim.upsert(collection_name=QDRANT_COLLECTION, points=[
+            models.PointStruct(id=pid, vector=vectors[idx].tolist(), payload=slim_payload(r)) for pid, idx, r in zip(ids, rows, recipes)
+        ])
+        for pid, r in zip(ids, recipes):
+            store.add(pid, r)
+    store.close()
+    full.close()
+    slim.close()
+
+
+def dir_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / (1024 * 1024)
+
+
+def rss_mb() -> float:
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def measure(variant: str, path: str, store_dir: str, args) -> dict:
+    """Runs in a fresh process: open one collection and time the $plan reads"""
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    client = QdrantClient(path=path)
+    store = RecipeStore(store_dir) if variant == "slim" else None
+    load_s = time.perf_counter() - start
+    load_rss = rss_mb()
+
+    with_payload = PAYLOAD_FIELDS if variant == "slim" else True
+    queries = clustered_vectors(args.queries * args.batch, seed=1)
+    search, details, sizes = [], [], []
+    for i in range(args.queries):
+        t0 = time.perf_counter()
+        batches = client.search_batch(collection_name=QDRANT_COLLECTION, requests=[
+            models.SearchRequest(vector=q.tolist(), limit=args.k, with_payload=with_payload)
+            for q in queries[i * args.batch:(i + 1) * args.batch]
+        ])
+        search.append(time.perf_counter() - t0)
+        sizes.append(np.mean([len(str(h.payload)) for hits in batches for h in hits]))
+        picked = [h.id for h in batches[0][:args.picks]]
+        t0 = time.perf_counter()
+        if store is not None:
+            recipes = store.get_many(picked)
+        else:
+            recipes = {h.id: h.payload for h in batches[0][:args.picks]}
+        details.append(time.perf_counter() - t0)
+        assert len(recipes) == len(picked)
+    return {
+        "load_s": load_s,
+        "load_rss": load_rss - base_rss,
+        "search_rss": rss_mb() - base_rss,
+        "search_ms": statistics.median(search) * 1000,
+        "details_ms": statistics.median(details) * 1000,
+        "payload_chars": float(np.mean(sizes)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full recipe payloads with slim payloads + the recipe store")
+    parser.add_argument("--points", type=int, default=20000, help="Synthetic recipes")
+    parser.add_argument("--queries", type=int, default=20, help="Timed searches")
+    parser.add_argument("--batch", type=int, default=8, help="Query vectors per search (per-offer retrieval)")
+    parser.add_argument("--k", type=int, default=20, help="Results per query")
+    parser.add_argument("--picks", type=int, default=4, help="Recipes whose full text is read per plan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path, slim_path, store_dir = f"{tmp}/full", f"{tmp}/slim", f"{tmp}/store"
+        print(f"Building {args.points} synthetic recipes with full and slim payloads...")
+        build(args.points, full_path, slim_path, store_dir)
+        sizes = {"full": dir_mb(full_path), "slim": dir_mb(slim_path)}
+        store_mb = dir_mb(store_dir)
+
+        results = {}
+        ctx = multiprocessing.get_context("spawn")
+        for variant, path in (("full", full_path), ("slim", slim_path)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                results[variant] = pool.submit(measure, variant, path, store_dir, args).result()
+
+    print(f"\n{'payload':<8} {'collection':>11} {'store':>8} {'load':>7} {'+RSS load':>10} {'+RSS search':>12} "
+          f"{'search':>10} {'details':>9} {'chars/hit':>10}")
+    for variant, r in results.items():
+        store = f"{store_mb:>6.1f}MB" if variant == "slim" else f"{'-':>8}"
+        print(
+            f"{variant:<8} {sizes[variant]:>9.1f}MB {store} {r['load_s']:>6.2f}s {r['load_rss']:>8.0f}MB "
+            f"{r['search_rss']:>10.0f}MB {r['search_ms']:>8.2f}ms {r['details_ms']:>7.3f}ms {r['payload_chars']:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""
+Offline end-to-end benchmark for the `$plan` command.
+
+Replays the `plan` coroutine from bot.discord_bot against local stand-ins:
+offers parsed from the recorded store pages in benchmarks/fixtures, an
+in-memory Qdrant collection with synthetic vectors, a fake RecipeSelector
+with a configurable delay and a fake pantry sheet. Simulates N concurrent
+users and reports p50/p95/p99 latency per stage plus throughput.
+
+    python -m benchmarks.plan_bench --users 20 --rounds 5
+"""
+import time
+import json
+import random
+import asyncio
+import uuid
+import hashlib
+import argparse
+import tempfile
+import contextvars
+from datetime import datetime, timezone
+from functools import partial
+from types import SimpleNamespace
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+import bot.discord_bot as discord_bot
+import misc_utils.recipe_processing as recipe_processing
+from langchain_core.utils.json import parse_partial_json
+from bot.recipe_selectors import RecipeSelector, RecipeSelection
+from misc_utils.retrieval import get_retrieval_cache
+from misc_utils.plan_cache import get_plan_cache
+from misc_utils.vector_index import RecipeMatrix, export_from_qdrant
+from misc_utils.ingredient_index import IngredientIndex, IngredientIndexWriter
+from misc_utils.recipe_store import RecipeStore, RecipeStoreWriter
+from scrapers.offer_store import get_offer_store
+from scrapers.scrapers import parse_html, scrape_stores
+from benchmarks.parse_bench import load_fixture
+
+VECTOR_SIZE = 768
+STORES = ["plus", "ah", "dm"]
+DIETS = ["vegan", "vegetarian", "nonveg"]
+INGREDIENTS = [
+    "chicken breast", "minced beef", "milk", "cheese", "wholemeal bread", "bananas",
+    "tomatoes", "cucumber", "salmon", "greek yogurt", "eggs", "penne", "basmati rice",
+    "bell pepper", "broccoli", "mushrooms", "potatoes", "spinach", "butter", "apples",
+    "onion", "garlic", "tortilla wraps", "hummus", "tofu", "chickpeas", "pork tenderloin",
+    "shrimp", "mozzarella", "whipping cream",
+]
+STAGES = ["user", "pantry", "offers", "retrieval", "llm", "details", "send", "first", "total"]
+
+# Stage timings of the request running in the current task/thread
+_current = contextvars.ContextVar("plan_bench_timings")
+
+
+def _record(stage: str, seconds: float):
+    timings = _current.get(None)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def timed(stage: str, fn):
+    """Wrap a sync or async callable so its wall time counts towards `stage`"""
+    if asyncio.iscoroutinefunction(fn):
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _record(stage, time.perf_counter() - start)
+    else:
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _record(stage, time.perf_counter() - start)
+    return wrapper
+
+
+# ---------------------
+# Local stand-ins
+# ---------------------
+
+def fake_embed(text: str):
+    """Deterministic unit vector per text, standing in for nomic-embed-text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vec = np.random.default_rng(seed).standard_normal(VECTOR_SIZE).astype(np.float32)
+    return (vec / np.linalg.norm(vec)).tolist()
+
+
+def fake_embed_texts(texts, batch_size=None, delay: float = 0.0):
+    time.sleep(delay)
+    return [fake_embed(text) for text in texts]
+
+
+async def fake_embed_texts_async(texts, batch_size=None, delay: float = 0.0):
+    await asyncio.sleep(delay)
+    return [fake_embed(text) for text in texts]
+
+
+def build_offer_cache(out_dir: str):
+    """Parse the recorded store pages into today's stored offers"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    for store in STORES:
+        html = load_fixture(store)
+        if html is None:
+            continue
+        items = parse_html(store, html)
+        # Skip the translation model: the Dutch name stands in for the translation
+        for item in items:
+            item["name_translated"] = item["name"]
+        get_offer_store(out_dir).save_day(store, today, items)
+
+
+def build_qdrant(num_recipes: int, store_dir: str, seed: int = 0) -> QdrantClient:
+    """In-memory collection of synthetic recipes with random unit vectors, full recipes in a RecipeStore"""
+    rng = np.random.default_rng(seed)
+    store = RecipeStoreWriter(store_dir)
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        collection_name=recipe_processing.QDRANT_COLLECTION,
+        vectors_config=models.VectorParams(size=VECTOR_SIZE, distance=models.Distance.COSINE),
+    )
+    batch = 1000
+    for start in range(0, num_recipes, batch):
+        count = min(batch, num_recipes - start)
+        vectors = rng.standard_normal((count, VECTOR_SIZE)).astype(np.float32)
+        points = []
+        for i, vec in enumerate(vectors):
+            idx = start + i
+            ingredients = list(rng.choice(INGREDIENTS, size=6, replace=False))
+            recipe = {
+                "title": f"Synthetic recipe {idx}",
+                "ingredients": ingredients,
+                "instructions": "Combine everything and cook until done. " * 8,
+                "diet": DIETS[idx % len(DIETS)],
+                "source": "synthetic",
+            }
+            point_id = str(uuid.UUID(int=idx))
+            store.add(point_id, recipe)
+            points.append(models.PointStruct(
+                id=point_id,
+                vector=vec.tolist(),
+                payload=recipe_processing.slim_payload(recipe),
+            ))
+        client.upsert(collection_name=recipe_processing.QDRANT_COLLECTION, points=points)
+    store.close()
+    return client
+
+
+def build_ingredient_index(client: QdrantClient, store: RecipeStore, directory: str):
+    """Ingredient index over the synthetic collection"""
+    writer = IngredientIndexWriter(directory)
+    offset = None
+    while True:
+        points, offset = client.scroll(recipe_processing.QDRANT_COLLECTION, limit=2000, offset=offset, with_payload=True)
+        for p in points:
+            writer.add(str(p.id), store.get(p.id)["ingredients"], p.payload["diet"])
+        if offset is None:
+            break
+    writer.close()
+
+
+class FakeStreamer:
+    """
+    JSON-mode stand-in: streams the answer text in small chunks, parsed the way
+    LangChain's JSON parser does. Keys come in alphabetical order (custom and
+    instructions before lunch), which Gemini may do since no order is pinned.
+    """
+
+    def __init__(self, delay: float, chunk: int = 16):
+        self.delay = delay
+        self.chunk = chunk
+
+    async def astream(self, recipes: str):
+        titles = [line[len("Title: "):] for line in recipes.splitlines() if line.startswith("Title: ")][:4]
+        text = json.dumps({"breakfast": titles[:2], "custom": False, "instructions": None, "lunch": titles[2:4]})
+        steps = range(self.chunk, len(text) + self.chunk, self.chunk)
+        for end in steps:
+            await asyncio.sleep(self.delay / len(steps))
+            partial = parse_partial_json(text[:end])
+            if partial is not None:
+                yield partial
+
+
+class FakeRecipeSelector(RecipeSelector):
+    """Stands in for the Gemini/DeepSeek selector with a fixed delay; streaming runs the real parsing"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.model_name = "fake"
+        self.recipe_prompt = SimpleNamespace(invoke=lambda values: values["recipes"])
+        self.recipe_streamer = FakeStreamer(delay)
+
+    def select_recipes(self, recipes: str, preferences: str) -> RecipeSelection:
+        time.sleep(self.delay)
+        titles = [line[len("Title: "):] for line in recipes.splitlines() if line.startswith("Title: ")]
+        return RecipeSelection(breakfast=titles[:2], lunch=titles[2:4], instructions=None, custom=False)
+
+    async def astream_recipes(self, recipes: str, preferences: str):
+        """The real streaming path, checking that an option is never changed once it was yielded"""
+        start = time.perf_counter()
+        shown = ([], [])
+        async for selection in super().astream_recipes(recipes, preferences):
+            for before, now in zip(shown, (selection.breakfast, selection.lunch)):
+                if now[:len(before)] != before:
+                    raise AssertionError(f"streamed option changed after it was shown: {before} -> {now}")
+            shown = (selection.breakfast, selection.lunch)
+            yield selection
+        _record("llm", time.perf_counter() - start)
+
+
+class FakeMessage:
+    """A sent message whose timed edit() also records time to the first meal option shown"""
+
+    def __init__(self, ctx, content):
+        self.ctx = ctx
+        self.content = content
+
+    async def edit(self, content):
+        start = time.perf_counter()
+        await asyncio.sleep(self.ctx.send_delay)
+        self.content = content
+        _record("send", time.perf_counter() - start)
+        timings = _current.get(None)
+        if timings is not None and "first" not in timings and "\n- " in content:
+            timings["first"] = time.perf_counter() - self.ctx.started
+
+
+class FakeCtx:
+    """Minimal commands.Context: an author id and a timed send()"""
+
+    def __init__(self, user_id: int, send_delay: float):
+        self.author = SimpleNamespace(id=user_id)
+        self.send_delay = send_delay
+        self.messages = []
+        self.started = time.perf_counter()
+
+    async def send(self, content):
+        start = time.perf_counter()
+        await asyncio.sleep(self.send_delay)
+        message = FakeMessage(self, content)
+        self.messages.append(message)
+        _record("send", time.perf_counter() - start)
+        return message
+
+
+def make_users(count: int, synced: bool = True, seed: int = 0):
+    rng = random.Random(seed)
+    users = {}
+    for user_id in range(count):
+        stores = rng.sample(STORES, rng.randint(1, len(STORES)))
+        users[str(user_id)] = {
+            "user_id": str(user_id),
+            "sheet_url": f"https://docs.google.com/spreadsheets/d/fake{user_id}/edit",
+            "preferences": {"diet": rng.choice(DIETS), "likes": "spicy"},
+            "grocery_stores": stores,
+        }
+        if synced:
+            users[str(user_id)]["last_synced"] = datetime.now(timezone.utc)
+    return users
+
+
+def install_stand_ins(args, out_dir: str, users: dict):
+    async def get_user(user_id):
+        await asyncio.sleep(args.mongo_delay)
+        return users.get(user_id)
+
+    async def get_inventory_for_user(user_id):
+        await asyncio.sleep(args.mongo_delay)
+        return [{"user_id": user_id, "item": item, "quantity": 1} for item in INGREDIENTS[:8]]
+
+    async def read_sheet_to_string(sheet_url):
+        await asyncio.sleep(args.sheet_delay)
+        return "\n".join(f"- {item}" for item in INGREDIENTS[:8])
+
+    recipe_processing.embed_texts = partial(fake_embed_texts, delay=args.embed_delay)
+    recipe_processing.embed_texts_async = partial(fake_embed_texts_async, delay=args.embed_delay)
+    # Keep synthetic query vectors out of the real on-disk embedding cache
+    recipe_processing.query_cache = lambda: None
+    store_dir = f"{out_dir}/recipe_store"
+    recipe_processing.qclient = build_qdrant(args.recipes, store_dir)
+    store = RecipeStore(store_dir)
+    recipe_processing.get_recipe_store = lambda: store
+    # The ingredient index serves the lexical pass and coverage re-ranking
+    index_dir = f"{out_dir}/ingredient_index"
+    build_ingredient_index(recipe_processing.qclient, store, index_dir)
+    index = IngredientIndex(index_dir)
+    recipe_processing.get_ingredient_index = lambda: index
+    recipe_processing.RECIPE_SEARCH_MODE = args.mode
+    if args.no_coverage:
+        recipe_processing.COVERAGE_WEIGHT = 0.0
+    if args.backend == "numpy":
+        matrix_dir = f"{out_dir}/recipe_matrix"
+        export_from_qdrant(recipe_processing.qclient, recipe_processing.QDRANT_COLLECTION, matrix_dir)
+        matrix = RecipeMatrix(matrix_dir)
+        recipe_processing.RECIPE_SEARCH_BACKEND = "numpy"
+        recipe_processing.get_recipe_matrix = lambda: matrix
+
+    discord_bot.get_user = timed("user", get_user)
+    discord_bot.read_sheet_to_string = timed("pantry", read_sheet_to_string)
+    discord_bot.get_inventory_for_user = timed("pantry", get_inventory_for_user)
+    discord_bot.scrape_stores = timed("offers", partial(scrape_stores, out_dir=out_dir, scrape_on_miss=False))
+    discord_bot.search_recipes_async = timed("retrieval", recipe_processing.search_recipes_async)
+    discord_bot.recipe_details_async = timed("details", recipe_processing.recipe_details_async)
+    discord_bot.rs = FakeRecipeSelector(args.llm_delay)
+    discord_bot.rs.select_recipes = timed("llm", discord_bot.rs.select_recipes)
+    discord_bot.PLAN_EDIT_INTERVAL = args.edit_interval
+
+
+# ---------------------
+# Load generation
+# ---------------------
+
+async def run_request(user_id: int, args):
+    timings = {}
+    _current.set(timings)
+    ctx = FakeCtx(user_id, args.send_delay)
+    start = time.perf_counter()
+    await discord_bot.plan.callback(ctx)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+async def run_user(user_id: int, args):
+    results = []
+    for _ in range(args.rounds):
+        # Each request runs in its own task so it gets its own timing context;
+        # duplicates are sent at the same time, like a user repeating the command
+        results.extend(await asyncio.gather(*(
+            asyncio.create_task(run_request(user_id, args)) for _ in range(args.duplicates)
+        )))
+    return results
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def report(results, wall: float):
+    print(f"\n{len(results)} requests in {wall:.2f}s -> {len(results) / wall:.2f} plans/s\n")
+    print(f"{'stage':<10} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for stage in STAGES:
+        values = [r[stage] for r in results if stage in r]
+        if not values:
+            continue
+        print(
+            f"{stage:<10} "
+            f"{percentile(values, 50) * 1000:>7.1f}ms "
+            f"{percentile(values, 95) * 1000:>7.1f}ms "
+            f"{percentile(values, 99) * 1000:>7.1f}ms"
+        )
+
+
+async def run(args):
+    users = make_users(args.users, synced=not args.never_synced)
+    if args.no_retrieval_cache:
+        get_retrieval_cache().put = lambda key, results: None
+    if args.no_plan_cache:
+        get_plan_cache().put = lambda *a, **kw: None
+    with tempfile.TemporaryDirectory() as out_dir:
+        build_offer_cache(out_dir)
+        install_stand_ins(args, out_dir, users)
+
+        start = time.perf_counter()
+        per_user = await asyncio.gather(*(run_user(int(uid), args) for uid in users))
+        wall = time.perf_counter() - start
+
+    report([r for user_results in per_user for r in user_results], wall)
+    stats = get_retrieval_cache().stats()
+    print(f"\nretrieval cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+          f"{stats['entries']} entries, {stats['bytes'] / 1024:.0f} KiB")
+    stats = get_plan_cache().stats()
+    print(f"plan cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%}), "
+          f"{stats['coalesced']} coalesced, {stats['entries']} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the $plan pipeline")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated users")
+    parser.add_argument("--rounds", type=int, default=3, help="Sequential $plan requests per user")
+    parser.add_argument("--duplicates", type=int, default=1, help="Identical $plan requests a user sends at once each round")
+    parser.add_argument("--recipes", type=int, default=20000, help="Synthetic recipes in the Qdrant collection")
+    parser.add_argument("--llm-delay", type=float, default=2.0, help="Seconds the fake RecipeSelector takes")
+    parser.add_argument("--sheet-delay", type=float, default=0.5, help="Seconds the fake sheet read takes")
+    parser.add_argument("--embed-delay", type=float, default=0.05, help="Seconds a fake Ollama embed request takes")
+    parser.add_argument("--mongo-delay", type=float, default=0.005, help="Seconds a user lookup takes")
+    parser.add_argument("--edit-interval", type=float, default=1.0, help="Seconds between edits of the streamed plan message")
+    parser.add_argument("--send-delay", type=float, default=0.05, help="Seconds each Discord send takes")
+    parser.add_argument("--never-synced", action="store_true", help="Users have no watchdog sync, so every plan reads the sheet")
+    parser.add_argument("--backend", choices=["qdrant", "numpy"], default="qdrant", help="Vector search backend")
+    parser.add_argument("--mode", choices=["dense", "hybrid", "lexical"], default="dense", help="Retrieval mode")
+    parser.add_argument("--no-coverage", action="store_true", help="Skip pantry/offer coverage re-ranking")
+    parser.add_argument("--no-retrieval-cache", action="store_true", help="Run every search (cache disabled)")
+    parser.add_argument("--no-plan-cache", action="store_true", help="Build every plan (concurrent duplicates are still coalesced)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
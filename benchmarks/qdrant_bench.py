@@ -0,0 +1,164 @@
+"""
+Qdrant collection tuning benchmark.
+
+Builds the recipe collection once per configuration (defaults, payload
+indexes, int8 quantization with rescoring, on-disk originals, a denser HNSW
+graph) from the same synthetic clustered vectors, then reports build time,
+recall@k against exact search, search latency with and without the diet
+filter, and resident memory.
+
+Each configuration runs in its own process, so in local mode the RSS column
+is the peak memory of that build + search. Against a server (`--url`) the
+RSS column is the server's memory, read from `--server-pid` when given.
+
+Local mode (the default) is the embedded Python implementation: it searches
+exactly and ignores HNSW, quantization and payload indexes, so recall is
+always 1.0 there. Point `--url` at a Qdrant server (e.g. the docker image)
+to compare the configurations for real.
+
+    python -m benchmarks.qdrant_bench --points 20000
+    python -m benchmarks.qdrant_bench --url http://localhost:6333 --server-pid 1234
+"""
+import time
+import argparse
+import tempfile
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from misc_utils.recipe_processing import collection_config, create_payload_indexes, search_params, peak_rss_mb
+from misc_utils.embeddings import EMBED_DIM
+
+DIETS = ["vegan", "vegetarian", "nonveg"]
+SOURCES = ["allrecipes", "epicurious", "foodnetwork"]
+
+CONFIGS = {
+    "default": {},
+    "payload-index": {"payload_indexes": True},
+    "int8": {"payload_indexes": True, "quantize": True},
+    "int8+on-disk": {"payload_indexes": True, "quantize": True, "on_disk": True},
+    "m32-ef200": {"payload_indexes": True, "hnsw_m": 32, "ef_construct": 200},
+}
+
+
+def clustered_vectors(count: int, seed: int, clusters: int = 64):
+    """Unit vectors around random centres, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, EMBED_DIM)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, EMBED_DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def server_rss_mb(pid: int):
+    if not pid:
+        return None
+    import psutil
+    return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+
+
+def diet_filter(diet: str):
+    return models.Filter(must=[models.FieldCondition(key="diet", match=models.MatchValue(value=diet))])
+
+
+def run_config(name: str, options: dict, args) -> dict:
+    """Build one collection, measure it, and drop it again"""
+    collection = f"bench_{name.replace('+', '_').replace('-', '_')}"
+    tmp = None
+    if args.url:
+        client = QdrantClient(url=args.url, api_key=args.api_key, timeout=300)
+        client.delete_collection(collection)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        client = QdrantClient(path=tmp.name)
+
+    start = time.perf_counter()
+    client.create_collection(
+        collection_name=collection,
+        **collection_config(
+            options.get("hnsw_m"), options.get("ef_construct"), options.get("quantize", False), options.get("on_disk", False)
+        ),
+    )
+    if options.get("payload_indexes"):
+        create_payload_indexes(client, collection)
+    vectors = clustered_vectors(args.points, seed=0)
+    for i in range(0, args.points, 1000):
+        client.upsert(
+            collection_name=collection,
+            points=[
+                models.PointStruct(
+                    id=idx,
+                    vector=vectors[idx].tolist(),
+                    payload={"title": f"Recipe {idx}", "diet": DIETS[idx % 3], "source": SOURCES[idx % 7 % 3]},
+                )
+                for idx in range(i, min(i + 1000, args.points))
+            ],
+            wait=True,
+        )
+    # Wait for the server to finish building the HNSW graph before timing searches
+    while args.url and client.get_collection(collection).status != models.CollectionStatus.GREEN:
+        time.sleep(0.5)
+    build_s = time.perf_counter() - start
+
+    queries = clustered_vectors(args.queries, seed=1)
+    params = search_params()
+    exact = models.SearchParams(exact=True)
+    recalls, latencies, filtered_latencies = [], [], []
+    for i, query in enumerate(queries):
+        qfilter = diet_filter(DIETS[i % 3])
+        for use_filter, timings in ((False, latencies), (True, filtered_latencies)):
+            kwargs = {"collection_name": collection, "query_vector": query, "limit": args.k,
+                      "query_filter": qfilter if use_filter else None}
+            t0 = time.perf_counter()
+            hits = client.search(search_params=params, **kwargs)
+            timings.append(time.perf_counter() - t0)
+            truth = client.search(search_params=exact, **kwargs)
+            truth_ids = {h.id for h in truth}
+            if truth_ids:
+                recalls.append(len(truth_ids & {h.id for h in hits}) / len(truth_ids))
+
+    rss = server_rss_mb(args.server_pid) if args.url else peak_rss_mb()
+    if args.url:
+        client.delete_collection(collection)
+    client.close()
+    if tmp:
+        tmp.cleanup()
+    return {
+        "build_s": build_s,
+        "recall": statistics.mean(recalls),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": np.percentile(latencies, 95) * 1000,
+        "filtered_p50_ms": statistics.median(filtered_latencies) * 1000,
+        "rss_mb": rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Qdrant collection tuning options")
+    parser.add_argument("--points", type=int, default=20000, help="Synthetic recipes per collection")
+    parser.add_argument("--queries", type=int, default=200, help="Search queries per configuration")
+    parser.add_argument("--k", type=int, default=10, help="Results per query (recall@k)")
+    parser.add_argument("--configs", nargs="*", default=list(CONFIGS), help="Configurations to run")
+    parser.add_argument("--url", type=str, help="Qdrant server URL (default: local mode in a temp dir)")
+    parser.add_argument("--api-key", type=str, help="Qdrant API key")
+    parser.add_argument("--server-pid", type=int, help="PID of the Qdrant server, for its RSS")
+    args = parser.parse_args()
+
+    if not args.url:
+        print("Local mode searches exactly and ignores HNSW/quantization/indexes; use --url for a server.\n")
+
+    print(f"{'config':<14} {'build':>8} {f'recall@{args.k}':>10} {'p50':>8} {'p95':>8} {'diet p50':>9} {'RSS':>8}")
+    for name in args.configs:
+        # A fresh process per configuration keeps peak RSS comparable
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            r = pool.submit(run_config, name, CONFIGS[name], args).result()
+        rss = f"{r['rss_mb']:.0f}MB" if r["rss_mb"] is not None else "n/a"
+        print(
+            f"{name:<14} {r['build_s']:>7.1f}s {r['recall']:>10.3f} {r['p50_ms']:>6.2f}ms "
+            f"{r['p95_ms']:>6.2f}ms {r['filtered_p50_ms']:>7.2f}ms {rss:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Vector search backend benchmark: Qdrant local mode vs the NumPy recipe matrix.
+
+Builds the same synthetic recipes into a Qdrant local-path collection and a
+RecipeMatrix, then opens each in a fresh process and reports load time,
+resident memory after load, and search latency for single queries and for
+batches of per-offer queries, with and without the diet filter. Also checks
+that both backends return the same top-k (both search exactly).
+
+    python -m benchmarks.vector_bench --points 125000
+"""
+import time
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import psutil
+from qdrant_client import QdrantClient, models
+
+from benchmarks.qdrant_bench import clustered_vectors, diet_filter, DIETS
+from misc_utils.recipe_processing import QDRANT_COLLECTION, collection_config
+from misc_utils.vector_index import RecipeMatrix, RecipeMatrixWriter
+
+
+def payload(idx: int) -> dict:
+    return {
+        "title": f"Recipe {idx}",
+        "ingredients": ["1 onion", "2 cloves garlic", "1 cup rice", "salt"],
+        "instructions": "Cook everything together until done. " * 10,
+        "diet": DIETS[idx % 3],
+        "source": "synthetic",
+    }
+
+
+def build(points: int, qdrant_path: str, matrix_dir: str):
+    vectors = clustered_vectors(points, seed=0)
+    client = QdrantClient(path=qdrant_path)
+    client.create_collection(collection_name=QDRANT_COLLECTION, **collection_config())
+    writer = RecipeMatrixWriter(matrix_dir)
+    for i in range(0, points, 2000):
+        rows = range(i, min(i + 2000, points))
+        client.upsert(
+            collection_name=QDRANT_COLLECTION,
+            points=[models.PointStruct(id=idx, vector=vectors[idx].tolist(), payload=payload(idx)) for idx in rows],
+        )
+        writer.add(vectors[i:i + len(rows)], [payload(idx) for idx in rows])
+    writer.close()
+    client.close()
+
+
+def rss_mb() -> float:
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def measure(backend: str, location: str, args) -> dict:
+    """Runs in a fresh process: open one backend and time searches"""
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    if backend == "qdrant":
+        client = QdrantClient(path=location)
+
+        def search(queries, diet):
+            requests = [
+                models.SearchRequest(vector=q.tolist(), filter=diet_filter(diet) if diet else None,
+                                     limit=args.k, with_payload=True)
+                for q in queries
+            ]
+            return [[h.id for h in hits] for hits in client.search_batch(collection_name=QDRANT_COLLECTION, requests=requests)]
+    else:
+        matrix = RecipeMatrix(location)
+
+        def search(queries, diet):
+            return [[h.id for h in hits] for hits in matrix.search_batch(queries, diet=diet, limit=args.k)]
+    load_s = time.perf_counter() - start
+    load_rss = rss_mb()
+
+    queries = clustered_vectors(args.queries * args.batch, seed=1)
+    timings = {}
+    results = []
+    for label, size, diet in (("single", 1, None), ("single+diet", 1, "vegan"),
+                              (f"batch{args.batch}", args.batch, None), (f"batch{args.batch}+diet", args.batch, "vegan")):
+        latencies = []
+        for i in range(args.queries):
+            batch = queries[i * size:(i + 1) * size]
+            t0 = time.perf_counter()
+            ids = search(batch, diet)
+            latencies.append(time.perf_counter() - t0)
+            if label == "single":
+                results.append(ids[0])
+        timings[label] = statistics.median(latencies) * 1000
+    return {"load_s": load_s, "base_rss": base_rss, "load_rss": load_rss, "search_rss": rss_mb(), "timings": timings, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Qdrant local mode with the NumPy recipe matrix")
+    parser.add_argument("--points", type=int, default=50000, help="Synthetic recipes")
+    parser.add_argument("--queries", type=int, default=30, help="Timed searches per case")
+    parser.add_argument("--batch", type=int, default=8, help="Queries per batched search (per-offer retrieval)")
+    parser.add_argument("--k", type=int, default=20, help="Results per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        qdrant_path, matrix_dir = f"{tmp}/qdrant", f"{tmp}/matrix"
+        print(f"Building {args.points} synthetic recipes into both backends...")
+        build(args.points, qdrant_path, matrix_dir)
+
+        results = {}
+        # A spawned process per backend so load time and RSS start from scratch
+        ctx = multiprocessing.get_context("spawn")
+        for backend, location in (("qdrant", qdrant_path), ("numpy", matrix_dir)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                results[backend] = pool.submit(measure, backend, location, args).result()
+
+    cases = list(results["qdrant"]["timings"])
+    # RSS columns are on top of the interpreter + imports (same for both backends);
+    # for numpy, "search" includes the memory-mapped matrix pages read from the page cache
+    print(f"\n{'backend':<8} {'load':>7} {'+RSS load':>10} {'+RSS search':>12} " + " ".join(f"{c:>14}" for c in cases))
+    for backend, r in results.items():
+        print(
+            f"{backend:<8} {r['load_s']:>6.2f}s {r['load_rss'] - r['base_rss']:>8.0f}MB {r['search_rss'] - r['base_rss']:>10.0f}MB "
+            + " ".join(f"{r['timings'][c]:>12.2f}ms" for c in cases)
+        )
+    same = np.mean([len(set(a) & set(b)) / max(1, len(a)) for a, b in zip(results["qdrant"]["results"], results["numpy"]["results"])])
+    print(f"\nTop-{args.k} overlap between backends: {same:.3f}")
+
+
+if __name__ == "__main__":
+    main()
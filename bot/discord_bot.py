@@ -1,30 +1,126 @@
 import discord
 from discord.ext import commands
+from pydantic import ValidationError
+from langchain_core.exceptions import OutputParserException
 
 from dotenv import load_dotenv
-from ollama import AsyncClient
 
 import os
+import time
 import asyncio
-from db.async_utils import get_user, save_user
-from misc_utils.google_utils import read_sheet_to_string
-from misc_utils.recipe_processing import search_recipes_qdrant
-from scrapers import scrape_store, maps
+from datetime import datetime, timezone
+from db.async_utils import get_user, save_user, get_inventory_for_user, add_user_change_hook
+from misc_utils.google_utils import read_sheet_to_string, inventory_to_string
+from misc_utils.recipe_processing import init_async_search, search_recipes_async, recipe_details_async
+from misc_utils.retrieval import get_retrieval_cache
+from misc_utils.plan_cache import get_plan_cache
+from scrapers import scrape_stores, maps
+from scrapers.pricing import top_offers, TOP_OFFERS
 from bot.recipe_selectors import RecipeSelector
 
 # Load environment variables
 load_dotenv()
 TOKEN = os.getenv("DISCORD_TOKEN")
+# Seconds a watchdog sync of the pantry sheet is trusted before $plan reads the sheet itself;
+# several times the watchdog's WATCHDOG_INTERVAL (900), so one missed pass does not matter
+PANTRY_MAX_AGE = float(os.getenv("PANTRY_MAX_AGE", "3600"))
+# Minimum seconds between edits of the streamed meal plan message (Discord rate-limits edits)
+PLAN_EDIT_INTERVAL = float(os.getenv("PLAN_EDIT_INTERVAL", "1.0"))
 
 # Discord bot with prefix
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix='$', intents=intents)
-rs=RecipeSelector(model_name='gemini')
+# Created in on_ready so importing this module does not build an LLM client
+rs=None
+# A new sheet, diet or store list makes the user's cached plan stale
+add_user_change_hook(get_plan_cache().invalidate)
 
 def split_message(msg: str, limit: int = 2000):
     return [msg[i:i+limit] for i in range(0, len(msg), limit)]
 
+def pantry_item_names(pantry_text: str):
+    """Item names from the pantry bullet list ("- Milk (2)" -> "Milk"); status lines are skipped"""
+    names = []
+    for line in pantry_text.splitlines():
+        line = line.strip()
+        # read_sheet_to_string reports problems as "- <sentence>."
+        if not line.startswith("- ") or line.endswith("."):
+            continue
+        names.append(line[2:].split(" (")[0].strip())
+    return names
+
+async def synced_pantry(user_id: str, user_entry: dict):
+    """Pantry bullet list from the inventory watchdog mirrors, or None if the user was never synced or the sync is stale"""
+    last_synced = user_entry.get("last_synced")
+    if not last_synced:
+        return None
+    if last_synced.tzinfo is None:
+        # Mongo returns naive UTC datetimes
+        last_synced = last_synced.replace(tzinfo=timezone.utc)
+    if (datetime.now(timezone.utc) - last_synced).total_seconds() > PANTRY_MAX_AGE:
+        return None
+    try:
+        records = await get_inventory_for_user(user_id)
+    except Exception as e:
+        print(f"[plan] error reading inventory for user {user_id}: {e}")
+        return None
+    return inventory_to_string(records) if records else None
+
+class ThrottledEdit:
+    """Keeps one Discord message showing the latest content, editing it at most once per `interval` seconds"""
+
+    def __init__(self, message, interval: float = None):
+        self.message = message
+        self.interval = PLAN_EDIT_INTERVAL if interval is None else interval
+        self._last = 0.0
+        self._pending = None
+        self._shown = None
+        self._timer = None
+        # One edit at a time, so an older text can never land after a newer one
+        self._editing = asyncio.Lock()
+
+    async def update(self, content: str):
+        self._pending = content[:2000]
+        wait = self._last + self.interval - time.monotonic()
+        if wait <= 0:
+            await self.flush()
+        elif self._timer is None:
+            # Content that arrives too soon is shown when the interval is up
+            self._timer = asyncio.create_task(self._flush_later(wait))
+
+    async def _flush_later(self, wait: float):
+        await asyncio.sleep(wait)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        async with self._editing:
+            if self._pending is None or self._pending == self._shown:
+                return
+            content, self._pending = self._pending, None
+            self._last = time.monotonic()
+            try:
+                await self.message.edit(content=content)
+                self._shown = content
+            except discord.HTTPException as e:
+                print(f"[plan] could not edit message: {e}")
+
+    async def close(self):
+        """Show the final content now, after any edit that is still in flight"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+def selection_preview(selection, done: bool = False) -> str:
+    lines = ["Meal plan ready:" if done else "Picking your meals..."]
+    lines.append("**Breakfast options:**")
+    lines.extend(f"- {b}" for b in selection.breakfast)
+    lines.append("**Lunch/Dinner options:**")
+    lines.extend(f"- {l}" for l in selection.lunch)
+    return "\n".join(lines)
+
 def match_recipes(selected_titles, recipes):
     """Match model-selected titles with retrieved recipe objects"""
     matched = []
@@ -98,6 +194,16 @@ async def handle_registration(user):
 
 @bot.event
 async def on_ready():
+    global rs
+    if rs is None:
+        rs=RecipeSelector(model_name='gemini')
+        # Search clients live on this event loop
+        init_async_search(
+            path=os.getenv("QDRANT_PATH"),
+            url=os.getenv("QDRANT_URL"),
+            api_key=os.getenv("QDRANT_API_KEY"),
+            ollama_host=os.getenv("OLLAMA_HOST"),
+        )
     print(f'Logged in as {bot.user}')
 
 @bot.command(name='register')
@@ -153,7 +259,8 @@ async def stores(ctx):
 
 @bot.command(name="plan")
 async def plan(ctx):
-    await ctx.send("Generating your meal plan...")
+    # Edited in place while the LLM streams its selection
+    status = await ctx.send("Generating your meal plan...")
     
     # 1. Get user sheet if it exists
     print("Checking inventory")
@@ -166,9 +273,12 @@ async def plan(ctx):
         )
         return
     
-    # Pantry
+    # Pantry: the synced inventory if it is recent, otherwise the live sheet
     sheet_url = user_entry.get("sheet_url")
-    if sheet_url:
+    pantry_text = await synced_pantry(str(ctx.author.id), user_entry) if sheet_url else None
+    if pantry_text is not None:
+        print("Pantry from synced inventory")
+    elif sheet_url:
         try:
             pantry_text = await read_sheet_to_string(sheet_url)
         except Exception as e:
@@ -187,54 +297,96 @@ async def plan(ctx):
         grocery_stores= list(maps.values())
     
     
-    # 2. Fetch discounts (offloaded to threads)
+    # 2. Fetch discounts (all stores at once, shared with concurrent plans)
     store_dict = {store: {} for store in grocery_stores}
-    all_translated_names = []
+    all_items = []
     print("Checking discounts")
 
-    for store in grocery_stores:
-        try:
-            out_file, items = await asyncio.to_thread(scrape_store, store)
-            
-            if not items:
-                print(f"No discounts found for {store}")
-                continue
-            
-            store_dict[store] = items
-            all_translated_names.extend(
-                item["name_translated"] for item in items if item.get("name_translated")
-            )
-            print(f"{store}: {len(items)} items scraped")
+    offer_results = await scrape_stores(grocery_stores, with_dates=True)
+    for store, (offer_date, items) in offer_results.items():
+        if not items:
+            print(f"No discounts found for {store}")
+            continue
+
+        store_dict[store] = items
+        all_items.extend({**item, "store": store, "offer_date": offer_date} for item in items)
+        print(f"{store}: {len(items)} items scraped")
+
+    # 3-4. Retrieval and the LLM run once per distinct set of inputs;
+    # repeated and concurrent requests with the same inputs share the result
+    offer_dates = {store: offer_date for store, (offer_date, _) in offer_results.items()}
+    cache = get_plan_cache()
+    fingerprint = cache.fingerprint(preferences, grocery_stores, offer_dates, pantry_text)
+    result, built = await cache.run(
+        str(ctx.author.id),
+        fingerprint,
+        lambda: build_plan(status, all_items, diet, preferences_str, pantry_text),
+        sheet_hash=user_entry.get("last_hash"),
+    )
+    if result is None:
+        await ctx.send("No suitable recipes found right now.")
+        return
+    if not built:
+        print("Meal plan from plan cache")
+        await ThrottledEdit(status).update(result["preview"])
 
-        except Exception as e:
-            print(f"Error fetching {store}: {e}")
+    for chunk in result["messages"]:
+        await ctx.send(chunk)
+
+
+async def build_plan(status, all_items, diet, preferences_str, pantry_text):
+    """
+    Retrieve recipes for the offers and let the LLM pick the meal plan.
+
+    Returns:
+        Optional[Dict]: The final "preview" of the streamed status message and the
+        "messages" to send, or None if no recipes were found.
+    """
+    # Only the offers with the biggest savings go into retrieval
+    best_offers = top_offers(all_items, TOP_OFFERS)
+    all_translated_names = [item["name_translated"] for item in best_offers]
+    # Offer vectors are cached per (store, date) and shared across users
+    offer_keys = [(item["store"], item["offer_date"]) for item in best_offers]
+    print(f"Using top {len(best_offers)} of {len(all_items)} offers by savings")
         
     
-    # 3. Search recipes in Qdrant (offloaded too)
+    # 3. Search recipes in Qdrant, one query per offer (embedding and search are awaited)
     print("Searching recipes in Qdrant")
-    recipes = await asyncio.to_thread(
-        search_recipes_qdrant,
+    recipes = await search_recipes_async(
         all_translated_names,
         10,
         diet,
-        os.getenv("QDRANT_PATH"),
+        offer_keys=offer_keys,
+        pantry_items=pantry_item_names(pantry_text),
     )
+    stats = get_retrieval_cache().stats()
+    print(f"Retrieval cache: {stats['hits']} hits / {stats['misses']} misses, {stats['entries']} entries")
 
     if not recipes:
-        await ctx.send("No suitable recipes found right now.")
-        return
+        return None
 
     recipes_text = "\n\n".join(
         f"Title: {r['title']}\nIngredients: {', '.join(r['ingredients'])}"[:200]
         for r in recipes
     )
     
-    # 4. Craft prompt for Ollama
-    resp =await asyncio.to_thread(
-        rs.select_recipes,
-        recipes_text,
-        preferences_str
-    )
+    # 4. Stream the LLM's selection into the status message as options are decided
+    resp = None
+    editor = ThrottledEdit(status)
+    try:
+        try:
+            async for resp in rs.astream_recipes(recipes_text, preferences_str):
+                await editor.update(selection_preview(resp))
+        except (ValidationError, OutputParserException) as e:
+            # JSON mode does not enforce the schema; the structured-output call does
+            print(f"[plan] streamed selection was not a valid RecipeSelection, retrying without streaming: {e}")
+            resp = None
+        if resp is None:
+            resp = await asyncio.to_thread(rs.select_recipes, recipes_text, preferences_str)
+        preview = selection_preview(resp, done=True)
+        await editor.update(preview)
+    finally:
+        await editor.close()
     breakfast_options = resp.breakfast
     lunch_options = resp.lunch
     custom= resp.custom if resp.custom else False
@@ -253,11 +405,14 @@ async def plan(ctx):
         # Match back to recipes from Qdrant
         selected_breakfasts = match_recipes(breakfast_options, recipes)
         selected_lunches = match_recipes(lunch_options, recipes)
+        # Full text is read only for the recipes that were picked
+        details = await recipe_details_async([r["id"] for r in selected_breakfasts + selected_lunches])
         def format_recipe(r):
+            full = details.get(r["id"], r)
             return f"""
                 **{r['title']}**
-                Ingredients: {', '.join(r['ingredients'])}
-                Instructions: {r['instructions']}
+                Ingredients: {', '.join(full.get('ingredients') or r['ingredients'])}
+                Instructions: {full.get('instructions', '')}
                 """
             
 
@@ -269,8 +424,8 @@ async def plan(ctx):
             {"\n".join(format_recipe(l) for l in selected_lunches)}
         """
     
-    for chunk in split_message(formatted_msg):
-        await ctx.send(chunk)
+    return {"preview": preview, "messages": split_message(formatted_msg)}
 
-    
-bot.run(TOKEN)
\ No newline at end of file
+
+if __name__ == "__main__":
+    bot.run(TOKEN)
@@ -1,3 +1,4 @@
+import asyncio
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from langchain.prompts import ChatPromptTemplate
@@ -11,6 +12,23 @@ class RecipeSelection(BaseModel):
     instructions: Optional[str]=Field(..., description="Concise cooking instructions for one of the lunch/dinner options if not from the retrieved recipes")
     custom:Optional[bool]=Field(False, description="Whether any of the suggestions are custom (not from retrieved recipes)")
 
+def decided_options(partial: dict) -> tuple:
+    """
+    (breakfast, lunch) options that are final in a partially streamed selection.
+
+    Keys are in the order the model wrote them, which need not be the
+    schema's order. Every key before the last one is complete; in the list
+    being written, all items but the last are.
+    """
+    writing = list(partial)[-1] if partial else None
+    decided = []
+    for field in ("breakfast", "lunch"):
+        items = [item for item in partial.get(field) or [] if isinstance(item, str)]
+        if field == writing:
+            items = items[:-1]
+        decided.append(items)
+    return tuple(decided)
+
 class RecipeSelector:
     def __init__(self, model_name:str='gemini'):
         
@@ -45,6 +63,12 @@ class RecipeSelector:
             self.model_name='deepseek'
             self.ds=DeepSeekChat()
         self.recipe_selector=self.ds.with_structured_output(RecipeSelection)
+        # JSON mode returns the answer as streamed text, so it can be parsed while it arrives;
+        # DeepSeek's reasoning block comes before its JSON, so it is not streamed
+        self.recipe_streamer=(
+            self.ds.with_structured_output(RecipeSelection.model_json_schema(), method="json_mode")
+            if self.model_name=='gemini' else None
+        )
         
     
     def select_recipes(self,recipes:str, preferences:str) -> RecipeSelection:
@@ -57,4 +81,32 @@ class RecipeSelector:
         result=self.recipe_selector.invoke(prompt)
         print("Received response from model")
         #print(f"Prompt to DeepSeek:\n{prompt}\n---")
-        return result
\ No newline at end of file
+        return result
+
+    async def astream_recipes(self, recipes:str, preferences:str):
+        """
+        Stream the selection while the model writes it.
+
+        Yields a partial RecipeSelection each time another breakfast or
+        lunch option is decided, and the complete selection last. Models
+        without a streaming parser yield only the complete selection.
+        """
+        if self.recipe_streamer is None:
+            yield await asyncio.to_thread(self.select_recipes, recipes, preferences)
+            return
+        prompt=self.recipe_prompt.invoke({
+            "preferences": preferences,
+            "recipes": recipes
+        })
+        print(f"Streaming {self.model_name}")
+        partial={}
+        shown=None
+        async for partial in self.recipe_streamer.astream(prompt):
+            if not isinstance(partial, dict):
+                continue
+            decided=decided_options(partial)
+            if decided!=shown and any(decided):
+                shown=decided
+                yield RecipeSelection(breakfast=decided[0], lunch=decided[1], instructions=None, custom=False)
+        print("Received response from model")
+        yield RecipeSelection.model_validate({"instructions": None, **partial})
@@ -1,18 +1,26 @@
 import os
 from dotenv import load_dotenv
-from pymongo import AsyncMongoClient
+from pymongo import AsyncMongoClient, ASCENDING
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "grocerbot"
 COLLECTION_NAME = "pantry_sheets"
+INVENTORY_COLLECTION = "inventory"
 
 # init client
 mongo_client = AsyncMongoClient(MONGO_URI)
 db = mongo_client[DB_NAME]
 collection = db[COLLECTION_NAME]
+inventory_col = db[INVENTORY_COLLECTION]
+# Called with the user ID after save_user changes a registration
+_user_change_hooks = []
 
 # helpers
+def add_user_change_hook(hook):
+    """Register `hook(user_id)` to run whenever save_user changes a user's sheet, preferences or stores"""
+    _user_change_hooks.append(hook)
+
 async def get_user(user_id: str):
     return await collection.find_one({"user_id": user_id})
 
@@ -30,8 +38,20 @@ async def save_user(
     if grocery_stores:
         update["grocery_stores"] = grocery_stores
 
-    return await collection.update_one(
+    changes = {"$set": update}
+    if sheet_url:
+        # The synced inventory belongs to the previous sheet until watchdog syncs this one
+        changes["$unset"] = {"last_hash": "", "last_synced": ""}
+    result = await collection.update_one(
         {"user_id": user_id},
-        {"$set": update},
+        changes,
         upsert=True
-    )
\ No newline at end of file
+    )
+    if update:
+        for hook in _user_change_hooks:
+            hook(user_id)
+    return result
+
+async def get_inventory_for_user(user_id: str):
+    """Fetch all inventory records for a user"""
+    return await inventory_col.find({"user_id": user_id}).sort("item", ASCENDING).to_list()
\ No newline at end of file
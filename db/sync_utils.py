@@ -1,4 +1,5 @@
 import os
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 from pymongo import MongoClient, ASCENDING
 
@@ -42,6 +43,20 @@ def upsert_user(
         {"$set": update},
         upsert=True
     )
+def record_sheet_sync(user_id: str, sheet_url: str, sheet_hash: str) -> bool:
+    """
+    Record a completed sync of `sheet_url`: its content hash and when it was synced.
+
+    Only applies while the user is still registered with that sheet, so a
+    sheet registered during the sync is not overwritten by the old one.
+    Returns whether the sync was recorded.
+    """
+    result = pantry_col.update_one(
+        {"user_id": user_id, "sheet_url": sheet_url},
+        {"$set": {"last_hash": sheet_hash, "last_synced": datetime.now(timezone.utc)}}
+    )
+    return result.matched_count > 0
+
 def get_user(user_id: str):
     """Fetch a user's document"""
     return pantry_col.find_one({"user_id": user_id})
@@ -63,6 +78,10 @@ def upsert_inventory(user_id: str, item_key: str, record: dict):
         upsert=True
     )
 
+def delete_missing_items(user_id: str, item_keys: list):
+    """Delete a user's inventory records whose item is no longer in their sheet"""
+    return inventory_col.delete_many({"user_id": user_id, "item": {"$nin": list(item_keys)}})
+
 def get_inventory_for_user(user_id: str):
     """Fetch all inventory records for a user"""
     return list(inventory_col.find({"user_id": user_id}).sort("item", ASCENDING))
@@ -0,0 +1,250 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+
+import numpy as np
+import portalocker
+
+from .embeddings import EMBED_MODEL, EMBED_DIM
+
+# Base project directory (one level up from misc_utils)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR", os.path.join(BASE_DIR, "recipe_data", "embedding_cache")
+)
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def content_key(text: str) -> str:
+    """Cache key for a text: hex SHA-256 of its UTF-8 bytes"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by content hash.
+
+    Layout of `directory`:
+        meta.json    model name, vector dimension, row count and generation
+        keys.txt     one content hash per row, in row order
+        vectors.f32  row-major float32 matrix (count x dim), memory-mapped
+
+    Rows are only ever appended; `meta.json` is replaced last, so readers
+    never see a row before it is complete. Lookups return views into the
+    memory map, so cached vectors are read without copying. Appends and
+    compaction take an inter-process file lock, so the indexer and the
+    bot can share one cache.
+    """
+
+    def __init__(self, directory: str = EMBEDDING_CACHE_DIR, model: str = EMBED_MODEL, dim: int = EMBED_DIM):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.model = model
+        self.dim = dim
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._keys_path = os.path.join(directory, "keys.txt")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._lock_path = os.path.join(directory, ".lock")
+        self._lock = threading.RLock()
+
+        self._index = {}
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._count = 0
+        self._generation = None
+        self._keys_offset = 0
+        self._meta_mtime = None
+
+        with self._file_lock():
+            meta = self._read_meta()
+            if meta is None:
+                open(self._keys_path, "w").close()
+                open(self._vectors_path, "wb").close()
+                self._write_meta(0, 0)
+            else:
+                if meta["model"] != model or meta["dim"] != dim:
+                    raise ValueError(
+                        f"Embedding cache at {directory} holds {meta['model']} ({meta['dim']}-dim) "
+                        f"vectors, not {model} ({dim}-dim). Point EMBEDDING_CACHE_DIR elsewhere or delete it."
+                    )
+                self._truncate(meta["count"])
+            self._load()
+
+    # --- files ---
+
+    def _file_lock(self):
+        return portalocker.Lock(self._lock_path, mode="a", timeout=120)
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, count: int, generation: int):
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model, "dim": self.dim, "count": count, "generation": generation}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _truncate(self, count: int):
+        """Drop rows written after the last committed meta.json (an interrupted append)"""
+        with open(self._vectors_path, "r+b") as f:
+            f.truncate(count * self.dim * 4)
+        with open(self._keys_path, "r+b") as f:
+            offset = 0
+            for _ in range(count):
+                line = f.readline()
+                if not line:
+                    break
+                offset += len(line)
+            f.truncate(offset)
+
+    def _load(self):
+        """Bring the in-memory index and memory map up to date with the files"""
+        meta = self._read_meta()
+        if meta["generation"] != self._generation:
+            # Compacted (or first load): start over
+            self._index = {}
+            self._keys_offset = 0
+            self._count = 0
+        if meta["count"] > self._count:
+            with open(self._keys_path, "r", encoding="utf-8") as f:
+                f.seek(self._keys_offset)
+                for row in range(self._count, meta["count"]):
+                    self._index[f.readline().rstrip("\n")] = row
+                self._keys_offset = f.tell()
+        self._count = meta["count"]
+        self._generation = meta["generation"]
+        self._meta_mtime = os.stat(self._meta_path).st_mtime_ns
+        if self._count:
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._count, self.dim))
+        else:
+            self._matrix = np.empty((0, self.dim), dtype=np.float32)
+
+    def _refresh(self):
+        # Another process may have appended or compacted since we last looked
+        if os.stat(self._meta_path).st_mtime_ns != self._meta_mtime:
+            self._load()
+
+    # --- public API ---
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key: str):
+        return key in self._index
+
+    def get_many(self, keys) -> dict:
+        """Return {key: vector view} for every key in the cache"""
+        with self._lock:
+            self._refresh()
+            matrix = self._matrix
+            return {key: matrix[self._index[key]] for key in keys if key in self._index}
+
+    def put_many(self, keys: list[str], vectors):
+        """Append vectors for keys that are not cached yet"""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), self.dim)
+        with self._lock, self._file_lock():
+            self._load()
+            new_rows = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._index and key not in new_rows:
+                    new_rows[key] = vector
+            if not new_rows:
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack(list(new_rows.values())).tobytes())
+            with open(self._keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in new_rows))
+            self._write_meta(self._count + len(new_rows), self._generation)
+            self._load()
+
+    def compact(self, live_keys) -> int:
+        """Rewrite the cache keeping only `live_keys`. Returns the number of rows dropped"""
+        live_keys = set(live_keys)
+        with self._lock, self._file_lock():
+            self._load()
+            keep = [(key, row) for key, row in self._index.items() if key in live_keys]
+            keep.sort(key=lambda kr: kr[1])
+            dropped = self._count - len(keep)
+            if not dropped:
+                return 0
+
+            rows = np.array([row for _, row in keep], dtype=np.int64)
+            tmp_vectors = f"{self._vectors_path}.tmp"
+            tmp_keys = f"{self._keys_path}.tmp"
+            with open(tmp_vectors, "wb") as f:
+                # Copy in slices so compaction does not load the whole matrix
+                for i in range(0, len(rows), 10_000):
+                    f.write(np.ascontiguousarray(self._matrix[rows[i:i + 10_000]]).tobytes())
+            with open(tmp_keys, "w", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key, _ in keep))
+
+            self._matrix = np.empty((0, self.dim), dtype=np.float32)
+            os.replace(tmp_vectors, self._vectors_path)
+            os.replace(tmp_keys, self._keys_path)
+            self._write_meta(len(keep), self._generation + 1)
+            self._load()
+            return dropped
+
+
+def get_embedding_cache(directory: str = EMBEDDING_CACHE_DIR) -> EmbeddingCache:
+    """Return the shared EmbeddingCache for a directory"""
+    directory = os.path.abspath(directory)
+    with _caches_lock:
+        if directory not in _caches:
+            _caches[directory] = EmbeddingCache(directory)
+        return _caches[directory]
+
+
+def embed_cached(texts: list[str], embed_fn, cache: EmbeddingCache = None) -> list:
+    """
+    Embed texts, reading cached vectors from the memory map and embedding only misses.
+
+    Args:
+        texts (List[str]): Texts to embed.
+        embed_fn (Callable[[List[str]], List[List[float]]]): Embeds a list of texts.
+        cache (EmbeddingCache, optional): Cache to use. Embeds everything if None.
+
+    Returns:
+        List[np.ndarray]: One float32 vector per text (views into the cache for hits).
+    """
+    if cache is None:
+        return list(np.asarray(embed_fn(texts), dtype=np.float32).reshape(len(texts), -1))
+
+    keys, found, missing = _lookup(texts, cache)
+    if missing:
+        vectors = np.asarray(embed_fn(list(missing.values())), dtype=np.float32)
+        cache.put_many(list(missing), vectors)
+        found.update(zip(missing, vectors))
+    return [found[key] for key in keys]
+
+
+async def embed_cached_async(texts: list[str], embed_fn, cache: EmbeddingCache = None) -> list:
+    """embed_cached with an async `embed_fn`; cache reads and writes (file lock, reloads) run in a worker thread"""
+    if cache is None:
+        return list(np.asarray(await embed_fn(texts), dtype=np.float32).reshape(len(texts), -1))
+
+    # get_many reloads the key list after another process appended to the cache
+    keys, found, missing = await asyncio.to_thread(_lookup, texts, cache)
+    if missing:
+        vectors = np.asarray(await embed_fn(list(missing.values())), dtype=np.float32)
+        await asyncio.to_thread(cache.put_many, list(missing), vectors)
+        found.update(zip(missing, vectors))
+    return [found[key] for key in keys]
+
+
+def _lookup(texts: list[str], cache: EmbeddingCache):
+    """(keys, cached vectors by key, {key: text} still to embed)"""
+    keys = [content_key(t) for t in texts]
+    found = cache.get_many(keys)
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    return keys, found, missing
@@ -0,0 +1,144 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import ollama
+
+EMBED_MODEL = "nomic-embed-text"
+# Vector size produced by EMBED_MODEL
+EMBED_DIM = 768
+# Texts per ollama.embed request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+# Upper bound for concurrent embed requests when indexing
+EMBED_MAX_WORKERS = int(os.getenv("EMBED_MAX_WORKERS", "16"))
+
+
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    """Embed a list of texts with one request to the Ollama batch embedding API"""
+    if not texts:
+        return []
+    resp = ollama.embed(model=EMBED_MODEL, input=list(texts))
+    return resp["embeddings"]
+
+
+def embed_text(text: str) -> list[float]:
+    """Return embedding from Nomic model via Ollama"""
+    return embed_batch([text])[0]
+
+
+def embed_texts(texts: list[str], batch_size: int = None) -> list[list[float]]:
+    """Embed texts in sequential batches of `batch_size`, preserving order"""
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    vectors = []
+    for i in range(0, len(texts), batch_size):
+        vectors.extend(embed_batch(texts[i:i + batch_size]))
+    return vectors
+
+
+# Ollama AsyncClient for query embeddings on the bot's event loop (see init_async_ollama)
+async_ollama = None
+
+
+def init_async_ollama(host: str = None) -> ollama.AsyncClient:
+    """Create the shared Ollama AsyncClient; call from the event loop that will use it"""
+    global async_ollama
+    async_ollama = ollama.AsyncClient(host=host)
+    return async_ollama
+
+
+async def embed_texts_async(texts: list[str], batch_size: int = None) -> list[list[float]]:
+    """Async embed_texts: batches are sent concurrently on the event loop, order is preserved"""
+    if not texts:
+        return []
+    client = async_ollama or init_async_ollama()
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    responses = await asyncio.gather(*(
+        client.embed(model=EMBED_MODEL, input=list(texts[i:i + batch_size]))
+        for i in range(0, len(texts), batch_size)
+    ))
+    return [vector for resp in responses for vector in resp["embeddings"]]
+
+
+class AdaptiveConcurrency:
+    """
+    Hill-climbs the number of concurrent embed requests towards the best throughput.
+
+    Starts at `start` workers and doubles while throughput keeps improving,
+    then settles on the best level seen and periodically probes its
+    neighbours, so it follows changes in how busy the local Ollama is.
+    """
+
+    # Relative gain needed to keep doubling
+    MIN_GAIN = 0.05
+    # Observations between neighbour probes once settled
+    PROBE_EVERY = 8
+
+    def __init__(self, start: int = 1, max_workers: int = EMBED_MAX_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self.workers = min(max(1, start), self.max_workers)
+        self._rates = {}
+        self._growing = True
+        self._steps = 0
+        self._probe_up = True
+        self._lock = threading.Lock()
+
+    def best(self) -> int:
+        return max(self._rates, key=self._rates.get) if self._rates else self.workers
+
+    def observe(self, items: int, seconds: float):
+        """Record throughput at the current level and pick the next level"""
+        if seconds <= 0 or items <= 0:
+            return
+        rate = items / seconds
+        with self._lock:
+            prev = self._rates.get(self.workers)
+            # Smooth repeated measurements of the same level
+            self._rates[self.workers] = rate if prev is None else 0.5 * prev + 0.5 * rate
+
+            if self._growing:
+                below = self._rates.get(self.workers // 2)
+                improved = below is None or self._rates[self.workers] > below * (1 + self.MIN_GAIN)
+                if improved and self.workers < self.max_workers:
+                    self.workers = min(self.max_workers, self.workers * 2)
+                    return
+                self._growing = False
+                self.workers = self.best()
+                return
+
+            self._steps += 1
+            best = self.best()
+            if self._steps % self.PROBE_EVERY == 0:
+                step = 1 if self._probe_up else -1
+                self._probe_up = not self._probe_up
+                self.workers = min(self.max_workers, max(1, best + step))
+            else:
+                self.workers = best
+
+
+class BatchEmbedder:
+    """Embeds large lists of texts with batched requests and adaptive concurrency"""
+
+    def __init__(self, batch_size: int = None, max_workers: int = EMBED_MAX_WORKERS):
+        self.batch_size = batch_size or EMBED_BATCH_SIZE
+        self.tuner = AdaptiveConcurrency(max_workers=max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.tuner.max_workers)
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vectors = []
+        # Run `workers` requests at a time and feed the measured rate back to the tuner
+        while batches:
+            workers = self.tuner.workers
+            wave, batches = batches[:workers], batches[workers:]
+            start = time.perf_counter()
+            for result in self._executor.map(embed_batch, wave):
+                vectors.extend(result)
+            # A partial last wave would understate the rate of this level
+            if len(wave) == workers:
+                self.tuner.observe(sum(len(b) for b in wave), time.perf_counter() - start)
+        return vectors
+
+    def close(self):
+        self._executor.shutdown()
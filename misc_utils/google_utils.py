@@ -7,15 +7,19 @@ import pandas as pd
 load_dotenv()
 GOOGLE_SERVICE_CREDENTIALS= os.getenv("GOOGLE_SERVICE_CREDENTIALS")
 
-
-SECRETS_FILE = os.path.abspath(
-    os.path.join(os.path.dirname(__file__), "..",GOOGLE_SERVICE_CREDENTIALS)
-)
-
-# Setup gspread client
+# Setup gspread client (on first use, so importing this module needs no credentials)
 scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name(SECRETS_FILE, scope)
-client = gspread.authorize(creds)
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        secrets_file = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "..", GOOGLE_SERVICE_CREDENTIALS)
+        )
+        creds = ServiceAccountCredentials.from_json_keyfile_name(secrets_file, scope)
+        _client = gspread.authorize(creds)
+    return _client
 
 
 async def read_sheet_to_string(sheet_url: str) -> str:
@@ -40,7 +44,7 @@ async def read_sheet_to_string(sheet_url: str) -> str:
         return "- Invalid sheet URL."
     
     try:
-        sheet = client.open_by_key(sheet_id).sheet1  # assuming first sheet
+        sheet = get_client().open_by_key(sheet_id).sheet1  # assuming first sheet
         rows = sheet.get_all_records()  # list of dicts
     except Exception:
         return "- Could not read the sheet."
@@ -48,14 +52,16 @@ async def read_sheet_to_string(sheet_url: str) -> str:
     if not rows:
         return "- Sheet is empty."
 
-    lines = []
-    for row in rows:
-        item = row.get("Item") or "Unknown"
-        quantity = row.get("Quantity")
-        line = f"- {item}" + (f" ({quantity})" if quantity else "")
-        lines.append(line)
+    return "\n".join(pantry_line(row.get("Item"), row.get("Quantity")) for row in rows)
 
-    return "\n".join(lines)
+def pantry_line(item, quantity=None) -> str:
+    return f"- {item or 'Unknown'}" + (f" ({quantity})" if quantity else "")
+
+def inventory_to_string(records: list[dict]) -> str:
+    """Same bullet list as read_sheet_to_string, from inventory records synced by watchdog (lowercase columns)"""
+    if not records:
+        return "- Sheet is empty."
+    return "\n".join(pantry_line(r.get("item"), r.get("quantity")) for r in records)
 
 # --- Sync function for listener ---
 def fetch_sheet_as_df(sheet_url: str, sheet_name: str = "Sheet1") -> pd.DataFrame:
@@ -66,12 +72,14 @@ def fetch_sheet_as_df(sheet_url: str, sheet_name: str = "Sheet1") -> pd.DataFram
     try:
         sheet_id = sheet_url.split("/d/")[1].split("/")[0]
     except IndexError:
-        return "- Invalid sheet URL."
+        print(f"[ERROR] Invalid sheet URL: {sheet_url}")
+        return pd.DataFrame()
     try:
-        sheet = client.open_by_key(sheet_id).sheet1  # assuming first sheet
+        sheet = get_client().open_by_key(sheet_id).sheet1  # assuming first sheet
         data = sheet.get_all_records()  # list of dicts
-    except Exception:
-        return "- Could not read the sheet."
+    except Exception as e:
+        print(f"[ERROR] Could not read sheet: {e}")
+        return pd.DataFrame()
     try:
         df = pd.DataFrame(data)
         df.columns = [col.strip().lower() for col in df.columns]
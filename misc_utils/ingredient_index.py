@@ -0,0 +1,297 @@
+import os
+import re
+import json
+import math
+import uuid
+import shutil
+import threading
+from array import array
+
+import numpy as np
+import scipy.sparse as sp
+
+# Base project directory (one level up from misc_utils)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INGREDIENT_INDEX_DIR = os.getenv("INGREDIENT_INDEX_DIR", os.path.join(BASE_DIR, "recipe_data", "ingredient_index"))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+DIETS = ["vegan", "vegetarian", "nonveg"]
+# Diet code for recipes without a known label
+UNKNOWN_DIET = 255
+
+# Words in ingredient lines that never name an ingredient
+STOPWORDS = {
+    "cup", "cups", "tablespoon", "tablespoons", "tbsp", "teaspoon", "teaspoons", "tsp", "pound", "pounds",
+    "lb", "lbs", "ounce", "ounces", "oz", "gram", "grams", "kg", "ml", "liter", "litre", "quart", "pint",
+    "pinch", "dash", "can", "cans", "package", "packages", "jar", "bottle", "bunch", "clove", "cloves",
+    "slice", "slices", "piece", "pieces", "stick", "sticks", "large", "medium", "small", "whole", "fresh",
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed", "ground", "peeled", "cubed",
+    "beaten", "melted", "softened", "divided", "optional", "taste", "to", "and", "or", "of", "for", "the",
+    "a", "an", "in", "with", "into", "about", "plus", "more", "finely", "thinly", "roughly", "cut",
+    "inch", "inches", "frozen", "cooked", "dried", "packed", "drained", "rinsed", "room", "temperature",
+    "needed", "such", "as", "each", "per", "x", "g", "st", "mix",
+}
+
+_WORD = re.compile(r"[a-z]+")
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def normalize_term(word: str) -> str:
+    """Light plural folding so "tomatoes" and "tomato" share a posting list"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def ingredient_terms(text: str) -> list[str]:
+    """Normalized ingredient tokens of a line of text (quantities, units and filler dropped)"""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if len(word) < 3 or word in STOPWORDS:
+            continue
+        terms.append(normalize_term(word))
+    return terms
+
+
+class IngredientIndex:
+    """
+    Inverted index of normalized ingredient terms -> recipes, with BM25 scoring.
+
+    Layout of `directory`:
+        meta.json    document count, average length, BM25 parameters
+        terms.json   term -> term number
+        offsets.i64  start of each term's postings (terms + 1 entries)
+        docs.u32     postings: document numbers, sorted within each term
+        tf.u8        term frequency per posting
+        doclen.u16   terms per document
+        ids.u128     recipe point ID (UUID bytes) per document
+        diet.u8      diet code per document
+        coverage_*   the same postings as a CSR document x term matrix of IDF
+                     weights (indptr.i64, terms.i32, weight.f32) and the total
+                     weight per document (total.f32)
+
+    Posting lists are flat numpy arrays, so scoring a query is a handful
+    of vectorized scatter-adds over the matching postings. The CSR copy
+    serves the opposite lookup: the ingredients of a given set of recipes.
+    """
+
+    def __init__(self, directory: str = INGREDIENT_INDEX_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, "terms.json"), "r", encoding="utf-8") as f:
+            self.terms = json.load(f)
+        self.count = meta["count"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.k1 = meta["k1"]
+        self.b = meta["b"]
+        self.offsets = np.fromfile(os.path.join(directory, "offsets.i64"), dtype=np.int64)
+        self.docs = np.memmap(os.path.join(directory, "docs.u32"), dtype=np.uint32, mode="r") if self.offsets[-1] else np.empty(0, np.uint32)
+        self.tf = np.memmap(os.path.join(directory, "tf.u8"), dtype=np.uint8, mode="r") if self.offsets[-1] else np.empty(0, np.uint8)
+        self.doclen = np.fromfile(os.path.join(directory, "doclen.u16"), dtype=np.uint16).astype(np.float32)
+        self.ids = np.fromfile(os.path.join(directory, "ids.u128"), dtype=np.uint8).reshape(-1, 16)
+        self.diet = np.fromfile(os.path.join(directory, "diet.u8"), dtype=np.uint8)
+        # Per-document BM25 length normalization, computed once
+        self._norm = self.k1 * (1 - self.b + self.b * self.doclen / self.avgdl)
+        self._docs_by_id = None
+        self.coverage_matrix = None
+        indptr_path = os.path.join(directory, "coverage_indptr.i64")
+        # Indexes written before the coverage matrix existed simply lack it
+        if os.path.exists(indptr_path):
+            indptr = np.fromfile(indptr_path, dtype=np.int64)
+            nnz = int(indptr[-1])
+            terms = np.memmap(os.path.join(directory, "coverage_terms.i32"), dtype=np.int32, mode="r") if nnz else np.empty(0, np.int32)
+            weight = np.memmap(os.path.join(directory, "coverage_weight.f32"), dtype=np.float32, mode="r") if nnz else np.empty(0, np.float32)
+            self.coverage_matrix = sp.csr_matrix((weight, terms, indptr), shape=(self.count, len(self.terms)))
+            self.coverage_total = np.fromfile(os.path.join(directory, "coverage_total.f32"), dtype=np.float32)
+
+    def __len__(self):
+        return self.count
+
+    def point_id(self, doc: int) -> str:
+        return str(uuid.UUID(bytes=self.ids[doc].tobytes()))
+
+    def docs_for(self, point_ids) -> np.ndarray:
+        """Document number of each point ID (-1 for recipes not in the index)"""
+        if self._docs_by_id is None:
+            # Built on first use: only coverage re-ranking needs it
+            self._docs_by_id = {self.ids[doc].tobytes(): doc for doc in range(self.count)}
+        # bytes.fromhex is several times cheaper than uuid.UUID for large candidate sets
+        return np.asarray([self._docs_by_id.get(bytes.fromhex(str(pid).replace("-", "")), -1) for pid in point_ids], dtype=np.int64)
+
+    def postings(self, term: str):
+        number = self.terms.get(term)
+        if number is None:
+            return self.docs[:0], self.tf[:0]
+        start, end = self.offsets[number], self.offsets[number + 1]
+        return self.docs[start:end], self.tf[start:end]
+
+    def scores(self, weighted_terms: dict) -> np.ndarray:
+        """BM25 score of every document for {term: query weight}"""
+        scores = np.zeros(self.count, dtype=np.float32)
+        for term, weight in weighted_terms.items():
+            docs, tf = self.postings(term)
+            if not len(docs):
+                continue
+            idf = math.log(1 + (self.count - len(docs) + 0.5) / (len(docs) + 0.5))
+            tf = tf.astype(np.float32)
+            scores[docs] += weight * idf * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def search(self, weighted_terms: dict, limit: int, diet: str = None) -> list:
+        """Top `limit` documents as (point ID, score), best first; documents scoring 0 are left out"""
+        scores = self.scores(weighted_terms)
+        if diet:
+            code = DIETS.index(diet) if diet in DIETS else UNKNOWN_DIET
+            scores[self.diet != code] = 0.0
+        matched = int(np.count_nonzero(scores))
+        k = min(limit, matched)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.point_id(int(d)), float(scores[d])) for d in top]
+
+    def coverage(self, point_ids, offers: list[str], pantry: list[str] = None) -> np.ndarray:
+        """
+        Share of each recipe's ingredients covered by the pantry and the offers.
+
+        Ingredients are weighted by IDF, so having the chicken of a recipe
+        counts for more than having its salt. All candidates are scored with
+        one sparse (candidates x terms) @ (terms x 3) product.
+
+        Args:
+            point_ids (Sequence): Candidate recipe point IDs.
+            offers (List[str]): Offer names.
+            pantry (List[str], optional): Pantry item names.
+
+        Returns:
+            np.ndarray: float32 (len(point_ids), 3) of pantry, offer and combined
+            coverage in [0, 1]; 0 for recipes not in the index.
+        """
+        if self.coverage_matrix is None:
+            raise ValueError(f"Ingredient index at {self.directory} has no coverage matrix; rebuild it")
+        docs = self.docs_for(point_ids)
+        known = docs >= 0
+        result = np.zeros((len(docs), 3), dtype=np.float32)
+        if not known.any():
+            return result
+        q = np.zeros((len(self.terms), 3), dtype=np.float32)
+        for column, texts in ((0, pantry or []), (1, offers)):
+            numbers = [self.terms[t] for text in texts for t in ingredient_terms(text) if t in self.terms]
+            q[numbers, column] = 1.0
+        q[:, 2] = np.maximum(q[:, 0], q[:, 1])
+        docs = docs[known]
+        covered = self.coverage_matrix[docs] @ q
+        result[known] = covered / np.maximum(self.coverage_total[docs], 1e-12)[:, None]
+        return result
+
+
+def query_terms(offers: list[str], pantry: list[str] = None, pantry_weight: float = 0.5) -> dict:
+    """{term: weight} for offer names (weight 1) and pantry items (`pantry_weight`)"""
+    weighted = {}
+    for texts, weight in ((offers, 1.0), (pantry or [], pantry_weight)):
+        for text in texts:
+            for term in set(ingredient_terms(text)):
+                weighted[term] = max(weighted.get(term, 0.0), weight)
+    return weighted
+
+
+class IngredientIndexWriter:
+    """Collects recipes into posting lists in memory and writes the index atomically on `close`"""
+
+    def __init__(self, directory: str = INGREDIENT_INDEX_DIR):
+        self.directory = directory
+        self._postings = {}
+        self._doclen = array("H")
+        self._diet = array("B")
+        self._ids = bytearray()
+        self._seen = set()
+        self.count = 0
+
+    def add(self, point_id: str, ingredients: list[str], diet: str = None):
+        # Identical recipes share a point ID and are indexed once
+        if point_id in self._seen:
+            return
+        self._seen.add(point_id)
+        counts = {}
+        for line in ingredients:
+            for term in ingredient_terms(line):
+                counts[term] = counts.get(term, 0) + 1
+        doc = self.count
+        for term, tf in counts.items():
+            docs, tfs = self._postings.setdefault(term, (array("I"), array("B")))
+            docs.append(doc)
+            tfs.append(min(tf, 255))
+        self._doclen.append(min(sum(counts.values()), 65535))
+        self._ids += uuid.UUID(point_id).bytes
+        self._diet.append(DIETS.index(diet) if diet in DIETS else UNKNOWN_DIET)
+        self.count += 1
+
+    def _write_coverage(self, tmp_dir: str, offsets: np.ndarray):
+        """Transpose the postings (term -> docs) into a CSR doc x term matrix of IDF weights"""
+        counts = np.diff(offsets)
+        idf = np.log(1 + (self.count - counts + 0.5) / (counts + 0.5)).astype(np.float32)
+        docs = np.fromfile(os.path.join(tmp_dir, "docs.u32"), dtype=np.uint32).astype(np.int32)
+        by_term = sp.csc_matrix((np.repeat(idf, counts), docs, offsets), shape=(self.count, len(counts)))
+        matrix = by_term.tocsr()
+        matrix.sort_indices()
+        matrix.indptr.astype(np.int64).tofile(os.path.join(tmp_dir, "coverage_indptr.i64"))
+        matrix.indices.astype(np.int32).tofile(os.path.join(tmp_dir, "coverage_terms.i32"))
+        matrix.data.astype(np.float32).tofile(os.path.join(tmp_dir, "coverage_weight.f32"))
+        np.asarray(matrix.sum(axis=1), dtype=np.float32).ravel().tofile(os.path.join(tmp_dir, "coverage_total.f32"))
+
+    def close(self, completed=True):
+        if not completed:
+            return
+        tmp_dir = f"{self.directory}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        terms = sorted(self._postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        with open(os.path.join(tmp_dir, "docs.u32"), "wb") as docs_f, open(os.path.join(tmp_dir, "tf.u8"), "wb") as tf_f:
+            for number, term in enumerate(terms):
+                docs, tfs = self._postings[term]
+                docs.tofile(docs_f)
+                tfs.tofile(tf_f)
+                offsets[number + 1] = offsets[number] + len(docs)
+        offsets.tofile(os.path.join(tmp_dir, "offsets.i64"))
+        self._write_coverage(tmp_dir, offsets)
+        with open(os.path.join(tmp_dir, "doclen.u16"), "wb") as f:
+            self._doclen.tofile(f)
+        with open(os.path.join(tmp_dir, "ids.u128"), "wb") as f:
+            f.write(self._ids)
+        with open(os.path.join(tmp_dir, "diet.u8"), "wb") as f:
+            self._diet.tofile(f)
+        with open(os.path.join(tmp_dir, "terms.json"), "w", encoding="utf-8") as f:
+            json.dump({term: number for number, term in enumerate(terms)}, f)
+        avgdl = sum(self._doclen) / self.count if self.count else 0.0
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"count": self.count, "avgdl": avgdl, "k1": BM25_K1, "b": BM25_B}, f)
+
+        old_dir = f"{self.directory}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.directory):
+            os.replace(self.directory, old_dir)
+        os.replace(tmp_dir, self.directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        print(f"Wrote ingredient index: {self.count} recipes, {len(terms)} terms, {int(offsets[-1])} postings")
+
+
+def get_ingredient_index(directory: str = INGREDIENT_INDEX_DIR) -> IngredientIndex:
+    """Return the shared IngredientIndex for a directory"""
+    directory = os.path.abspath(directory)
+    with _indexes_lock:
+        if directory not in _indexes:
+            _indexes[directory] = IngredientIndex(directory)
+        return _indexes[directory]
@@ -0,0 +1,132 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+
+from cachetools import TTLCache
+
+# A finished meal plan is reused for this long while its inputs are unchanged
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", str(6 * 3600)))
+# Users whose latest plan is kept (least recently used are dropped first)
+PLAN_CACHE_USERS = int(os.getenv("PLAN_CACHE_USERS", "1000"))
+
+
+class PlanCache:
+    """
+    Latest `$plan` result per user, with coalescing of duplicate builds.
+
+    A plan is keyed by a fingerprint of everything it was built from: the
+    user's preferences and stores, the offer date of each store and a hash
+    of the pantry. Asking again with the same inputs returns the stored plan
+    instead of repeating retrieval and the LLM call, and a request that
+    arrives while the same plan is being built waits for that build.
+
+    Entries are dropped by `invalidate` (called when a user's registration
+    changes) and when the user's synced sheet hash differs from the one the
+    plan was built with.
+    """
+
+    def __init__(self, max_users: int = PLAN_CACHE_USERS, ttl: float = PLAN_CACHE_TTL):
+        # user ID -> (fingerprint, sheet hash, plan)
+        self._plans = TTLCache(maxsize=max_users, ttl=ttl)
+        self._generations = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def fingerprint(preferences: dict, grocery_stores: list, offer_dates: dict, pantry_text: str) -> str:
+        pantry_hash = hashlib.sha256(pantry_text.encode("utf-8")).hexdigest()
+        payload = json.dumps([preferences, sorted(grocery_stores), offer_dates, pantry_hash], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, user_id: str, fingerprint: str, sheet_hash: str = None):
+        with self._lock:
+            entry = self._plans.get(user_id)
+            if entry is not None and entry[1] != sheet_hash:
+                # The watchdog synced a new version of the sheet since this plan was built
+                del self._plans[user_id]
+                entry = None
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[2]
+
+    def put(self, user_id: str, fingerprint: str, plan, sheet_hash: str = None, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user_id, 0):
+                # Invalidated while it was being built
+                return
+            self._plans[user_id] = (fingerprint, sheet_hash, plan)
+
+    def invalidate(self, user_id: str):
+        """Drop a user's plan; builds already running for the user are not stored"""
+        with self._lock:
+            self._plans.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    async def run(self, user_id: str, fingerprint: str, build, sheet_hash: str = None):
+        """
+        The plan for a fingerprint: cached, joined from a running build, or built now.
+
+        Args:
+            user_id (str): Discord user ID.
+            fingerprint (str): From `fingerprint`.
+            build (Callable[[], Awaitable]): Builds the plan; a None result is not cached.
+            sheet_hash (str, optional): The user's last synced sheet hash.
+
+        Returns:
+            Tuple[Any, bool]: The plan, and whether this call built it.
+        """
+        plan = self.get(user_id, fingerprint, sheet_hash)
+        if plan is not None:
+            return plan, False
+        key = (user_id, fingerprint)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), False
+
+        with self._lock:
+            generation = self._generations.get(user_id, 0)
+        task = asyncio.ensure_future(build())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, sheet_hash, generation, done))
+        # Shielded like the followers: cancelling this request must not cancel the shared build
+        return await asyncio.shield(task), True
+
+    def _finished(self, key: tuple, sheet_hash: str, generation: int, task):
+        """Done callback of a build: stop coalescing onto it and cache its plan"""
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        plan = task.result()
+        if plan is not None:
+            user_id, fingerprint = key
+            self.put(user_id, fingerprint, plan, sheet_hash, generation)
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._plans),
+            }
+
+
+_plan_cache = PlanCache()
+
+
+def get_plan_cache() -> PlanCache:
+    return _plan_cache
@@ -1,13 +1,29 @@
 import json
 import uuid
+import asyncio
+import hashlib
 import re
+import sys
+import queue
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 import os
 import argparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import ollama
+import numpy as np
 from pymongo import MongoClient
-from qdrant_client import QdrantClient, models
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
+
+from .embeddings import BatchEmbedder, EMBED_DIM, embed_text, embed_texts, embed_texts_async, init_async_ollama
+from .embedding_cache import EmbeddingCache, content_key, embed_cached, embed_cached_async, get_embedding_cache
+from .retrieval import (
+    offer_vectors, offer_vectors_async, group_vectors, rrf_fuse, coverage_rerank, get_retrieval_cache, LexicalHit,
+    COVERAGE_WEIGHT, COVERAGE_CANDIDATES,
+)
+from .ingredient_index import INGREDIENT_INDEX_DIR, IngredientIndexWriter, get_ingredient_index, query_terms
+from .vector_index import RECIPE_MATRIX_DIR, RecipeMatrixWriter, get_recipe_matrix
+from .recipe_store import RECIPE_STORE_DIR, RecipeStoreWriter, get_recipe_store
 
 # Mongo config
 MONGO_URI = os.getenv("MONGO_URI")
@@ -16,6 +32,24 @@ RECIPE_COLLECTION = "recipes"
 
 # Qdrant collection
 QDRANT_COLLECTION = "recipes_vectors"
+# Payload fields that get keyword indexes (search filters on diet)
+QDRANT_PAYLOAD_INDEXES = ["diet", "source"]
+# Fields kept in vector payloads; full recipes live in the recipe store (see recipe_store.RecipeStore)
+PAYLOAD_FIELDS = ["title", "diet", "source"]
+# Vector search backend for search_recipes_qdrant: "qdrant" or "numpy" (see vector_index.RecipeMatrix)
+RECIPE_SEARCH_BACKEND = os.getenv("RECIPE_SEARCH_BACKEND", "qdrant").lower()
+# Retrieval mode: "dense" (vectors only), "hybrid" (ingredient-index BM25 + vectors) or "lexical"
+RECIPE_SEARCH_MODE = os.getenv("RECIPE_SEARCH_MODE", "dense").lower()
+# Best lexical matches the dense search is restricted to in hybrid mode
+LEXICAL_CANDIDATES = int(os.getenv("LEXICAL_CANDIDATES", "1000"))
+# Weight of the lexical ranking relative to all dense rankings together
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+# BM25 query weight of pantry terms (offer terms weigh 1)
+PANTRY_WEIGHT = float(os.getenv("PANTRY_WEIGHT", "0.5"))
+# Search-time HNSW beam width (0 = Qdrant default)
+QDRANT_HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "0"))
+# Candidates fetched per result from quantized vectors before rescoring with the originals
+QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", "2.0"))
 
 # Base project directory (one level up from misc_utils)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,15 +57,35 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 INPUT_FOLDER = os.path.join(BASE_DIR, "recipe_data", "recipes_raw")
 OUTPUT_FILE = os.path.join(BASE_DIR, "recipe_data", "cleaned_recipes.json")
 
-# Keywords for diet
+# Keywords for diet (matched as whole words, plurals included)
 NON_VEG_KEYWORDS = [
-    "chicken", "beef", "pork", "lamb", "fish", "shrimp", "crab", "bacon", "meat", "turkey", "salmon"
+    "chicken", "beef", "pork", "lamb", "fish", "shrimp", "crab", "bacon", "meat", "turkey", "salmon",
+    "meatball", "meatloaf", "crabmeat", "shellfish"
 ]
 
 DAIRY_EGG_KEYWORDS = [
-    "milk", "cheese", "butter", "cream", "egg", "yogurt", "mayonnaise"
+    "milk", "cheese", "butter", "cream", "egg", "yogurt", "mayonnaise",
+    "buttermilk"
 ]
 
+def _keyword_pattern(keywords):
+    """One regex matching any keyword as a whole word, optionally plural"""
+    alternatives = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternatives})(?:e?s)?\b")
+
+NON_VEG_PATTERN = _keyword_pattern(NON_VEG_KEYWORDS)
+DAIRY_EGG_PATTERN = _keyword_pattern(DAIRY_EGG_KEYWORDS)
+
+# Processes cleaning dataset files in parallel (1 = stream in this process)
+CLEAN_WORKERS = int(os.getenv("CLEAN_WORKERS", str(min(3, os.cpu_count() or 1))))
+
+# Recipes per batch handed to each sink while streaming
+INGEST_BATCH_SIZE = 1024
+# Points per Qdrant upsert request
+UPSERT_BATCH_SIZE = 256
+# Stream offset committed to Qdrant, for resuming an interrupted --to-qdrant run
+CHECKPOINT_FILE = os.path.join(BASE_DIR, "recipe_data", "qdrant_checkpoint.json")
+
 # Map filename shorthand to source names
 SOURCE_MAP = {
     "ar": "allrecipes",
@@ -41,6 +95,9 @@ SOURCE_MAP = {
 
 
 qclient = None
+# Async client for a Qdrant server, created by init_async_search
+aqclient = None
+_qdrant_lock = threading.Lock()
 
 def init_qdrant(path=None, url=None, api_key=None):
     global qclient
@@ -54,202 +111,1022 @@ def init_qdrant(path=None, url=None, api_key=None):
         qclient = QdrantClient(":memory:")
     return qclient
 
+def init_async_search(path=None, url=None, api_key=None, ollama_host=None):
+    """
+    Set up `search_recipes_async`; call once from the running event loop (e.g. on_ready).
+
+    A Qdrant server gets an AsyncQdrantClient. Local path mode keeps the sync
+    client, because the path can only be opened once and its exact scan is
+    CPU-bound anyway; async searches run it in a worker thread. Query
+    embeddings go through the Ollama AsyncClient.
+    """
+    global aqclient
+    init_async_ollama(ollama_host)
+    if RECIPE_SEARCH_BACKEND == "numpy":
+        return
+    if url:
+        aqclient = AsyncQdrantClient(url=url, api_key=api_key)
+    elif not qclient:
+        init_qdrant(path=path)
+
+def collection_config(hnsw_m=None, ef_construct=None, quantize=False, on_disk=False) -> dict:
+    """
+    Keyword arguments for `create_collection` with the requested tuning.
+
+    Args:
+        hnsw_m (int, optional): HNSW graph degree. None keeps Qdrant's default.
+        ef_construct (int, optional): HNSW build beam width. None keeps Qdrant's default.
+        quantize (bool): Keep an int8 scalar-quantized copy of the vectors in RAM.
+        on_disk (bool): Store the original float32 vectors on disk (memory-mapped).
+
+    Returns:
+        Dict[str, Any]: vectors_config, hnsw_config and quantization_config.
+    """
+    hnsw = None
+    if hnsw_m is not None or ef_construct is not None:
+        hnsw = models.HnswConfigDiff(m=hnsw_m, ef_construct=ef_construct)
+    quantization = None
+    if quantize:
+        quantization = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                # The int8 copy is what search scans, so it stays in RAM even with on-disk originals
+                always_ram=True,
+            )
+        )
+    return {
+        "vectors_config": models.VectorParams(
+            size=EMBED_DIM,
+            distance=models.Distance.COSINE,
+            on_disk=on_disk or None,
+        ),
+        "hnsw_config": hnsw,
+        "quantization_config": quantization,
+    }
+
+def tune_collection(client, collection=QDRANT_COLLECTION, hnsw_m=None, ef_construct=None, quantize=False, on_disk=False):
+    """Apply tuning options to an existing collection (Qdrant rebuilds indexes in the background)"""
+    config = collection_config(hnsw_m, ef_construct, quantize, on_disk)
+    if not (config["hnsw_config"] or config["quantization_config"] or on_disk):
+        return
+    client.update_collection(
+        collection_name=collection,
+        # "" is the default (unnamed) vector
+        vectors_config={"": models.VectorParamsDiff(on_disk=True)} if on_disk else None,
+        hnsw_config=config["hnsw_config"],
+        quantization_config=config["quantization_config"],
+    )
+
+def create_payload_indexes(client, collection=QDRANT_COLLECTION, fields=QDRANT_PAYLOAD_INDEXES):
+    """Keyword payload indexes so filtered searches do not scan every payload"""
+    for field in fields:
+        client.create_payload_index(
+            collection_name=collection,
+            field_name=field,
+            field_schema=models.PayloadSchemaType.KEYWORD,
+            wait=True,
+        )
+
+def search_params() -> models.SearchParams:
+    """Search parameters: rescore quantized candidates with the original vectors"""
+    return models.SearchParams(
+        hnsw_ef=QDRANT_HNSW_EF or None,
+        quantization=models.QuantizationSearchParams(rescore=True, oversampling=QDRANT_OVERSAMPLING),
+    )
+
 def clean_ingredient(ingredient: str) -> str:
     """Remove unwanted tokens and trim whitespace"""
     return re.sub(r"\bADVERTISEMENT\b", "", ingredient).strip()
 
-def embed_text(text: str):
-    """Return embedding from Nomic model via Ollama"""
-    resp = ollama.embeddings(model="nomic-embed-text", prompt=text)
-    return resp["embedding"]
+def recipe_text(r) -> str:
+    """Text that is embedded for a recipe"""
+    return r['title'] + "\n" + "\n".join(r["ingredients"])
+
+def recipe_id(r) -> str:
+    """Deterministic point ID: a UUID built from a hash of title, ingredients and instructions"""
+    content = "\x1f".join([r["title"], "\x1e".join(r["ingredients"]), r["instructions"]])
+    digest = hashlib.sha256(content.encode("utf-8")).digest()
+    return str(uuid.UUID(bytes=digest[:16]))
+
+def slim_payload(r) -> dict:
+    """Vector payload of a recipe: only the fields search filters on or deduplicates by"""
+    return {field: r.get(field) for field in PAYLOAD_FIELDS}
+
+def make_points(recipes, embedder: BatchEmbedder = None, cache: EmbeddingCache = None):
+    """Embed a batch of recipes in batched requests and wrap them as points.
+    With a cache, only recipes whose text has not been embedded before are sent to Ollama."""
+    texts = [recipe_text(r) for r in recipes]
+    vectors = embed_cached(texts, embedder.embed if embedder else embed_texts, cache)
+    return [
+        models.PointStruct(
+            id=recipe_id(r),
+            vector=vector.tolist(),
+            payload=slim_payload(r)
+        )
+        for r, vector in zip(recipes, vectors)
+    ]
 
 def make_point(r):
-    content = r['title'] + "\n" + "\n".join(r["ingredients"])
-    embedding = embed_text(content)  # your embedding function
-    return models.PointStruct(
-        id=str(uuid.uuid4()),
-        vector=embedding,
-        payload=r
-    )
+    return make_points([r])[0]
     
 def classify_diet(ingredients: list[str]) -> str:
     """Classify recipe as vegan / vegetarian / nonveg based on ingredients"""
     ing_text = " ".join(ingredients).lower()
 
-    if any(word in ing_text for word in NON_VEG_KEYWORDS):
+    # Whole words only, so "eggplant" is not egg and "buttercup squash" is not butter
+    if NON_VEG_PATTERN.search(ing_text):
         return "nonveg"
-    elif any(word in ing_text for word in DAIRY_EGG_KEYWORDS):
+    elif DAIRY_EGG_PATTERN.search(ing_text):
         return "vegetarian"
     else:
         return "vegan"
     
 
 
-def process_recipes(input_folder: str):
-    """Clean raw recipes and return list of dicts"""
-    cleaned_data = []
+def iter_json_object(path: str, chunk_size: int = 1 << 20):
+    """
+    Yield (key, value) pairs of a top-level JSON object without loading the whole file.
+
+    The file is read in chunks of `chunk_size` characters and each value is
+    decoded as soon as it is complete, so memory stays bounded by the chunk
+    size plus the largest single value.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def fill():
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buf = buf[pos:] + chunk
+            pos = 0
+            return True
+
+        def peek():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buf):
+                    return buf[pos]
+                if not fill():
+                    return None
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buf, pos)
+                    # A value ending exactly at the buffer edge may be truncated
+                    if end < len(buf) or eof:
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+
+        if peek() != "{":
+            raise ValueError(f"{path}: expected a JSON object")
+        pos += 1
+        while True:
+            token = peek()
+            if token == "}":
+                return
+            if token == ",":
+                pos += 1
+                continue
+            if token is None:
+                raise ValueError(f"{path}: unexpected end of file")
+            key = decode()
+            if peek() != ":":
+                raise ValueError(f"{path}: expected ':' after key {key!r}")
+            pos += 1
+            peek()
+            yield key, decode()
+
+def clean_recipe(recipe: dict, source: str):
+    """Clean and classify one raw recipe. Returns None if it should be skipped"""
+    try:
+        title = recipe.get("title", "").strip()
+        ingredients = recipe.get("ingredients", [])
+        instructions = recipe.get("instructions", "").strip()
+
+        if not title or not ingredients or not instructions:
+            return None
 
-    for filename in os.listdir(input_folder):
+        cleaned_ingredients = [clean_ingredient(i) for i in ingredients if i]
+        cleaned_ingredients = [i for i in cleaned_ingredients if i]
+
+        if not cleaned_ingredients:
+            return None
+        diet = classify_diet(cleaned_ingredients)
+        return {
+            "title": title,
+            "ingredients": cleaned_ingredients,
+            "instructions": instructions,
+            "diet": diet,
+            "source": source
+        }
+    except Exception:
+        return None
+
+def dataset_files(input_folder: str):
+    """(filename, path, source) for every raw dataset file, in a stable order"""
+    files = []
+    for filename in sorted(os.listdir(input_folder)):
         if not filename.endswith(".json"):
             continue
-        print("Extracting:", filename)
-
         # Extract source (ar, epi, fn)
         source_key = filename.split("_")[-1].replace(".json", "")
         source = SOURCE_MAP.get(source_key, "unknown")
+        files.append((filename, os.path.join(input_folder, filename), source))
+    return files
+
+def iter_clean_file(filepath: str, source: str, stats: dict):
+    """Stream cleaned recipes from one raw file, counting registered/skipped into `stats`"""
+    for _, recipe in iter_json_object(filepath):
+        cleaned = clean_recipe(recipe, source) if isinstance(recipe, dict) else None
+        if cleaned is None:
+            stats["skipped"] += 1
+            continue
+        stats["registered"] += 1
+        yield cleaned
+
+def _clean_file_to_jsonl(filepath: str, source: str, out_path: str) -> dict:
+    """Process-pool worker: clean one raw file into a JSON-lines spill file"""
+    stats = {"registered": 0, "skipped": 0}
+    with open(out_path, "w", encoding="utf-8") as f:
+        for cleaned in iter_clean_file(filepath, source, stats):
+            f.write(json.dumps(cleaned, ensure_ascii=False))
+            f.write("\n")
+    return stats
+
+def process_recipes(input_folder: str, workers: int = None):
+    """
+    Stream cleaned recipes (dicts) from every raw dataset file, one at a time.
+
+    With `workers` > 1 the files are parsed and cleaned in a process pool.
+    Each worker spills its file to a temporary JSON-lines file and the
+    recipes are streamed back in file order, so output order and memory use
+    match the single-process path.
+    """
+    workers = CLEAN_WORKERS if workers is None else workers
+    files = dataset_files(input_folder)
+
+    if workers <= 1 or len(files) <= 1:
+        for filename, filepath, source in files:
+            print("Extracting:", filename)
+            stats = {"registered": 0, "skipped": 0}
+            yield from iter_clean_file(filepath, source, stats)
+            print(f"{filename} | registered = {stats['registered']} | skipped = {stats['skipped']}")
+        return
+
+    with tempfile.TemporaryDirectory(prefix="recipes_clean_") as spill_dir, \
+            ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+        futures = []
+        for i, (filename, filepath, source) in enumerate(files):
+            print("Extracting:", filename)
+            out_path = os.path.join(spill_dir, f"{i}.jsonl")
+            futures.append((filename, out_path, pool.submit(_clean_file_to_jsonl, filepath, source, out_path)))
+        try:
+            for filename, out_path, future in futures:
+                stats = future.result()
+                print(f"{filename} | registered = {stats['registered']} | skipped = {stats['skipped']}")
+                with open(out_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        yield json.loads(line)
+                os.remove(out_path)
+        finally:
+            for _, _, future in futures:
+                future.cancel()
 
-        filepath = os.path.join(input_folder, filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            raw_data = json.load(f)
+def batched(iterable, size: int):
+    """Yield lists of up to `size` items from any iterable"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-        skips = 0
-        registered = 0
+def peak_rss_mb(children: bool = False):
+    """
+    Peak resident set size in MB of this process, or with `children=True` of
+    its largest finished child process (the cleaning workers), which the OS
+    reports separately. None where the platform has no such figure.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        if children:
+            return None
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
 
-        for _, recipe in raw_data.items():
+# ---------------------
+# Sinks: each takes batches of cleaned recipes
+# ---------------------
+
+class FileSink:
+    """Stream recipes into a JSON array file (same layout as json.dump(indent=2))"""
+
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.count = 0
+        self._f = open(output_file, "w", encoding="utf-8")
+        self._f.write("[")
+
+    def write(self, batch):
+        for r in batch:
+            item = json.dumps(r, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+            self._f.write(("," if self.count else "") + "\n  " + item)
+            self.count += 1
+
+    def close(self, completed=True):
+        self._f.write("\n]" if self.count else "]")
+        self._f.close()
+        print(f"Saved {self.count} recipes -> {self.output_file}")
+
+class MongoSink:
+    """Insert recipes into MongoDB batch by batch"""
+
+    def __init__(self, overwrite=False):
+        client = MongoClient(MONGO_URI)
+        db = client[DB_NAME]
+        self.collection = db[RECIPE_COLLECTION]
+        self.count = 0
+        self.enabled = True
+
+        existing_count = self.collection.count_documents({})
+        if existing_count > 0 and not overwrite:
+            print(f"Collection '{RECIPE_COLLECTION}' already has {existing_count} recipes. Skipping (use --overwrite or --append).")
+            self.enabled = False
+            return
+
+        if overwrite:
+            self.collection.delete_many({})
+            print(f"Cleared existing recipes in '{RECIPE_COLLECTION}'")
+
+    def write(self, batch):
+        if not self.enabled or not batch:
+            return
+        # insert_many adds _id to the dicts it gets, so hand it copies
+        self.collection.insert_many([dict(r) for r in batch])
+        self.count += len(batch)
+
+    def close(self, completed=True):
+        if self.enabled:
+            print(f"Inserted {self.count} recipes into MongoDB collection '{RECIPE_COLLECTION}'")
+
+class QdrantSink:
+    """
+    Embed and upsert recipes into Qdrant while the stream is still being read.
+
+    Embedded points go through a bounded queue to an upsert thread that sends
+    them in batches of `upsert_batch_size`. After each batch is committed
+    the stream offset is checkpointed, so `resume=True` skips the recipes
+    an interrupted run already stored.
+
+    Point IDs are content hashes (see `recipe_id`). When the collection is
+    kept (`overwrite=False`), the IDs already stored are loaded first, only
+    new or changed recipes are embedded, and after a complete run the
+    points whose recipe is gone are deleted.
+
+    Vectors are read from and written to the on-disk embedding cache (see
+    `EmbeddingCache`), so rebuilding the collection or moving it to another
+    Qdrant only embeds recipe texts that were never embedded before.
+    `compact_cache=True` drops cache rows for recipes no longer in the
+    input after a complete run.
+
+    `hnsw_m`, `ef_construct`, `quantize` and `on_disk` tune the collection
+    (see `collection_config`); on a kept collection they are applied with
+    `update_collection`. `payload_indexes=True` creates keyword indexes on
+    the fields in QDRANT_PAYLOAD_INDEXES.
+    """
+
+    # Upsert batches allowed to wait in the queue before embedding blocks
+    QUEUE_SIZE = 4
+
+    def __init__(self, path=None, url=None, api_key=None, overwrite=True, resume=False,
+                 upsert_batch_size=UPSERT_BATCH_SIZE, checkpoint_file=CHECKPOINT_FILE,
+                 cache: EmbeddingCache = None, compact_cache=False,
+                 hnsw_m=None, ef_construct=None, quantize=False, on_disk=False, payload_indexes=False):
+        if path:
+            print(f"Using local Qdrant path: {path}")
+            self.qclient = QdrantClient(path=path)
+        elif url and api_key:
+            print(f"Using Qdrant cloud URL: {url}")
+            self.qclient = QdrantClient(url=url, api_key=api_key)
+        elif url:
+            print(f"Using Qdrant server URL: {url}")
+            self.qclient = QdrantClient(url=url)
+        else:
+            print("Using in-memory Qdrant instance")
+            self.qclient = QdrantClient(":memory:")
+
+        self.target = path or url or ":memory:"
+        self.checkpoint_file = checkpoint_file
+        self.upsert_batch_size = upsert_batch_size
+        self.resume_from = self._load_checkpoint() if resume else 0
+        if resume:
+            print(f"Resuming after {self.resume_from} recipes already committed to Qdrant")
+
+        if overwrite and not resume:
+           self.qclient.delete_collection(collection_name=QDRANT_COLLECTION) 
+        if not self.qclient.collection_exists(QDRANT_COLLECTION):
+            self.qclient.create_collection(
+                collection_name=QDRANT_COLLECTION,
+                **collection_config(hnsw_m, ef_construct, quantize, on_disk),
+            )
+            print(f"Created/Recreated Qdrant collection '{QDRANT_COLLECTION}'")
+            self.resume_from = 0
+        else:
+            tune_collection(self.qclient, QDRANT_COLLECTION, hnsw_m, ef_construct, quantize, on_disk)
+        if payload_indexes:
+            create_payload_indexes(self.qclient)
+            print(f"Payload indexes on {', '.join(QDRANT_PAYLOAD_INDEXES)}")
+        self._save_checkpoint(self.resume_from)
+
+        # Content-addressed sync against what the collection already holds
+        self.sync = not overwrite
+        self.existing = self._existing_ids() if self.sync else set()
+        self.live_ids = set()
+        self.unchanged = 0
+        if self.sync:
+            print(f"Found {len(self.existing)} existing points in '{QDRANT_COLLECTION}'")
+
+        self.count = 0
+        self.seen = 0
+        # Batched embed requests; concurrency adapts to what the local Ollama sustains
+        self._embedder = BatchEmbedder()
+        self.cache = cache
+        self.compact_cache = compact_cache and cache is not None
+        self.live_keys = set()
+        if cache is not None:
+            print(f"Embedding cache {cache.directory}: {len(cache)} vectors")
+        self._progress = tqdm(desc="Embedding recipes", unit="recipe", initial=self.resume_from)
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._error = None
+        self._upserter = threading.Thread(target=self._upsert_loop, daemon=True)
+        self._upserter.start()
+
+    def _existing_ids(self) -> set:
+        ids = set()
+        offset = None
+        while True:
+            points, offset = self.qclient.scroll(
+                collection_name=QDRANT_COLLECTION,
+                limit=10_000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.update(str(p.id) for p in points)
+            if offset is None:
+                return ids
+
+    def _load_checkpoint(self) -> int:
+        try:
+            with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if state.get("collection") != QDRANT_COLLECTION or state.get("target") != self.target:
+            print(f"Checkpoint {self.checkpoint_file} belongs to another collection, starting over")
+            return 0
+        return int(state.get("committed", 0))
+
+    def _save_checkpoint(self, committed: int):
+        tmp_file = f"{self.checkpoint_file}.tmp"
+        os.makedirs(os.path.dirname(self.checkpoint_file) or ".", exist_ok=True)
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"collection": QDRANT_COLLECTION, "target": self.target, "committed": committed}, f)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def _upsert_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error:
+                continue
+            end_offset, points = item
             try:
-                title = recipe.get("title", "").strip()
-                ingredients = recipe.get("ingredients", [])
-                instructions = recipe.get("instructions", "").strip()
-
-                if not title or not ingredients or not instructions:
-                    skips += 1
-                    continue
-
-                cleaned_ingredients = [clean_ingredient(i) for i in ingredients if i]
-                cleaned_ingredients = [i for i in cleaned_ingredients if i]
-
-                if not cleaned_ingredients:
-                    skips += 1
-                    continue
-                diet = classify_diet(cleaned_ingredients)
-                cleaned_data.append({
-                    "title": title,
-                    "ingredients": cleaned_ingredients,
-                    "instructions": instructions,
-                    "diet": diet,
-                    "source": source
-                })
-                registered += 1
-
-            except Exception:
-                skips += 1
+                if points:
+                    self.qclient.upsert(
+                        collection_name=QDRANT_COLLECTION,
+                        points=points,
+                        wait=True,
+                    )
+                self.count += len(points)
+                self._save_checkpoint(end_offset)
+            except Exception as e:
+                self._error = e
+
+    def _put(self, item):
+        # Never block forever on a full queue if the upsert thread has failed
+        while True:
+            if self._error:
+                raise self._error
+            try:
+                self._queue.put(item, timeout=1)
+                return
+            except queue.Full:
                 continue
 
-        print(f"{filename} | registered = {registered} | skipped = {skips}")
+    def write(self, batch):
+        start = self.seen
+        self.seen += len(batch)
+        ids = [recipe_id(r) for r in batch]
+        # Every recipe in the stream counts as live, including ones skipped on resume
+        fresh = [pid not in self.live_ids and pid not in self.existing for pid in ids]
+        self.unchanged += sum(1 for pid in ids if pid in self.existing and pid not in self.live_ids)
+        self.live_ids.update(ids)
+        if self.compact_cache:
+            self.live_keys.update(content_key(recipe_text(r)) for r in batch)
+        if self.seen <= self.resume_from:
+            return
+        if start < self.resume_from:
+            batch = batch[self.resume_from - start:]
+            fresh = fresh[self.resume_from - start:]
+            start = self.resume_from
 
-    return cleaned_data
+        batch = [r for r, is_fresh in zip(batch, fresh) if is_fresh]
+        if not batch:
+            # Still advance the checkpoint past recipes that needed no work
+            self._put((self.seen, []))
+            return
+        points = make_points(batch, self._embedder, self.cache)
+        self._progress.update(len(points))
+        self._progress.set_postfix(workers=self._embedder.tuner.workers)
+        for i in range(0, len(points), self.upsert_batch_size):
+            chunk = points[i:i + self.upsert_batch_size]
+            last = i + self.upsert_batch_size >= len(points)
+            # Offsets count stream positions, so the final chunk commits the whole batch
+            self._put((self.seen if last else start, chunk))
 
-def save_to_mongo(data, overwrite=False):
-    client = MongoClient(MONGO_URI)
-    db = client[DB_NAME]
-    collection = db[RECIPE_COLLECTION]
+    def _prune(self):
+        """Delete points whose recipe no longer appears in the input"""
+        gone = list(self.existing - self.live_ids)
+        for i in range(0, len(gone), self.upsert_batch_size):
+            self.qclient.delete(
+                collection_name=QDRANT_COLLECTION,
+                points_selector=models.PointIdsList(points=gone[i:i + self.upsert_batch_size]),
+                wait=True,
+            )
+        return len(gone)
 
-    existing_count = collection.count_documents({})
-    if existing_count > 0 and not overwrite:
-        print(f"Collection '{RECIPE_COLLECTION}' already has {existing_count} recipes. Skipping (use --overwrite or --append).")
-        return
+    def close(self, completed=True):
+        self._queue.put(None)
+        self._upserter.join()
+        self._embedder.close()
+        self._progress.close()
+        if self._error:
+            raise self._error
+        print("Upserted", self.count, "points to Qdrant collection", QDRANT_COLLECTION)
+        # Only a complete pass over the input can tell which recipes are gone
+        if self.sync and completed:
+            removed = self._prune()
+            print(f"Qdrant sync: {self.unchanged} unchanged, {self.count} new or changed, {removed} removed")
+        if self.compact_cache and completed:
+            dropped = self.cache.compact(self.live_keys)
+            print(f"Embedding cache compacted: dropped {dropped}, kept {len(self.cache)} vectors")
+
+class IngredientIndexSink:
+    """Build the inverted ingredient index used by hybrid/lexical search"""
+
+    def __init__(self, directory=INGREDIENT_INDEX_DIR):
+        self._writer = IngredientIndexWriter(directory)
+
+    def write(self, batch):
+        for r in batch:
+            self._writer.add(recipe_id(r), r["ingredients"], r.get("diet"))
+
+    def close(self, completed=True):
+        # Only a complete pass covers every recipe; otherwise keep the previous index
+        self._writer.close(completed)
+
+class RecipeStoreSink:
+    """Write full recipes to the recipe store that backs the slim vector payloads"""
+
+    def __init__(self, directory=RECIPE_STORE_DIR):
+        self._writer = RecipeStoreWriter(directory)
+
+    def write(self, batch):
+        for r in batch:
+            self._writer.add(recipe_id(r), r)
+
+    def close(self, completed=True):
+        # Only a complete pass covers every recipe; otherwise keep the previous store
+        self._writer.close(completed)
+
+class MatrixSink:
+    """Embed recipes (through the embedding cache) into a RecipeMatrix for the numpy search backend"""
+
+    def __init__(self, directory=RECIPE_MATRIX_DIR, cache: EmbeddingCache = None):
+        self.cache = cache
+        self._embedder = BatchEmbedder()
+        self._writer = RecipeMatrixWriter(directory)
+        self._progress = tqdm(desc="Recipe matrix", unit="recipe")
+
+    def write(self, batch):
+        texts = [recipe_text(r) for r in batch]
+        vectors = embed_cached(texts, self._embedder.embed, self.cache)
+        self._writer.add(np.stack(vectors), [slim_payload(r) for r in batch], [recipe_id(r) for r in batch])
+        self._progress.update(len(batch))
 
-    if overwrite:
-        collection.delete_many({})
-        print(f"Cleared existing recipes in '{RECIPE_COLLECTION}'")
+    def close(self, completed=True):
+        self._embedder.close()
+        self._progress.close()
+        # An interrupted build leaves the previous matrix in place
+        self._writer.close(completed)
 
-    if data:
-        collection.insert_many(data)
-        print(f"Inserted {len(data)} recipes into MongoDB collection '{RECIPE_COLLECTION}'")
+def run_sinks(data, sinks, batch_size=INGEST_BATCH_SIZE):
+    """Feed one stream of recipes through every sink in bounded batches"""
+    completed = False
+    try:
+        for batch in batched(data, batch_size):
+            for sink in sinks:
+                sink.write(batch)
+        completed = True
+    finally:
+        for sink in sinks:
+            sink.close(completed)
+
+def save_to_mongo(data, overwrite=False):
+    run_sinks(data, [MongoSink(overwrite=overwrite)])
 
 def save_to_file(data, output_file):
-    with open(output_file, "w", encoding="utf-8") as f: 
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    print(f"Saved {len(data)} recipes -> {output_file}")
+    run_sinks(data, [FileSink(output_file)])
         
-def save_to_qdrant(data, path=None, url=None, api_key=None, overwrite=True):
-    if path:
-        print(f"Using local Qdrant path: {path}")
-        qclient = QdrantClient(path=path)
-    elif url and api_key:
-        print(f"Using Qdrant cloud URL: {url}")
-        qclient= QdrantClient(url=url, api_key=api_key)
-    elif url:
-        print(f"Using Qdrant server URL: {url}")
-        qclient = QdrantClient(url=url)
-    else:
-        print("Using in-memory Qdrant instance")
-        qclient = QdrantClient(":memory:")
-        
-    if overwrite:
-       qclient.delete_collection(collection_name=QDRANT_COLLECTION) 
-    if not qclient.collection_exists(QDRANT_COLLECTION):
-        qclient.create_collection(
-            collection_name=QDRANT_COLLECTION,
-            vectors_config=models.VectorParams(
-                size=768,
-                distance=models.Distance.COSINE,
-            )
-        )
-        print(f"Created/Recreated Qdrant collection '{QDRANT_COLLECTION}'")
-    print("Embedding recipes")
-    points = []
-    with ThreadPoolExecutor(max_workers=16) as executor:  # adjust workers based on CPU
-        futures = {executor.submit(make_point, r): r for r in data}
-        for future in tqdm(as_completed(futures), total=len(data), desc="Embedding recipes"):
-            points.append(future.result())
-    print("Upserting to Qdrant")
-    if points:
-        qclient.upsert(
-            collection_name=QDRANT_COLLECTION,
-            points=points
-        )
-    print("Upserted", len(points), "points to Qdrant collection", QDRANT_COLLECTION)
+def save_to_qdrant(data, path=None, url=None, api_key=None, overwrite=True, resume=False, use_cache=True):
+    cache = get_embedding_cache() if use_cache else None
+    run_sinks(data, [QdrantSink(path=path, url=url, api_key=api_key, overwrite=overwrite, resume=resume, cache=cache), RecipeStoreSink()])
 
-def search_recipes_qdrant(
-    item_list: list[str],
-    top_k: int = 5,
-    diet: str = None,
-    path: str = None,
-    url: str = None,
-    api_key: str = None,
-):
-    """Search Qdrant for recipes matching the given list of items."""
-    # optional diet filter
-    qfilter = None
+def query_cache():
+    """Embedding cache for search queries, or None when EMBEDDING_CACHE=off"""
+    if os.getenv("EMBEDDING_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return get_embedding_cache()
+
+def _search_requests(queries, diet: str = None, limit: int = 10, point_ids: list = None) -> list:
+    must = []
     if diet:
-        qfilter = models.Filter(
-            must=[models.FieldCondition(key="diet", match=models.MatchValue(value=diet))]
+        must.append(models.FieldCondition(key="diet", match=models.MatchValue(value=diet)))
+    if point_ids is not None:
+        must.append(models.HasIdCondition(has_id=list(point_ids)))
+    qfilter = models.Filter(must=must) if must else None
+    return [
+        models.SearchRequest(
+            vector=vector.tolist(),
+            filter=qfilter,
+            params=search_params(),
+            limit=limit,
+            with_payload=PAYLOAD_FIELDS,
         )
-    if not qclient:
-        init_qdrant(path=path, url=url, api_key=api_key)
-    # Embed all items together
-    query_text = "\n".join(item_list)
-    vector = embed_text(query_text)  # your embedding function
-
-    # Search Qdrant
-    hits = qclient.search(
+        for vector in queries
+    ]
+
+def dense_search(queries, diet: str = None, limit: int = 10, point_ids: list = None) -> list:
+    """One ranked hit list per query vector from the configured backend, optionally restricted to `point_ids`"""
+    if RECIPE_SEARCH_BACKEND == "numpy":
+        return get_recipe_matrix().search_batch(queries, diet=diet, limit=limit, point_ids=point_ids)
+    # All queries in one round trip
+    return qclient.search_batch(collection_name=QDRANT_COLLECTION, requests=_search_requests(queries, diet, limit, point_ids))
+
+async def dense_search_async(queries, diet: str = None, limit: int = 10, point_ids: list = None) -> list:
+    """dense_search that awaits a Qdrant server; the numpy and local path scans are CPU-bound and run in a thread"""
+    if RECIPE_SEARCH_BACKEND == "numpy" or aqclient is None:
+        return await asyncio.to_thread(dense_search, queries, diet, limit, point_ids)
+    return await aqclient.search_batch(collection_name=QDRANT_COLLECTION, requests=_search_requests(queries, diet, limit, point_ids))
+
+def _set_payloads(missing, points):
+    payloads = {str(p.id): p.payload for p in points}
+    for hit in missing:
+        hit.payload = payloads.get(str(hit.id), {})
+
+def fetch_payloads(hits):
+    """Fill in payloads of hits that came from the ingredient index"""
+    missing = [hit for hit in hits if hit.payload is None]
+    if not missing:
+        return
+    if RECIPE_SEARCH_BACKEND == "numpy":
+        matrix = get_recipe_matrix()
+        for hit in missing:
+            rows = matrix.rows_for([hit.id])
+            hit.payload = matrix.payload(int(rows[0])) if len(rows) else {}
+        return
+    points = qclient.retrieve(
+        collection_name=QDRANT_COLLECTION,
+        ids=[hit.id for hit in missing],
+        with_payload=PAYLOAD_FIELDS,
+        with_vectors=False,
+    )
+    _set_payloads(missing, points)
+
+async def fetch_payloads_async(hits):
+    """fetch_payloads that awaits a Qdrant server"""
+    missing = [hit for hit in hits if hit.payload is None]
+    if not missing:
+        return
+    if RECIPE_SEARCH_BACKEND == "numpy" or aqclient is None:
+        await asyncio.to_thread(fetch_payloads, missing)
+        return
+    points = await aqclient.retrieve(
         collection_name=QDRANT_COLLECTION,
-        query_vector=vector,
-        query_filter=qfilter,
-        limit=top_k * 2,  # fetch extra for deduplication
+        ids=[hit.id for hit in missing],
+        with_payload=PAYLOAD_FIELDS,
+        with_vectors=False,
     )
+    _set_payloads(missing, points)
+
+def _stored_details(point_ids: list) -> dict:
+    try:
+        return get_recipe_store().get_many(point_ids)
+    except FileNotFoundError:
+        return {}
+
+def _full_payloads(point_ids: list, points) -> dict:
+    by_id = {str(p.id): p.payload for p in points}
+    return {pid: by_id[str(pid)] for pid in point_ids if "ingredients" in by_id.get(str(pid), {})}
+
+def recipe_details(point_ids: list) -> dict:
+    """
+    Full recipes (ingredients, instructions, ...) by point ID.
+
+    Read from the local recipe store; recipes it does not hold (collections
+    indexed before payloads were slimmed) fall back to their vector payload.
+    """
+    found = _stored_details(point_ids)
+    missing = [pid for pid in point_ids if pid not in found]
+    if not missing:
+        return found
+    if RECIPE_SEARCH_BACKEND == "numpy":
+        matrix = get_recipe_matrix()
+        for pid in missing:
+            rows = matrix.rows_for([pid])
+            payload = matrix.payload(int(rows[0])) if len(rows) else {}
+            if "ingredients" in payload:
+                found[pid] = payload
+    elif qclient:
+        points = qclient.retrieve(collection_name=QDRANT_COLLECTION, ids=missing, with_payload=True, with_vectors=False)
+        found.update(_full_payloads(missing, points))
+    return found
+
+async def recipe_details_async(point_ids: list) -> dict:
+    """recipe_details that awaits a Qdrant server for recipes missing from the store"""
+    # Opening the store and decompressing records is disk and CPU work
+    found = await asyncio.to_thread(_stored_details, point_ids)
+    missing = [pid for pid in point_ids if pid not in found]
+    if not missing:
+        return found
+    if RECIPE_SEARCH_BACKEND == "numpy" or aqclient is None:
+        found.update(await asyncio.to_thread(recipe_details, missing))
+    else:
+        points = await aqclient.retrieve(collection_name=QDRANT_COLLECTION, ids=missing, with_payload=True, with_vectors=False)
+        found.update(_full_payloads(missing, points))
+    return found
+
+def coverage_index():
+    """The ingredient index for coverage re-ranking, or None if it is missing or predates the coverage matrix"""
+    global _coverage_warned
+    try:
+        index = get_ingredient_index()
+    except FileNotFoundError:
+        index = None
+    if index is not None and index.coverage_matrix is not None:
+        return index
+    if not _coverage_warned:
+        _coverage_warned = True
+        print(f"No ingredient coverage matrix in {INGREDIENT_INDEX_DIR}; rebuild the index to enable coverage re-ranking")
+    return None
+
+_coverage_warned = False
+
+def _cache_key(item_list, top_k, diet, offer_keys, pantry_items) -> str:
+    # Cached candidates only depend on the pantry when the lexical pass uses it;
+    # coverage re-ranking runs per request, so dense results are shared across users
+    if RECIPE_SEARCH_MODE in ("hybrid", "lexical"):
+        extra = [RECIPE_SEARCH_MODE, sorted(pantry_items or [])]
+    else:
+        extra = None
+    return get_retrieval_cache().key(item_list, diet, top_k, offer_keys, extra)
+
+def lexical_hits(item_list: list[str], pantry_items: list[str] = None, diet: str = None) -> list:
+    """Best LEXICAL_CANDIDATES recipes by BM25 over the ingredient index ([] in dense mode)"""
+    if RECIPE_SEARCH_MODE not in ("hybrid", "lexical"):
+        return []
+    terms = query_terms(item_list, pantry_items, PANTRY_WEIGHT)
+    return [
+        LexicalHit(pid, score)
+        for pid, score in get_ingredient_index().search(terms, LEXICAL_CANDIDATES, diet=diet)
+    ]
 
-    # Deduplicate by title
+def _dense_candidates(lexical: list, top_k: int):
+    # With enough lexical candidates, the dense pass only scores those
+    return [hit.id for hit in lexical] if len(lexical) >= top_k * 2 else None
+
+def _fuse(batches, lexical: list, top_k: int) -> list:
+    """Fused dense and lexical ranking, cut to the candidates coverage re-ranking may reorder"""
+    keep = max(COVERAGE_CANDIDATES if COVERAGE_WEIGHT > 0 else 0, top_k * 3)
+    if batches is None:
+        return [(hit, hit.score) for hit in lexical[:keep]]
+    if lexical:
+        # Lexical ranking weighs as much as all dense lists together (times LEXICAL_WEIGHT)
+        return rrf_fuse(batches + [lexical], weights=[1.0] * len(batches) + [LEXICAL_WEIGHT * len(batches)])[:keep]
+    return rrf_fuse(batches)[:keep]
+
+def _candidates(ranked) -> list:
+    """Fused hits as cacheable dicts: id, fused score and the slim payload (payloads must be fetched)"""
+    return [
+        {"id": str(hit.id), "score": score, **{field: hit.payload.get(field) for field in PAYLOAD_FIELDS}}
+        for hit, score in ranked
+    ]
+
+def _rank(candidates: list, item_list: list[str], pantry_items: list[str], top_k: int):
+    """Re-rank cached candidates by this request's coverage: ([(hit, score)], coverage by point ID)"""
+    ranked = []
+    for c in candidates:
+        hit = LexicalHit(c["id"], c["score"])
+        hit.payload = c
+        ranked.append((hit, c["score"]))
+    coverage = {}
+    index = coverage_index() if COVERAGE_WEIGHT > 0 else None
+    if index is not None:
+        ranked, coverage = coverage_rerank(ranked, index, item_list, pantry_items)
+    return ranked[:top_k * 3], coverage
+
+def _results(ranked, coverage: dict, top_k: int) -> list:
+    """Result dicts for the best `top_k` distinct titles (payloads must be fetched)"""
     seen_titles = set()
     results = []
-    for hit in hits:
+    for hit, score in ranked:
         title = hit.payload.get("title")
         if title and title not in seen_titles:
             seen_titles.add(title)
             results.append({
-                "score": hit.score,
+                "id": str(hit.id),
+                "score": score,
+                "coverage": coverage.get(hit.id, (0.0, 0.0, 0.0))[2],
                 "title": title,
-                "ingredients": hit.payload.get("ingredients"),
-                "instructions": hit.payload.get("instructions"),
                 "diet": hit.payload.get("diet"),
                 "source": hit.payload.get("source"),
             })
         if len(results) >= top_k:
             break
+    return results
+
+def _add_ingredients(results: list, details: dict):
+    for r in results:
+        r["ingredients"] = details.get(r["id"], {}).get("ingredients") or []
+
+def search_recipes_qdrant(
+    item_list: list[str],
+    top_k: int = 5,
+    diet: str = None,
+    path: str = None,
+    url: str = None,
+    api_key: str = None,
+    offer_keys: list = None,
+    pantry_items: list[str] = None,
+):
+    """
+    Search Qdrant for recipes matching the given list of items.
+
+    Each item (or group of OFFER_GROUP_SIZE items) gets its own query
+    vector, all queries go to Qdrant in one batch request, and the ranked
+    lists are merged by reciprocal-rank fusion. The fused candidates are
+    cached per offer set, diet and top_k (see `RetrievalCache`), so repeated
+    plans on the same day skip embedding and search, also across users.
+
+    RECIPE_SEARCH_MODE=hybrid first ranks recipes by BM25 over the
+    ingredient index (offer and pantry terms), restricts the dense search
+    to the best LEXICAL_CANDIDATES of them, and fuses the lexical ranking
+    in with weight LEXICAL_WEIGHT. RECIPE_SEARCH_MODE=lexical skips the
+    dense search entirely.
 
+    The best COVERAGE_CANDIDATES are then re-ranked by how much of each
+    recipe the pantry and the offers cover (see `coverage_rerank`), with
+    weight COVERAGE_WEIGHT. This runs on every call, cached or not.
+
+    Args:
+        item_list (List[str]): Offer names (translated).
+        top_k (int, optional): Recipes to return. Defaults to 5.
+        diet (str, optional): Only return recipes with this diet label.
+        path, url, api_key (str, optional): Qdrant location if no client is initialised yet.
+        offer_keys (List[Tuple[str, str]], optional): (store, date) per item, so offer
+            vectors are embedded once per day and shared across users.
+        pantry_items (List[str], optional): Pantry item names, used by the lexical pass
+            and coverage re-ranking.
+
+    Returns:
+        List[Dict[str, Any]]: Recipes (id, title, ingredients, diet, source) with their final score
+        and combined coverage, best first. Instructions are left out; get them for the recipes
+        that are shown with `recipe_details`.
+    """
+    if not item_list:
+        return []
+    cache = get_retrieval_cache()
+    cache_key = _cache_key(item_list, top_k, diet, offer_keys, pantry_items)
+    candidates = cache.get(cache_key)
+    if candidates is None:
+        candidates = _search_candidates(item_list, top_k, diet, path, url, api_key, offer_keys, pantry_items)
+        # An empty result may just mean the index is still being built
+        if candidates:
+            cache.put(cache_key, candidates)
+
+    ranked, coverage = _rank(candidates, item_list, pantry_items, top_k)
+    results = _results(ranked, coverage, top_k)
+    # Ingredients for the prompt come from the local store, for the final results only
+    _add_ingredients(results, recipe_details([r["id"] for r in results]))
     return results
-    
+
+def _search_candidates(item_list, top_k, diet, path, url, api_key, offer_keys, pantry_items) -> list:
+    if not qclient and RECIPE_SEARCH_BACKEND != "numpy":
+        # Concurrent first searches must not each open the client (local mode locks its path)
+        with _qdrant_lock:
+            if not qclient:
+                init_qdrant(path=path, url=url, api_key=api_key)
+
+    lexical = lexical_hits(item_list, pantry_items, diet)
+    batches = None
+    if RECIPE_SEARCH_MODE != "lexical":
+        # One vector per offer; names not embedded yet today go to Ollama in one batch
+        vectors = offer_vectors(
+            item_list,
+            offer_keys,
+            lambda names: embed_cached(names, embed_texts, query_cache()),
+        )
+        # top_k * 2: extra for deduplication
+        batches = dense_search(group_vectors(vectors), diet=diet, limit=top_k * 2, point_ids=_dense_candidates(lexical, top_k))
+    ranked = _fuse(batches, lexical, top_k)
+    fetch_payloads([hit for hit, _ in ranked])
+    return _candidates(ranked)
+
+async def search_recipes_async(
+    item_list: list[str],
+    top_k: int = 5,
+    diet: str = None,
+    offer_keys: list = None,
+    pantry_items: list[str] = None,
+):
+    """
+    search_recipes_qdrant for an asyncio app, using the clients from `init_async_search`.
+
+    Query embedding and Qdrant server round trips are awaited on the event
+    loop, so concurrent plans overlap their network waits instead of each
+    holding a worker thread. CPU-bound and disk steps (BM25 scoring, local
+    path or numpy scans, coverage re-ranking, recipe store reads) run in a
+    thread. Shares the retrieval cache with the
+    sync version and returns the same results.
+    """
+    if not item_list:
+        return []
+    cache = get_retrieval_cache()
+    cache_key = _cache_key(item_list, top_k, diet, offer_keys, pantry_items)
+    candidates = cache.get(cache_key)
+    if candidates is None:
+        candidates = await _search_candidates_async(item_list, top_k, diet, offer_keys, pantry_items)
+        if candidates:
+            cache.put(cache_key, candidates)
+
+    # Loading the ingredient index (first use) and the sparse coverage product run in a thread
+    ranked, coverage = await asyncio.to_thread(_rank, candidates, item_list, pantry_items, top_k)
+    results = _results(ranked, coverage, top_k)
+    _add_ingredients(results, await recipe_details_async([r["id"] for r in results]))
+    return results
+
+async def _embed_queries_async(names: list[str]) -> list:
+    # Opening the cache takes its file lock and reads the key list, so it stays off the event loop
+    cache = await asyncio.to_thread(query_cache)
+    return await embed_cached_async(names, embed_texts_async, cache)
+
+async def _search_candidates_async(item_list, top_k, diet, offer_keys, pantry_items) -> list:
+    lexical = []
+    if RECIPE_SEARCH_MODE in ("hybrid", "lexical"):
+        lexical = await asyncio.to_thread(lexical_hits, item_list, pantry_items, diet)
+    batches = None
+    if RECIPE_SEARCH_MODE != "lexical":
+        vectors = await offer_vectors_async(
+            item_list,
+            offer_keys,
+            _embed_queries_async,
+        )
+        batches = await dense_search_async(group_vectors(vectors), diet=diet, limit=top_k * 2, point_ids=_dense_candidates(lexical, top_k))
+    ranked = _fuse(batches, lexical, top_k)
+    await fetch_payloads_async([hit for hit, _ in ranked])
+    return _candidates(ranked)
 
 
 
@@ -258,25 +1135,68 @@ def main():
     parser.add_argument("--to-file", action="store_true", help="Save cleaned recipes to JSON file")
     parser.add_argument("--to-mongo", action="store_true", help="Save cleaned recipes to MongoDB")
     parser.add_argument("--to-qdrant", action="store_true", help="Save recipes to Qdrant")
-    parser.add_argument("--append", action="store_true", help="Append to existing data")
+    parser.add_argument("--to-matrix", action="store_true", help="Save recipes to the NumPy recipe matrix (RECIPE_SEARCH_BACKEND=numpy)")
+    parser.add_argument("--append", action="store_true", help="Keep existing data (Qdrant: embed only new/changed recipes and remove deleted ones)")
     parser.add_argument("--qdrant-path", type=str, help="Local Qdrant path for persistence")
     parser.add_argument("--qdrant-url", type=str, help="Qdrant server URL")
     parser.add_argument("--qdrant-key", type=str, help="Qdrant API key (for cloud)")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted --to-qdrant run from its checkpoint")
+    parser.add_argument("--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE, help="Points per Qdrant upsert")
+    parser.add_argument("--payload-indexes", action="store_true", help="Create keyword payload indexes on diet and source")
+    parser.add_argument("--quantize", action="store_true", help="Scalar int8 quantization (rescored with the original vectors at search time)")
+    parser.add_argument("--hnsw-m", type=int, help="HNSW graph degree (Qdrant default 16)")
+    parser.add_argument("--hnsw-ef-construct", type=int, help="HNSW build beam width (Qdrant default 100)")
+    parser.add_argument("--on-disk-vectors", action="store_true", help="Keep original vectors on disk instead of in RAM")
+    parser.add_argument("--no-ingredient-index", action="store_true", help="Do not rebuild the ingredient index with --to-qdrant/--to-matrix")
+    parser.add_argument("--no-recipe-store", action="store_true", help="Do not rebuild the recipe store with --to-qdrant/--to-matrix")
+    parser.add_argument("--workers", type=int, default=CLEAN_WORKERS, help="Processes used to clean the dataset files")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Embed every recipe instead of reusing the on-disk embedding cache")
+    parser.add_argument("--compact-embedding-cache", action="store_true", help="After a complete --to-qdrant run, drop cached vectors of recipes no longer in the input")
     
     args=parser.parse_args()
-    data=process_recipes(INPUT_FOLDER)
-    
+
+    sinks = []
     if args.to_file:
-        save_to_file(data, OUTPUT_FILE)
+        sinks.append(FileSink(OUTPUT_FILE))
     if args.to_mongo:
-        save_to_mongo(data, overwrite=not args.append)
-        
+        sinks.append(MongoSink(overwrite=not args.append))
     if args.to_qdrant:
         os.makedirs('qdrantdb', exist_ok=True)
-        save_to_qdrant(data, path=args.qdrant_path, url=args.qdrant_url, api_key=args.qdrant_key, overwrite=not args.append)
+        sinks.append(QdrantSink(
+            path=args.qdrant_path,
+            url=args.qdrant_url,
+            api_key=args.qdrant_key,
+            overwrite=not args.append,
+            resume=args.resume,
+            upsert_batch_size=args.upsert_batch_size,
+            cache=None if args.no_embedding_cache else get_embedding_cache(),
+            compact_cache=args.compact_embedding_cache,
+            hnsw_m=args.hnsw_m,
+            ef_construct=args.hnsw_ef_construct,
+            quantize=args.quantize,
+            on_disk=args.on_disk_vectors,
+            payload_indexes=args.payload_indexes,
+        ))
 
+    if args.to_matrix:
+        sinks.append(MatrixSink(cache=None if args.no_embedding_cache else get_embedding_cache()))
 
-if __name__ == "__main__":
-    main()
+    if (args.to_qdrant or args.to_matrix) and not args.no_ingredient_index:
+        sinks.append(IngredientIndexSink())
+    # Vector payloads are slim, so the full recipes are stored alongside
+    if (args.to_qdrant or args.to_matrix) and not args.no_recipe_store:
+        sinks.append(RecipeStoreSink())
+
+    # Recipes stream from the raw files through every sink without being collected
+    run_sinks(process_recipes(INPUT_FOLDER, workers=args.workers), sinks)
+    # The cleaning pool has exited by now, so its workers are counted as children
+    parent, worker = peak_rss_mb(), peak_rss_mb(children=True)
+    if worker:
+        print(f"Peak RSS: {parent:.0f} MB main process, {worker:.0f} MB largest cleaning worker "
+              f"(up to {parent + worker * args.workers:.0f} MB with {args.workers} workers at once)")
+    else:
+        print(f"Peak RSS: {parent:.0f} MB main process (cleaning workers not measured on this platform)")
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+import json
+import zlib
+import uuid
+import shutil
+import threading
+from array import array
+
+import numpy as np
+
+# Base project directory (one level up from misc_utils)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECIPE_STORE_DIR = os.getenv("RECIPE_STORE_DIR", os.path.join(BASE_DIR, "recipe_data", "recipe_store"))
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _key(point_id) -> tuple:
+    """(high, low) 64-bit halves of a UUID point ID"""
+    raw = uuid.UUID(str(point_id)).bytes
+    return int.from_bytes(raw[:8], "big"), int.from_bytes(raw[8:], "big")
+
+
+class RecipeStore:
+    """
+    Full recipes by point ID in a directory of flat files.
+
+    Layout:
+        meta.json    record count
+        recipes.bin  zlib-compressed JSON recipes, back to back
+        offsets.i64  start of each record (count + 1 entries)
+        keys_hi.u64  high half of each point ID, sorted
+        keys_lo.u64  low half of the same point IDs
+        rows.u32     record number of each sorted key
+
+    Vector payloads only carry what search needs (title, diet, source);
+    ingredients and instructions are read from here for the recipes that
+    are actually shown. A lookup is a binary search over the memory-mapped
+    keys, so opening the store is free and pages are shared between
+    processes through the OS page cache.
+    """
+
+    def __init__(self, directory: str = RECIPE_STORE_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.count = json.load(f)["count"]
+        self.offsets = np.fromfile(os.path.join(directory, "offsets.i64"), dtype=np.int64)
+        if self.count:
+            self.keys_hi = np.memmap(os.path.join(directory, "keys_hi.u64"), dtype=np.uint64, mode="r")
+            self.keys_lo = np.memmap(os.path.join(directory, "keys_lo.u64"), dtype=np.uint64, mode="r")
+            self.rows = np.memmap(os.path.join(directory, "rows.u32"), dtype=np.uint32, mode="r")
+            self._data = np.memmap(os.path.join(directory, "recipes.bin"), dtype=np.uint8, mode="r")
+        else:
+            self.keys_hi = self.keys_lo = np.empty(0, np.uint64)
+            self.rows = np.empty(0, np.uint32)
+            self._data = np.empty(0, np.uint8)
+
+    def __len__(self):
+        return self.count
+
+    def row(self, point_id) -> int:
+        """Record number of a point ID, or -1 if the store does not hold it"""
+        hi, lo = _key(point_id)
+        start = int(np.searchsorted(self.keys_hi, np.uint64(hi), side="left"))
+        end = int(np.searchsorted(self.keys_hi, np.uint64(hi), side="right"))
+        # Keys sharing a high half are sorted by their low half
+        pos = start + int(np.searchsorted(self.keys_lo[start:end], np.uint64(lo)))
+        if pos < end and int(self.keys_lo[pos]) == lo:
+            return int(self.rows[pos])
+        return -1
+
+    def record(self, row: int) -> dict:
+        start, end = self.offsets[row], self.offsets[row + 1]
+        return json.loads(zlib.decompress(self._data[start:end]))
+
+    def get(self, point_id):
+        row = self.row(point_id)
+        return self.record(row) if row >= 0 else None
+
+    def get_many(self, point_ids) -> dict:
+        """{point ID: recipe} for the IDs the store holds"""
+        found = {}
+        for pid in point_ids:
+            recipe = self.get(pid)
+            if recipe is not None:
+                found[pid] = recipe
+        return found
+
+
+class RecipeStoreWriter:
+    """Builds a RecipeStore directory; files are swapped in atomically by `close`"""
+
+    def __init__(self, directory: str = RECIPE_STORE_DIR):
+        self.directory = directory
+        self.tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._data = open(os.path.join(self.tmp_dir, "recipes.bin"), "wb")
+        self._offsets = array("q", [0])
+        self._hi = array("Q")
+        self._lo = array("Q")
+        self._seen = set()
+        self.count = 0
+
+    def add(self, point_id, recipe: dict):
+        # Identical recipes share a point ID and are stored once
+        hi, lo = _key(point_id)
+        if (hi, lo) in self._seen:
+            return
+        self._seen.add((hi, lo))
+        self._data.write(zlib.compress(json.dumps(recipe, ensure_ascii=False).encode("utf-8")))
+        self._offsets.append(self._data.tell())
+        self._hi.append(hi)
+        self._lo.append(lo)
+        self.count += 1
+
+    def close(self, completed=True):
+        self._data.close()
+        if not completed:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            return
+        hi = np.frombuffer(self._hi, dtype=np.uint64)
+        lo = np.frombuffer(self._lo, dtype=np.uint64)
+        order = np.lexsort((lo, hi))
+        hi[order].tofile(os.path.join(self.tmp_dir, "keys_hi.u64"))
+        lo[order].tofile(os.path.join(self.tmp_dir, "keys_lo.u64"))
+        order.astype(np.uint32).tofile(os.path.join(self.tmp_dir, "rows.u32"))
+        np.frombuffer(self._offsets, dtype=np.int64).tofile(os.path.join(self.tmp_dir, "offsets.i64"))
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"count": self.count}, f)
+
+        old_dir = f"{self.directory}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.directory):
+            os.replace(self.directory, old_dir)
+        os.replace(self.tmp_dir, self.directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        size = self._offsets[-1] / (1024 * 1024)
+        print(f"Wrote {self.count} recipes ({size:.1f} MB compressed) to the recipe store at {self.directory}")
+
+
+def get_recipe_store(directory: str = RECIPE_STORE_DIR) -> RecipeStore:
+    """Return the shared RecipeStore for a directory"""
+    directory = os.path.abspath(directory)
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = RecipeStore(directory)
+        return _stores[directory]
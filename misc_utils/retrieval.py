@@ -0,0 +1,261 @@
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+from cachetools import TTLCache
+
+# Offers averaged into one query vector (1 = one search per offer). Qdrant's
+# local path mode scans every point per query, so the default keeps the
+# number of queries per $plan small; a Qdrant server handles 1 comfortably.
+OFFER_GROUP_SIZE = int(os.getenv("OFFER_GROUP_SIZE", "5"))
+# Reciprocal-rank fusion constant; larger values flatten the weight of top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Retrieval results are reused for this long; offer dates in the key already split days
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", str(6 * 3600)))
+# Approximate memory bound for cached retrieval results
+RETRIEVAL_CACHE_MB = float(os.getenv("RETRIEVAL_CACHE_MB", "32"))
+# Share of the final score given to pantry/offer coverage of a recipe (0 disables re-ranking)
+COVERAGE_WEIGHT = float(os.getenv("COVERAGE_WEIGHT", "0.3"))
+# Fused candidates that are re-ranked by coverage
+COVERAGE_CANDIDATES = int(os.getenv("COVERAGE_CANDIDATES", "200"))
+
+
+class OfferVectorCache:
+    """
+    In-memory offer name -> vector map per (store, date).
+
+    Offers only change once a day and are the same for every user, so the
+    vectors embedded for one $plan are reused by every later one. Only the
+    newest date per store is kept.
+    """
+
+    def __init__(self):
+        self._vectors = {}
+        self._dates = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, key: tuple, names) -> dict:
+        store, date = key
+        with self._lock:
+            if self._dates.get(store) != date:
+                return {}
+            vectors = self._vectors[store]
+            return {name: vectors[name] for name in names if name in vectors}
+
+    def put_many(self, key: tuple, vectors: dict):
+        store, date = key
+        with self._lock:
+            current = self._dates.get(store)
+            if current is not None and current > date:
+                return
+            if current != date:
+                # A new day of offers replaces the previous one for this store
+                self._dates[store] = date
+                self._vectors[store] = {}
+            self._vectors[store].update(vectors)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(v) for v in self._vectors.values())
+
+
+_offer_vectors = OfferVectorCache()
+
+
+def get_offer_vector_cache() -> OfferVectorCache:
+    return _offer_vectors
+
+
+def offer_vectors(names: list[str], keys: list, embed_fn, cache: OfferVectorCache = None) -> list:
+    """
+    One vector per offer name, reusing vectors cached for the offer's (store, date).
+
+    Args:
+        names (List[str]): Translated offer names.
+        keys (List[Optional[Tuple[str, str]]]): (store, date) per name, or None to skip the cache.
+        embed_fn (Callable[[List[str]], List[np.ndarray]]): Embeds the names that are not cached, in one call.
+        cache (OfferVectorCache, optional): Defaults to the shared cache.
+
+    Returns:
+        List[np.ndarray]: float32 vectors in the order of `names`.
+    """
+    cache = cache or _offer_vectors
+    vectors, by_key, unique = _lookup_offers(names, keys, cache)
+    if unique:
+        _store_offers(names, vectors, by_key, unique, embed_fn(unique), cache)
+    return vectors
+
+
+async def offer_vectors_async(names: list[str], keys: list, embed_fn, cache: OfferVectorCache = None) -> list:
+    """offer_vectors with an async `embed_fn`"""
+    cache = cache or _offer_vectors
+    vectors, by_key, unique = _lookup_offers(names, keys, cache)
+    if unique:
+        _store_offers(names, vectors, by_key, unique, await embed_fn(unique), cache)
+    return vectors
+
+
+def _lookup_offers(names, keys, cache):
+    """(vectors with None for misses, positions by (store, date), names still to embed)"""
+    keys = keys or [None] * len(names)
+    vectors = [None] * len(names)
+    by_key = {}
+    for i, (name, key) in enumerate(zip(names, keys)):
+        by_key.setdefault(key, []).append(i)
+    for key, positions in by_key.items():
+        if key is None:
+            continue
+        found = cache.get_many(key, [names[i] for i in positions])
+        for i in positions:
+            vectors[i] = found.get(names[i])
+    unique = list(dict.fromkeys(names[i] for i, v in enumerate(vectors) if v is None))
+    return vectors, by_key, unique
+
+
+def _store_offers(names, vectors, by_key, unique, embedded, cache):
+    """Fill the misses in `vectors` and cache them under their (store, date)"""
+    embedded = dict(zip(unique, (np.asarray(v, dtype=np.float32) for v in embedded)))
+    missing = {i for i, v in enumerate(vectors) if v is None}
+    for i in missing:
+        vectors[i] = embedded[names[i]]
+    for key, positions in by_key.items():
+        if key is not None:
+            cache.put_many(key, {names[i]: vectors[i] for i in positions if i in missing})
+
+
+def group_vectors(vectors: list, group_size: int = OFFER_GROUP_SIZE) -> list:
+    """Average consecutive offer vectors into groups of `group_size`, renormalized for cosine search"""
+    if group_size <= 1:
+        return vectors
+    groups = []
+    for i in range(0, len(vectors), group_size):
+        mean = np.mean(np.stack(vectors[i:i + group_size]), axis=0)
+        norm = np.linalg.norm(mean)
+        groups.append(mean / norm if norm else mean)
+    return groups
+
+
+def rrf_fuse(result_lists, k: int = RRF_K, weights: list = None) -> list:
+    """
+    Merge ranked hit lists by reciprocal-rank fusion.
+
+    Each hit scores sum(weight / (k + rank)) over the lists it appears in,
+    so recipes that match many offers rise above ones that match a single
+    offer very closely.
+
+    Returns:
+        List[Tuple[hit, float]]: First-seen hit per point ID with its fused score, best first.
+    """
+    scores = {}
+    hits = {}
+    weights = weights or [1.0] * len(result_lists)
+    for results, weight in zip(result_lists, weights):
+        for rank, hit in enumerate(results, start=1):
+            scores[hit.id] = scores.get(hit.id, 0.0) + weight / (k + rank)
+            hits.setdefault(hit.id, hit)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [(hits[pid], scores[pid]) for pid in ranked]
+
+
+def coverage_rerank(ranked: list, index, offers: list[str], pantry: list[str] = None, weight: float = COVERAGE_WEIGHT):
+    """
+    Re-rank fused hits by how much of each recipe the pantry and the offers cover.
+
+    Fused scores are scaled to [0, 1] by the best candidate and blended with
+    the combined coverage from `IngredientIndex.coverage`:
+    (1 - weight) * relevance + weight * coverage.
+
+    Returns:
+        Tuple[List[Tuple[hit, float]], Dict]: Hits with their blended score, best first,
+        and point ID -> (pantry, offer, combined) coverage.
+    """
+    if not ranked:
+        return ranked, {}
+    coverage = index.coverage([hit.id for hit, _ in ranked], offers, pantry)
+    relevance = np.asarray([score for _, score in ranked], dtype=np.float32)
+    relevance /= max(float(relevance.max()), 1e-12)
+    blended = (1 - weight) * relevance + weight * coverage[:, 2]
+    order = np.argsort(-blended, kind="stable")
+    reranked = [(ranked[i][0], float(blended[i])) for i in order]
+    return reranked, {hit.id: tuple(float(c) for c in row) for (hit, _), row in zip(ranked, coverage)}
+
+
+def _results_size(results: list) -> int:
+    """Approximate bytes held by a list of recipe dicts (text dominates)"""
+    size = 64
+    for r in results:
+        size += 256 + len(r.get("title") or "") + len(r.get("instructions") or "")
+        size += sum(len(i) + 56 for i in r.get("ingredients") or [])
+    return size
+
+
+class RetrievalCache:
+    """
+    LRU cache with a TTL for recipe search candidates, bounded by approximate memory.
+
+    Keyed by a hash of the offer set (names with their store and offer date),
+    the diet and top_k, so users with the same stores and diet share candidates
+    until the offers change. Pantry-dependent re-ranking happens after lookup.
+    """
+
+    def __init__(self, max_mb: float = RETRIEVAL_CACHE_MB, ttl: float = RETRIEVAL_CACHE_TTL):
+        self._cache = TTLCache(maxsize=int(max_mb * 1024 * 1024), ttl=ttl, getsizeof=_results_size)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(item_list: list[str], diet: str, top_k: int, offer_keys: list = None, extra=None) -> str:
+        offer_keys = offer_keys or [None] * len(item_list)
+        payload = json.dumps([list(item_list), [list(k) if k else None for k in offer_keys], diet, top_k, OFFER_GROUP_SIZE, extra])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            results = self._cache.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(results)
+
+    def put(self, key: str, results: list):
+        if _results_size(results) > self._cache.maxsize:
+            return
+        with self._lock:
+            self._cache[key] = list(results)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._cache),
+                "bytes": self._cache.currsize,
+            }
+
+
+_retrieval_cache = RetrievalCache()
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    return _retrieval_cache
+
+
+class LexicalHit:
+    """A hit from the ingredient index or the retrieval cache; the payload is fetched only if the hit is used"""
+
+    __slots__ = ("id", "score", "payload")
+
+    def __init__(self, point_id, score: float):
+        self.id = point_id
+        self.score = score
+        self.payload = None
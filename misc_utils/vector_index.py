@@ -0,0 +1,277 @@
+import os
+import json
+import uuid
+import shutil
+import argparse
+import threading
+
+import numpy as np
+
+from .embeddings import EMBED_MODEL, EMBED_DIM
+
+# Base project directory (one level up from misc_utils)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECIPE_MATRIX_DIR = os.getenv("RECIPE_MATRIX_DIR", os.path.join(BASE_DIR, "recipe_data", "recipe_matrix"))
+
+DIETS = ["vegan", "vegetarian", "nonveg"]
+# Diet code for recipes without a known label
+UNKNOWN_DIET = 255
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+class MatrixHit:
+    """One search result; mirrors the id/score/payload of a Qdrant ScoredPoint"""
+
+    __slots__ = ("row", "score", "_matrix", "_payload")
+
+    def __init__(self, row: int, score: float, matrix):
+        self.row = row
+        self.score = score
+        self._matrix = matrix
+        self._payload = None
+
+    @property
+    def id(self):
+        return self._matrix.point_id(self.row)
+
+    @property
+    def payload(self) -> dict:
+        # Only results that are actually used get their payload read from disk, once
+        if self._payload is None:
+            self._payload = self._matrix.payload(self.row)
+        return self._payload
+
+
+class RecipeMatrix:
+    """
+    Brute-force recipe vector index in a directory of flat files.
+
+    Layout:
+        meta.json      model name, dimension, row count and diet labels
+        vectors.f32    L2-normalized float32 matrix (count x dim), memory-mapped
+        diet.u8        one diet code per row
+        payloads.jsonl one JSON payload per row
+        offsets.i64    byte offset of each payload line
+        ids.u128       recipe point ID (UUID bytes) per row, optional
+
+    Search is one matrix product per batch of queries, a diet mask and
+    `argpartition` for the top k. Files are opened read-only, so any number
+    of processes can search the same index, and pages are shared through
+    the OS page cache.
+    """
+
+    def __init__(self, directory: str = RECIPE_MATRIX_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["model"] != EMBED_MODEL or meta["dim"] != EMBED_DIM:
+            raise ValueError(
+                f"Recipe matrix at {directory} holds {meta['model']} ({meta['dim']}-dim) vectors, "
+                f"not {EMBED_MODEL} ({EMBED_DIM}-dim); rebuild it"
+            )
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.diets = meta["diets"]
+        shape = (self.count, self.dim)
+        self.vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r", shape=shape)
+        self.diet = np.fromfile(os.path.join(directory, "diet.u8"), dtype=np.uint8)
+        self.offsets = np.fromfile(os.path.join(directory, "offsets.i64"), dtype=np.int64)
+        ids_path = os.path.join(directory, "ids.u128")
+        self.ids = np.fromfile(ids_path, dtype=np.uint8).reshape(-1, 16) if os.path.exists(ids_path) else None
+        self._rows = None
+        self._payloads = open(os.path.join(directory, "payloads.jsonl"), "rb")
+        self._payload_lock = threading.Lock()
+        # Rows excluded by each diet filter, computed once
+        self._excluded = {d: self.diet != code for code, d in enumerate(self.diets)}
+
+    def __len__(self):
+        return self.count
+
+    def point_id(self, row: int):
+        """Recipe point ID of a row (the row number if the matrix has no IDs)"""
+        if self.ids is None:
+            return row
+        return str(uuid.UUID(bytes=self.ids[row].tobytes()))
+
+    def rows_for(self, point_ids) -> np.ndarray:
+        """Rows holding the given point IDs (unknown IDs are skipped)"""
+        if self.ids is None:
+            return np.asarray([i for i in point_ids if isinstance(i, int) and 0 <= i < self.count], dtype=np.int64)
+        if self._rows is None:
+            # Built on first use: only ID-restricted searches need it
+            self._rows = {self.ids[row].tobytes(): row for row in range(self.count)}
+        rows = (self._rows.get(uuid.UUID(str(pid)).bytes) for pid in point_ids)
+        return np.asarray([r for r in rows if r is not None], dtype=np.int64)
+
+    def payload(self, row: int) -> dict:
+        with self._payload_lock:
+            self._payloads.seek(int(self.offsets[row]))
+            return json.loads(self._payloads.readline())
+
+    def search_batch(self, queries, diet: str = None, limit: int = 10, point_ids=None) -> list:
+        """
+        Top `limit` rows by cosine similarity for each query.
+
+        Args:
+            queries (Sequence[np.ndarray]): Query vectors (need not be normalized).
+            diet (str, optional): Only return rows with this diet label.
+            limit (int, optional): Results per query.
+            point_ids (Iterable, optional): Only score these recipes (e.g. lexical candidates).
+
+        Returns:
+            List[List[MatrixHit]]: Best first, one list per query.
+        """
+        if not len(queries) or not self.count:
+            return [[] for _ in queries]
+        q = np.asarray(queries, dtype=np.float32).reshape(len(queries), self.dim)
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        if point_ids is not None:
+            rows = self.rows_for(point_ids)
+            if diet:
+                excluded = self._excluded.get(diet)
+                rows = rows[~excluded[rows]] if excluded is not None else rows[:0]
+            # Only the candidate rows are read from the matrix
+            scores = self.vectors[rows] @ q.T if len(rows) else np.empty((0, len(q)), np.float32)
+            available = len(rows)
+        else:
+            rows = None
+            # (count x dim) @ (dim x queries): one pass over the matrix for the whole batch
+            scores = self.vectors @ q.T
+            if diet:
+                excluded = self._excluded.get(diet)
+                if excluded is None:
+                    return [[] for _ in queries]
+                scores[excluded] = -np.inf
+                available = self.count - int(excluded.sum())
+            else:
+                available = self.count
+
+        k = min(limit, available)
+        if k <= 0:
+            return [[] for _ in queries]
+        top = np.argpartition(-scores, k - 1, axis=0)[:k]
+        results = []
+        for j in range(q.shape[0]):
+            idx = top[:, j]
+            idx = idx[np.argsort(-scores[idx, j], kind="stable")]
+            matrix_rows = idx if rows is None else rows[idx]
+            results.append([MatrixHit(int(r), float(scores[i, j]), self) for r, i in zip(matrix_rows, idx)])
+        return results
+
+    def close(self):
+        self._payloads.close()
+
+
+class RecipeMatrixWriter:
+    """Builds a RecipeMatrix directory; files are swapped in atomically by `close`"""
+
+    def __init__(self, directory: str = RECIPE_MATRIX_DIR):
+        self.directory = directory
+        self.tmp_dir = f"{directory}.tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._vectors = open(os.path.join(self.tmp_dir, "vectors.f32"), "wb")
+        self._diet = open(os.path.join(self.tmp_dir, "diet.u8"), "wb")
+        self._offsets = open(os.path.join(self.tmp_dir, "offsets.i64"), "wb")
+        self._payloads = open(os.path.join(self.tmp_dir, "payloads.jsonl"), "wb")
+        self._ids = open(os.path.join(self.tmp_dir, "ids.u128"), "wb")
+        self._with_ids = True
+        self.count = 0
+
+    def add(self, vectors, payloads: list[dict], point_ids: list = None):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(payloads), EMBED_DIM)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self._vectors.write(vectors.tobytes())
+        codes = [DIETS.index(p.get("diet")) if p.get("diet") in DIETS else UNKNOWN_DIET for p in payloads]
+        self._diet.write(np.asarray(codes, dtype=np.uint8).tobytes())
+        offsets = []
+        for payload in payloads:
+            offsets.append(self._payloads.tell())
+            self._payloads.write(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+            self._payloads.write(b"\n")
+        self._offsets.write(np.asarray(offsets, dtype=np.int64).tobytes())
+        if point_ids is not None and self._with_ids:
+            try:
+                self._ids.write(b"".join(uuid.UUID(str(pid)).bytes for pid in point_ids))
+            except ValueError:
+                # Integer point IDs (e.g. a synthetic collection): rows stand in for IDs
+                self._with_ids = False
+        self.count += len(payloads)
+
+    def close(self, completed=True):
+        for f in (self._vectors, self._diet, self._offsets, self._payloads, self._ids):
+            f.close()
+        ids_path = os.path.join(self.tmp_dir, "ids.u128")
+        if not self._with_ids or os.path.getsize(ids_path) != self.count * 16:
+            # IDs were not given for every row
+            os.remove(ids_path)
+        if not completed:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+            return
+        with open(os.path.join(self.tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"model": EMBED_MODEL, "dim": EMBED_DIM, "count": self.count, "diets": DIETS}, f)
+        old_dir = f"{self.directory}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(self.directory):
+            os.replace(self.directory, old_dir)
+        os.replace(self.tmp_dir, self.directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        print(f"Wrote {self.count} recipes to the recipe matrix at {self.directory}")
+
+
+def get_recipe_matrix(directory: str = RECIPE_MATRIX_DIR) -> RecipeMatrix:
+    """Return the shared RecipeMatrix for a directory"""
+    directory = os.path.abspath(directory)
+    with _matrices_lock:
+        if directory not in _matrices:
+            _matrices[directory] = RecipeMatrix(directory)
+        return _matrices[directory]
+
+
+def export_from_qdrant(client, collection: str, directory: str = RECIPE_MATRIX_DIR, batch_size: int = 2048):
+    """Copy the vectors and payloads of an existing Qdrant collection into a RecipeMatrix"""
+    writer = RecipeMatrixWriter(directory)
+    completed = False
+    try:
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                writer.add([p.vector for p in points], [p.payload for p in points], [p.id for p in points])
+            if offset is None:
+                break
+        completed = True
+    finally:
+        writer.close(completed)
+
+
+def main():
+    from qdrant_client import QdrantClient
+    from .recipe_processing import QDRANT_COLLECTION
+
+    parser = argparse.ArgumentParser(description="Build the NumPy recipe matrix from a Qdrant collection")
+    parser.add_argument("--qdrant-path", type=str, help="Local Qdrant path to export from")
+    parser.add_argument("--qdrant-url", type=str, help="Qdrant server URL to export from")
+    parser.add_argument("--qdrant-key", type=str, help="Qdrant API key (for cloud)")
+    parser.add_argument("--out", type=str, default=RECIPE_MATRIX_DIR, help="Recipe matrix directory")
+    args = parser.parse_args()
+
+    if args.qdrant_path:
+        client = QdrantClient(path=args.qdrant_path)
+    elif args.qdrant_url:
+        client = QdrantClient(url=args.qdrant_url, api_key=args.qdrant_key)
+    else:
+        parser.error("pass --qdrant-path or --qdrant-url")
+    export_from_qdrant(client, QDRANT_COLLECTION, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
-from .scrapers import scrape_store, maps
+from .scrapers import scrape_store, scrape_stores, maps
+from .offer_store import get_offer_store
 
 __all__ = ['scrape_store',
+           'scrape_stores',
+           'get_offer_store',
            'maps']
-
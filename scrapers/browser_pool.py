@@ -0,0 +1,122 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.firefox.options import Options
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+PAGE_LOAD_TIMEOUT = 30
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class BrowserPool:
+    """
+    Long-lived pool of headless Firefox drivers.
+
+    Drivers are started lazily up to `size` and handed out with `borrow()`.
+    A driver that raised a WebDriverException is quit instead of returned,
+    so the next borrower gets a fresh one.
+    """
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, headless: bool = True):
+        self.size = size
+        self.headless = headless
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _new_driver(self):
+        options = Options()
+        if self.headless:
+            options.add_argument("-headless")
+        options.add_argument("--width=1920")
+        options.add_argument("--height=1080")
+        driver = webdriver.Firefox(options=options)
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        return driver
+
+    def acquire(self, timeout: float = None):
+        """Take an idle driver, start a new one if below size, or wait for one"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._new_driver()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+            # Wait briefly, then re-check in case a broken driver freed a slot
+            wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+            if wait <= 0:
+                raise TimeoutError("No browser available in pool")
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    def release(self, driver, broken: bool = False):
+        if broken or self._closed:
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def borrow(self, timeout: float = None):
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        except WebDriverException:
+            self.release(driver, broken=True)
+            raise
+        except BaseException:
+            self.release(driver)
+            raise
+        else:
+            self.release(driver)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+def get_pool() -> BrowserPool:
+    """Return the process-wide browser pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+OFFER_DB_NAME = "offers.sqlite3"
+
+# Item fields as returned by the store parsers, in order
+ITEM_FIELDS = [
+    "name",
+    "name_translated",
+    "extra_info",
+    "promotion",
+    "discounted_price",
+    "original_price",
+    "href",
+]
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def product_key(item: dict) -> str:
+    """
+    Stable per-store product identifier: product link, name and extra info.
+
+    The link alone is not enough: PLUS gives every offer in a row the
+    row's first link, and DekaMarkt has no links at all.
+    """
+    href = item.get("href") or ""
+    name = (item.get("name") or "").strip().lower()
+    extra = (item.get("extra_info") or "").strip().lower()
+    return f"{href}|{name}|{extra}"
+
+
+def day_keys(items: list[dict]) -> list[str]:
+    """product_key per item; repeats within a day (the same product in several categories) get #2, #3, ..."""
+    seen = {}
+    keys = []
+    for item in items:
+        key = product_key(item)
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+
+class OfferStore:
+    """
+    Append-only history of scraped offers in SQLite, keyed by (store, date, product).
+
+    Each scrape writes one store/day; earlier days are never rewritten, so the
+    table doubles as a price history.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            # WAL lets the bot read while the prewarm job writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS offers ("
+                "store TEXT NOT NULL, "
+                "date TEXT NOT NULL, "
+                "product TEXT NOT NULL, "
+                "position INTEGER NOT NULL, "
+                "name TEXT, "
+                "name_translated TEXT, "
+                "extra_info TEXT, "
+                "promotion TEXT, "
+                "discounted_price TEXT, "
+                "original_price TEXT, "
+                "href TEXT, "
+                "scraped_at TEXT NOT NULL, "
+                "PRIMARY KEY (store, date, product))"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS offers_by_product ON offers (store, product, date)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS offers_by_name ON offers (name, date)"
+            )
+
+    def save_day(self, store: str, date: str, items: list[dict]):
+        """Store one day's offers for a store, replacing only that store/day"""
+        scraped_at = datetime.now().isoformat(timespec="seconds")
+        rows = [
+            (store, date, key, position, *(item.get(f) for f in ITEM_FIELDS), scraped_at)
+            for position, (key, item) in enumerate(zip(day_keys(items), items))
+        ]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM offers WHERE store = ? AND date = ?", (store, date))
+            # Every parsed offer is stored, so a key collision is an error rather than a lost row
+            self._conn.executemany(
+                f"INSERT INTO offers (store, date, product, position, {', '.join(ITEM_FIELDS)}, scraped_at) "
+                f"VALUES ({', '.join('?' * (len(ITEM_FIELDS) + 5))})",
+                rows,
+            )
+
+    def load_day(self, store: str, date: str) -> list[dict]:
+        """Offers for one store and day in scrape order (empty if none)"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(ITEM_FIELDS)} FROM offers "
+                f"WHERE store = ? AND date = ? ORDER BY position",
+                (store, date),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def latest_date(self, store: str):
+        """Most recent day with offers for a store, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(date) FROM offers WHERE store = ?", (store,)
+            ).fetchone()
+        return row[0]
+
+    def scraped_at(self, store: str, date: str):
+        """When a store/day was scraped, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(scraped_at) FROM offers WHERE store = ? AND date = ?", (store, date)
+            ).fetchone()
+        return datetime.fromisoformat(row[0]) if row[0] else None
+
+    def price_history(self, store: str, product: str = None, name: str = None, since: str = None):
+        """
+        Price over time for one product, matched by product key or Dutch name.
+
+        Returns:
+            List[Dict[str, Any]]: date, promotion, discounted_price and original_price per day.
+        """
+        if product is None and name is None:
+            raise ValueError("price_history needs a product key or a name")
+        column, value = ("product", product) if product is not None else ("name", name)
+        query = (
+            f"SELECT date, promotion, discounted_price, original_price FROM offers "
+            f"WHERE store = ? AND {column} = ?"
+        )
+        params = [store, value]
+        if since:
+            query += " AND date >= ?"
+            params.append(since)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY date", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def was_on_offer(self, name: str, start: str, end: str, store: str = None) -> bool:
+        """Whether a product (Dutch name) was on offer between two dates, inclusive"""
+        query = "SELECT 1 FROM offers WHERE name = ? AND date BETWEEN ? AND ?"
+        params = [name, start, end]
+        if store:
+            query += " AND store = ?"
+            params.append(store)
+        with self._lock:
+            return self._conn.execute(query + " LIMIT 1", params).fetchone() is not None
+
+
+def get_offer_store(out_dir: str = "data") -> OfferStore:
+    """Return the shared OfferStore for a data directory"""
+    path = os.path.abspath(os.path.join(out_dir, OFFER_DB_NAME))
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = OfferStore(path)
+        return _stores[path]
@@ -0,0 +1,103 @@
+import os
+import time
+import random
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from .browser_pool import BROWSER_POOL_SIZE
+from .offer_store import get_offer_store
+from .scrapers import url_maps, scrape_store
+
+# Weekly offer rollover (Monday = 0) and the time to scrape after it
+ROLLOVER_WEEKDAYS = [int(d) for d in os.getenv("PREWARM_WEEKDAYS", "0").split(",") if d.strip()]
+ROLLOVER_HOUR = int(os.getenv("PREWARM_HOUR", "6"))
+ROLLOVER_MINUTE = int(os.getenv("PREWARM_MINUTE", "15"))
+
+# Retry with exponential backoff (plus jitter) per store
+MAX_ATTEMPTS = int(os.getenv("PREWARM_ATTEMPTS", "5"))
+BACKOFF_BASE = 60  # seconds
+BACKOFF_MAX = 30 * 60
+
+
+def last_rollover(now: datetime.datetime = None) -> datetime.datetime:
+    """Most recent scheduled rollover at or before `now`"""
+    now = now or datetime.datetime.now()
+    for days_back in range(8):
+        day = now - datetime.timedelta(days=days_back)
+        run_at = day.replace(hour=ROLLOVER_HOUR, minute=ROLLOVER_MINUTE, second=0, microsecond=0)
+        if day.weekday() in ROLLOVER_WEEKDAYS and run_at <= now:
+            return run_at
+    return now - datetime.timedelta(days=7)
+
+
+def is_stale(store: str, out_dir="data") -> bool:
+    """True when the store has no cached offers from after the last rollover"""
+    offer_store = get_offer_store(out_dir)
+    date = offer_store.latest_date(store)
+    if not date:
+        return True
+    return offer_store.scraped_at(store, date) < last_rollover()
+
+
+def prewarm_store(store: str, out_dir="data", attempts: int = MAX_ATTEMPTS) -> bool:
+    """Scrape, translate and cache one store, retrying with backoff. Returns success"""
+    for attempt in range(1, attempts + 1):
+        try:
+            date, items = scrape_store(store, out_dir, force=True)
+            if items:
+                print(f"[PREWARM] {store}: cached {len(items)} offers for {date}")
+                return True
+            print(f"[PREWARM] {store}: no offers parsed (attempt {attempt}/{attempts})")
+        except Exception as e:
+            print(f"[PREWARM] {store}: failed (attempt {attempt}/{attempts}): {e}")
+
+        if attempt < attempts:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+            delay *= random.uniform(0.8, 1.2)
+            print(f"[PREWARM] {store}: retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+    print(f"[PREWARM] {store}: giving up after {attempts} attempts, keeping previous cache")
+    return False
+
+
+def run_prewarm(stores=None, out_dir="data", only_stale=False):
+    """Pre-warm the offer cache for the given stores (all of url_maps by default)"""
+    stores = list(stores or url_maps)
+    if only_stale:
+        stores = [s for s in stores if is_stale(s, out_dir)]
+    if not stores:
+        print("[PREWARM] Offer cache is up to date.")
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max(1, BROWSER_POOL_SIZE)) as executor:
+        results = dict(zip(stores, executor.map(lambda s: prewarm_store(s, out_dir), stores)))
+    return results
+
+
+def main():
+    print("[PREWARM] Starting offer pre-warm scheduler...")
+
+    # Fill anything missing or older than the last rollover right away
+    print("[PREWARM] Initial run on startup...")
+    run_prewarm(only_stale=True)
+
+    while True:
+        now = datetime.datetime.now()
+
+        if now.minute == ROLLOVER_MINUTE:
+            if now.weekday() in ROLLOVER_WEEKDAYS and now.hour == ROLLOVER_HOUR:
+                print(f"[PREWARM] Scheduled run triggered at {now.strftime('%a %H:%M')}...")
+                run_prewarm()
+            else:
+                # Hourly catch-up for stores that exhausted their retries
+                run_prewarm(only_stale=True)
+            # sleep a minute to avoid multiple runs within the same hour:minute
+            time.sleep(60)
+
+        # Check every 30 seconds
+        time.sleep(30)
+
+
+if __name__ == "__main__":
+    main()
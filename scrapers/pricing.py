@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Number of offers passed from $plan into recipe retrieval
+TOP_OFFERS = int(os.getenv("PLAN_TOP_OFFERS", "40"))
+
+
+def to_euros(prices: pd.Series) -> pd.Series:
+    """
+    Parse raw price strings into floats (euros), vectorized.
+
+    Handles "2.49", "2,49", "€ 2,49" and the integer/decimal pairs the Plus
+    and DekaMarkt parsers concatenate ("2." + "49"). A bare run of three or
+    more digits ("249") is read as cents. Anything unparseable becomes NaN.
+    """
+    text = (
+        prices.astype("string")
+        .str.replace(r"[^\d,.]", "", regex=True)
+        .str.replace(",", ".", regex=False)
+        .str.strip(".")
+    )
+    values = pd.to_numeric(text, errors="coerce")
+    cents = text.str.fullmatch(r"\d{3,}").fillna(False).to_numpy(dtype=bool)
+    return values.where(~cents, values / 100)
+
+
+def promotion_discount(promotions: pd.Series) -> pd.Series:
+    """
+    Discount fraction implied by a promotion label, vectorized.
+
+    Understands "25% korting", "1+1 gratis" / "2+1 gratis" and
+    "2e halve prijs". Other labels (e.g. "2 voor 3.00") give NaN because they
+    need the unit price, which `normalize_offers` handles.
+    """
+    text = promotions.astype("string").str.lower()
+
+    pct = pd.to_numeric(text.str.extract(r"(\d+(?:[.,]\d+)?)\s*%", expand=False).str.replace(",", "."), errors="coerce") / 100
+
+    free = text.str.extract(r"(\d+)\s*\+\s*(\d+)\s*gratis")
+    buy = pd.to_numeric(free[0], errors="coerce")
+    extra = pd.to_numeric(free[1], errors="coerce")
+    free_pct = extra / (buy + extra)
+
+    half = text.str.contains(r"2e\s+halve\s+prijs", regex=True).fillna(False)
+    half_pct = pd.Series(np.where(half, 0.25, np.nan), index=text.index)
+
+    return pct.fillna(free_pct).fillna(half_pct)
+
+
+def normalize_offers(items: list[dict]) -> pd.DataFrame:
+    """
+    Turn scraped offers into a DataFrame with typed prices and discounts.
+
+    Adds:
+        discounted_eur (float): Offer price in euros.
+        original_eur (float): Regular price in euros.
+        discount_pct (float): Fraction off the regular price (0.25 = 25%).
+        savings_eur (float): Euros saved on one unit at the offer price.
+
+    Columns are NaN where the scraped data does not allow a value.
+    """
+    df = pd.DataFrame(items)
+    if df.empty:
+        return df
+    for column in ("discounted_price", "original_price", "promotion"):
+        if column not in df:
+            df[column] = None
+
+    discounted = to_euros(df["discounted_price"])
+    original = to_euros(df["original_price"])
+
+    # "N voor X": bundle price X for N units
+    bundle = df["promotion"].astype("string").str.lower().str.extract(r"(\d+)\s*voor\s*(?:€\s*)?(\d+(?:[.,]\d+)?)")
+    bundle_units = pd.to_numeric(bundle[0], errors="coerce")
+    bundle_price = pd.to_numeric(bundle[1].str.replace(",", "."), errors="coerce")
+    discounted = discounted.fillna(bundle_price / bundle_units)
+
+    price_pct = (original - discounted) / original
+    price_pct = price_pct.where((original > 0) & (discounted <= original))
+    discount_pct = price_pct.fillna(promotion_discount(df["promotion"])).clip(0, 1)
+
+    # Recover the missing side of the price from the discount where possible
+    original = original.fillna(discounted / (1 - discount_pct.where(discount_pct < 1)))
+    discounted = discounted.fillna(original * (1 - discount_pct))
+
+    df["discounted_eur"] = discounted.round(2)
+    df["original_eur"] = original.round(2)
+    df["discount_pct"] = discount_pct
+    # An "original" at or below the offer price is a scrape error, not a (negative) saving
+    df["savings_eur"] = (original - discounted).where(discounted < original).round(2)
+    return df
+
+
+def top_offers(items: list[dict], n: int = TOP_OFFERS) -> list[dict]:
+    """
+    Rank offers by euros saved (then by discount %) and keep the best `n`.
+
+    Items without a translated name are dropped, and each translated name is
+    kept once so the retrieval query is not padded with duplicates.
+    """
+    df = normalize_offers(items)
+    if df.empty or "name_translated" not in df:
+        return []
+    df = df[df["name_translated"].notna()]
+    df = df.sort_values(["savings_eur", "discount_pct"], ascending=False, na_position="last", kind="stable")
+    df = df.drop_duplicates("name_translated").head(n)
+    # Back to plain Python values (None for NaN) for callers working with dicts
+    return df.astype(object).where(df.notna(), None).to_dict("records")
@@ -1,19 +1,19 @@
-import time
-import random
 import os
-import json
+import re
+import asyncio
+import threading
 from datetime import datetime
 
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.firefox.options import Options
+import soupsieve as sv
+from bs4 import BeautifulSoup, SoupStrainer
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 
-from transformers import MarianMTModel, MarianTokenizer
-
-# Load translation model once
-model_name = "Helsinki-NLP/opus-mt-nl-en"
-tokenizer = MarianTokenizer.from_pretrained(model_name)
-model = MarianMTModel.from_pretrained(model_name)
+from .browser_pool import get_pool
+from .offer_store import get_offer_store
+from .translation import translate_items
 
 maps={
     "plus":"plus",
@@ -27,88 +27,140 @@ url_maps = {
     "dm": "https://www.dekamarkt.nl/aanbiedingen",
 }
 
-def get_html(url="https://www.plus.nl/aanbiedingen"):
+# Selectors (taken from the parsers below) that mean a store page has its offers
+ready_selectors = {
+    "plus": "div.list.list-group.promotions-category-list",
+    "ah": 'a[data-testhook="promotion-card"]',
+    "dm": "section.offers__department",
+}
+
+READY_TIMEOUT = 20
+
+# Per-store wall-clock budget for a scrape requested by the bot
+SCRAPE_TIMEOUT = int(os.getenv("SCRAPE_TIMEOUT", "180"))
+# Whether the bot may scrape when no cached offers exist (normally the prewarm job fills the cache)
+SCRAPE_ON_MISS = os.getenv("PLAN_SCRAPE_ON_MISS", "0").lower() in ("1", "true", "yes")
+
+# One lock per store so threads never scrape or rewrite the same store at once
+_store_locks = {}
+# In-flight async scrapes keyed by (store, date)
+_inflight = {}
+
+def get_html(url="https://www.plus.nl/aanbiedingen", ready_selector=None, driver=None, timeout=READY_TIMEOUT):
     """
-    Get HTML content from the given URL using Selenium with Firefox.
+    Get HTML content from the given URL using a pooled headless Firefox.
 
-    This function sets up a Firefox WebDriver, navigates to the specified URL,
-    waits for the page to load, and returns the HTML content.
+    This function navigates to the specified URL, waits until the store's
+    offer markup is present, and returns the HTML content.
 
     Args:
         url (str, optional): URL of page to be fetched. Defaults to "https://www.plus.nl/aanbiedingen".
+        ready_selector (str, optional): CSS selector that marks the page as loaded.
+        driver (WebDriver, optional): Borrowed driver to use. Borrows one from the pool if omitted.
+        timeout (int, optional): Max seconds to wait for `ready_selector`.
 
     Returns:
         str: The HTML content of the page.
     """
-    # Setup Firefox options
-    options = Options()
-    options.add_argument("--start-maximized")  # Normal browser mode
-
-    driver = webdriver.Firefox(options=options)
-    driver.set_page_load_timeout(30)
+    if driver is None:
+        with get_pool().borrow() as pooled:
+            return get_html(url, ready_selector, pooled, timeout)
 
     # Navigate to aanbiedingen page
     driver.get(url)
 
-    # Wait a bit to let JS load
-    time.sleep(random.uniform(3, 6))
+    # Wait for the offers the parser needs instead of sleeping
+    if ready_selector:
+        try:
+            WebDriverWait(driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector))
+            )
+        except TimeoutException:
+            print(f"Timed out waiting for '{ready_selector}' on {url}")
 
-    # Mimic simple scrolling
-    driver.execute_script("window.scrollTo(0, document.body.scrollHeight/3);")
-    time.sleep(random.uniform(2, 4))
+    # Scroll through once so lazily rendered sections are in the DOM
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
     driver.execute_script("window.scrollTo(0, 0);")
-    time.sleep(random.uniform(1, 2))
-
-    # Get the HTML
-    html = driver.page_source
-    driver.quit()
-    return html
-    
-def save_offers(all_items,out_file):
-    # Save as JSON
-    with open(out_file, "w", encoding="utf-8") as f:
-        json.dump(all_items, f, ensure_ascii=False, indent=2)
-    print(f"Saved {len(all_items)} items to {out_file}")
-    
-
-def translate_name(name: str) -> str:
-    """Translate a single product name from NL -> EN"""
-    if not name:
-        return None
-    inputs = tokenizer([name], return_tensors="pt", padding=True, truncation=True)
-    translated = model.generate(**inputs)
-    return tokenizer.decode(translated[0], skip_special_tokens=True)
+
+    return driver.page_source
 
 # ---------------------
 # Store-specific parsers
 # ---------------------
 
+# Tree builder used for store pages
+PARSER_FEATURES = "lxml"
+
+def _class_strainer(name: str, css_class: str) -> SoupStrainer:
+    # Match the class anywhere in a multi-valued class attribute
+    return SoupStrainer(name, class_=re.compile(rf"(^|\s){re.escape(css_class)}(\s|$)"))
+
+# Only the offer sections of each page are built into the tree
+strainers = {
+    "plus": _class_strainer("div", "promotions-category-list"),
+    "ah": _class_strainer("section", "area-lane_root__If70y"),
+    "dm": _class_strainer("section", "offers__department"),
+}
+
+# CSS selectors are compiled once per store instead of on every select call
+PLUS_SELECTORS = {key: sv.compile(sel) for key, sel in {
+    "main_list": "div.list.list-group.promotions-category-list",
+    "containers": "div[data-container].plp-results-wrapper",
+    "links": "a[data-link]",
+    "items": "div[data-container].list-item-content-center",
+    "name": ".plp-item-name span",
+    "extra_info": ".plp-item-complementary .multiline-truncation-text-1 span.OSFillParent",
+    "promotion": ".promo-offer-label span",
+    "price_int": ".product-header-price-integer span",
+    "price_dec": ".product-header-price-decimals span",
+    "original": ".product-header-price-previous span",
+}.items()}
+
+AH_SELECTORS = {key: sv.compile(sel) for key, sel in {
+    "categories": "section.area-lane_root__If70y",
+    "cards": 'a[data-testhook="promotion-card"]',
+    "name": '[data-testhook="promotion-card-title"] span',
+    "extra_info": '[data-testhook="card-description"] span',
+    "promotion": '[data-testhook="promotion-labels"] div[aria-label]',
+    "price": '[data-testhook="price"]',
+}.items()}
+
+DM_SELECTORS = {key: sv.compile(sel) for key, sel in {
+    "categories": "section.offers__department",
+    "cards": "div.product__card--content",
+    "name": "p.title",
+    "extra_info": "span.addition",
+    "promotion": "span.chip",
+    "price_int": "div.prices__offer span",
+    "price_dec": "div.prices__offer small span",
+    "original": "span.regular.regular-strike",
+}.items()}
+
+def _text(tag):
+    return tag.get_text(strip=True) if tag else None
+
 def parse_plus(soup: BeautifulSoup):
+    sel = PLUS_SELECTORS
     all_items = []
-    main_list = soup.select("div.list.list-group.promotions-category-list")
+    main_list = sel["main_list"].select(soup)
     if not main_list:
         return all_items
-    containers = main_list[0].select("div[data-container].plp-results-wrapper")[1:-3]
+    containers = sel["containers"].select(main_list[0])[1:-3]
     for container in containers:
-        links = container.select("a[data-link]")
+        links = sel["links"].select(container)
         hrefs = [link["href"] for link in links]
-        items = container.select("div[data-container].list-item-content-center")
+        items = sel["items"].select(container)
         for item in items:
-            name_tag = item.select_one('.plp-item-name span')
-            name = name_tag.get_text(strip=True) if name_tag else None
-            translated = translate_name(name)
-            extra_info_tag = item.select_one('.plp-item-complementary .multiline-truncation-text-1 span.OSFillParent')
-            extra_info = extra_info_tag.get_text(strip=True) if extra_info_tag else None
-            promo_tag = item.select_one('.promo-offer-label span')
-            promotion = promo_tag.get_text(strip=True) if promo_tag else None
-            price_int = item.select_one('.product-header-price-integer span')
-            price_dec = item.select_one('.product-header-price-decimals span')
+            name = _text(sel["name"].select_one(item))
+            extra_info = _text(sel["extra_info"].select_one(item))
+            promotion = _text(sel["promotion"].select_one(item))
+            price_int = sel["price_int"].select_one(item)
+            price_dec = sel["price_dec"].select_one(item)
             discounted = f"{price_int.get_text(strip=True)}{price_dec.get_text(strip=True)}" if price_int and price_dec else None
-            original_price_tag = item.select_one('.product-header-price-previous span')
-            original = original_price_tag.get_text(strip=True) if original_price_tag else None
+            original = _text(sel["original"].select_one(item))
             all_items.append({
                 "name": name,
-                "name_translated": translated,
+                "name_translated": None,
                 "extra_info": extra_info,
                 "promotion": promotion,
                 "discounted_price": discounted,
@@ -118,25 +170,23 @@ def parse_plus(soup: BeautifulSoup):
     return all_items
 
 def parse_ah(soup: BeautifulSoup):
+    sel = AH_SELECTORS
     all_items = []
-    categories = soup.select("section.area-lane_root__If70y")
+    categories = sel["categories"].select(soup)
     cutoff = next((i for i, c in enumerate(categories) if c.get("id") == "drogisterij"), len(categories))
     for cat in categories[:cutoff]:
-        for card in cat.select('a[data-testhook="promotion-card"]'):
-            name_tag = card.select_one('[data-testhook="promotion-card-title"] span')
-            name = name_tag.get_text(strip=True) if name_tag else None
-            translated = translate_name(name)
-            extra_info_tag = card.select_one('[data-testhook="card-description"] span')
-            extra_info = extra_info_tag.get_text(strip=True) if extra_info_tag else None
-            promo_tag = card.select_one('[data-testhook="promotion-labels"] div[aria-label]')
+        for card in sel["cards"].select(cat):
+            name = _text(sel["name"].select_one(card))
+            extra_info = _text(sel["extra_info"].select_one(card))
+            promo_tag = sel["promotion"].select_one(card)
             promotion = promo_tag["aria-label"] if promo_tag else None
-            price_container = card.select_one('[data-testhook="price"]')
+            price_container = sel["price"].select_one(card)
             discounted = price_container.get("data-testpricenow") if price_container else None
             original = price_container.get("data-testpricewas") if price_container else None
             href = card.get("href")
             all_items.append({
                 "name": name,
-                "name_translated": translated,
+                "name_translated": None,
                 "extra_info": extra_info,
                 "promotion": promotion,
                 "discounted_price": discounted,
@@ -146,30 +196,24 @@ def parse_ah(soup: BeautifulSoup):
     return all_items
 
 def parse_dm(soup: BeautifulSoup):
+    sel = DM_SELECTORS
     all_items = []
-    categories = soup.select("section.offers__department")
+    categories = sel["categories"].select(soup)
     cutoff = next((i for i, c in enumerate(categories) if "Snoep" in c.get_text()), len(categories))
     for cat in categories[:cutoff]:
         if "Dranken" in cat.get_text():
             continue
-        for card in cat.select("div.product__card--content"):
-            name_tag = card.select_one("p.title")
-            name = name_tag.get_text(strip=True) if name_tag else None
-            translated = translate_name(name)
-            if '/' in translated:
-                translated = translated.split('/')[0].strip()
-            extra_info_tag = card.select_one("span.addition")
-            extra_info = extra_info_tag.get_text(strip=True) if extra_info_tag else None
-            promo_tag = card.select_one("span.chip")
-            promotion = promo_tag.get_text(strip=True) if promo_tag else None
-            price_int = card.select_one("div.prices__offer span")
-            price_dec = card.select_one("div.prices__offer small span")
+        for card in sel["cards"].select(cat):
+            name = _text(sel["name"].select_one(card))
+            extra_info = _text(sel["extra_info"].select_one(card))
+            promotion = _text(sel["promotion"].select_one(card))
+            price_int = sel["price_int"].select_one(card)
+            price_dec = sel["price_dec"].select_one(card)
             discounted = f"{price_int.get_text(strip=True)}{price_dec.get_text(strip=True)}" if price_int and price_dec else None
-            original_price_tag = card.select_one("span.regular.regular-strike")
-            original = original_price_tag.get_text(strip=True) if original_price_tag else None
+            original = _text(sel["original"].select_one(card))
             all_items.append({
                 "name": name,
-                "name_translated": translated,
+                "name_translated": None,
                 "extra_info": extra_info,
                 "promotion": promotion,
                 "discounted_price": discounted,
@@ -184,33 +228,120 @@ parsers = {
     "dm": parse_dm,
 }
 
-def scrape_store(store:str, out_dir="data"):
+def parse_html(store: str, html: str):
+    """Parse a store page with lxml, building only the sections its parser reads"""
+    soup = BeautifulSoup(html, PARSER_FEATURES, parse_only=strainers[store])
+    return parsers[store](soup)
+
+# Store-specific cleanup applied to each translated name
+translation_postprocess = {
+    # Only names with a slash are cut, as the inline translation did
+    "dm": lambda translated: translated.split('/')[0].strip() if '/' in translated else translated,
+}
+
+def load_cached_offers(store: str, out_dir="data"):
+    """Load the most recent stored offers for a store without scraping. Returns (date, items)"""
+    offer_store = get_offer_store(out_dir)
+    date = offer_store.latest_date(store)
+    if not date:
+        return None, None
+    return date, offer_store.load_day(store, date)
+
+def scrape_store(store:str, out_dir="data", force=False):
+    """
+    Return today's offers for a store, scraping them if they are not stored yet.
+
+    Args:
+        store (str): Store key from url_maps.
+        out_dir (str, optional): Directory holding the offer database. Defaults to "data".
+        force (bool, optional): Scrape even if today's offers are already stored.
+
+    Returns:
+        tuple[str, List[dict]]: (offer date, items), or (None, items) if nothing was saved.
+    """
     if store not in url_maps:
         print(f"Store '{store}' not recognized. Available stores: {list(url_maps.keys())}")
-        return None, None, None
-    
-    # Make sure output dir exists
-    os.makedirs(out_dir, exist_ok=True)
+        return None, None
 
-    # Generate today's filename
     today = datetime.now().strftime("%Y-%m-%d")
-    out_file = os.path.join(out_dir, f"{store}_{today}.json")
-    
-    if os.path.exists(out_file):
-        with open(out_file, "r", encoding="utf-8") as f:
-            items = json.load(f)
-        print(f"Loaded existing file: {out_file}")
-        return out_file, items
-    
-    for fname in os.listdir(out_dir):
-        if fname.startswith(f"{store}_") and fname.endswith(".json"):
-            os.remove(os.path.join(out_dir, fname))
-            print(f"Deleted old file: {fname}")
-    
-    html = get_html(url_maps[store])
-    soup = BeautifulSoup(html, "html.parser")
-    items = parsers[store](soup)
-    save_offers(items, out_file)
-    return out_file, items
-    
-    
\ No newline at end of file
+    offer_store = get_offer_store(out_dir)
+
+    with _store_locks.setdefault(store, threading.Lock()):
+        if not force:
+            items = offer_store.load_day(store, today)
+            if items:
+                print(f"Loaded {len(items)} stored offers for {store} on {today}")
+                return today, items
+
+        with get_pool().borrow() as driver:
+            html = get_html(url_maps[store], ready_selectors.get(store), driver=driver)
+        items = parse_html(store, html)
+        hits, total = translate_items(items, translation_postprocess.get(store))
+        hit_rate = hits / total if total else 0.0
+        print(f"{store}: translation cache hits {hits}/{total} ({hit_rate:.0%})")
+        if not items:
+            # Keep whatever was stored before rather than overwriting it with an empty scrape
+            print(f"No offers parsed for {store}, not saving")
+            return None, items
+        offer_store.save_day(store, today, items)
+        print(f"Saved {len(items)} offers for {store} on {today}")
+    return today, items
+
+async def scrape_store_async(store: str, out_dir="data"):
+    """
+    Run scrape_store in a worker thread, sharing one run per (store, date).
+
+    Concurrent callers for the same store on the same day await the scrape
+    that is already running instead of starting another browser session.
+    """
+    key = (store, datetime.now().strftime("%Y-%m-%d"))
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(asyncio.to_thread(scrape_store, store, out_dir))
+        _inflight[key] = task
+
+        def _done(t):
+            if _inflight.get(key) is t:
+                del _inflight[key]
+            # Mark the result as retrieved even if every caller timed out
+            if not t.cancelled():
+                t.exception()
+
+        task.add_done_callback(_done)
+    # Shield so one caller timing out does not cancel the shared scrape
+    return await asyncio.shield(task)
+
+async def scrape_stores(stores: list[str], timeout: float = SCRAPE_TIMEOUT, out_dir="data", scrape_on_miss=SCRAPE_ON_MISS,
+                        with_dates=False):
+    """
+    Fetch offers for several stores concurrently with a per-store timeout.
+
+    Offers are read from the cache filled by `python -m scrapers.prewarm`.
+    A store with nothing cached is only scraped when `scrape_on_miss` is set.
+
+    Args:
+        stores (List[str]): Store keys from url_maps.
+        timeout (float, optional): Seconds to wait for each store. Defaults to SCRAPE_TIMEOUT.
+        out_dir (str, optional): Directory holding the offer database.
+        scrape_on_miss (bool, optional): Scrape stores with no cached offers. Defaults to PLAN_SCRAPE_ON_MISS.
+        with_dates (bool, optional): Return (offer date, items) per store instead of items.
+
+    Returns:
+        Dict[str, Optional[List[dict]]]: Items per store, None if the store failed or timed out.
+    """
+    async def fetch(store):
+        try:
+            date, items = await asyncio.to_thread(load_cached_offers, store, out_dir)
+            if items is None and scrape_on_miss:
+                date, items = await asyncio.wait_for(scrape_store_async(store, out_dir), timeout)
+            elif items is None:
+                print(f"No cached offers for {store}; is the prewarm job running?")
+            return (date, items) if with_dates else items
+        except asyncio.TimeoutError:
+            print(f"Timed out fetching {store} after {timeout}s")
+        except Exception as e:
+            print(f"Error fetching {store}: {e}")
+        return (None, None) if with_dates else None
+
+    results = await asyncio.gather(*(fetch(store) for store in stores))
+    return dict(zip(stores, results))
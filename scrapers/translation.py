@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import threading
+
+# Translation model and cache config
+MODEL_NAME = "Helsinki-NLP/opus-mt-nl-en"
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", "32"))
+TRANSLATION_CACHE_PATH = os.getenv(
+    "TRANSLATION_CACHE_PATH", os.path.join("data", "translations.sqlite3")
+)
+
+# Model is loaded lazily so fully cached scrapes never pay for it
+_tokenizer = None
+_model = None
+_model_lock = threading.Lock()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _load_model():
+    global _tokenizer, _model
+    with _model_lock:
+        if _model is None:
+            from transformers import MarianMTModel, MarianTokenizer
+            print(f"Loading translation model {MODEL_NAME}")
+            _tokenizer = MarianTokenizer.from_pretrained(MODEL_NAME)
+            _model = MarianMTModel.from_pretrained(MODEL_NAME)
+            _model.eval()
+    return _tokenizer, _model
+
+
+class TranslationCache:
+    """SQLite-backed NL -> EN translation cache keyed by the Dutch name."""
+
+    # Stay well below SQLite's host parameter limit
+    _CHUNK = 500
+
+    def __init__(self, path: str = TRANSLATION_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "name TEXT PRIMARY KEY, "
+                "translated TEXT NOT NULL, "
+                "model TEXT NOT NULL)"
+            )
+
+    def get_many(self, names) -> dict:
+        """Return {name: translation} for every name already in the cache"""
+        names = list(names)
+        found = {}
+        with self._lock:
+            for i in range(0, len(names), self._CHUNK):
+                chunk = names[i:i + self._CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT name, translated FROM translations "
+                    f"WHERE model = ? AND name IN ({placeholders})",
+                    [MODEL_NAME, *chunk],
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, translations: dict):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (name, translated, model) VALUES (?, ?, ?)",
+                [(name, text, MODEL_NAME) for name, text in translations.items()],
+            )
+
+
+def get_cache() -> TranslationCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranslationCache()
+    return _cache
+
+
+def _generate(names: list[str], batch_size: int) -> dict:
+    """Run the model over names in padded batches of similar length"""
+    import torch
+
+    tokenizer, model = _load_model()
+    # Sorting by length keeps padding inside each batch small
+    ordered = sorted(names, key=len)
+    out = {}
+    for i in range(0, len(ordered), batch_size):
+        batch = ordered[i:i + batch_size]
+        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True)
+        with torch.no_grad():
+            translated = model.generate(**inputs)
+        decoded = tokenizer.batch_decode(translated, skip_special_tokens=True)
+        out.update(zip(batch, decoded))
+    return out
+
+
+def translate_names(names, batch_size: int = None, cache: TranslationCache = None):
+    """
+    Translate product names from NL -> EN, skipping inference for cached names.
+
+    Args:
+        names (Iterable[str]): Dutch product names. Empty values are ignored.
+        batch_size (int, optional): Names per model.generate call. Defaults to TRANSLATION_BATCH_SIZE.
+        cache (TranslationCache, optional): Cache to use. Defaults to the shared on-disk cache.
+
+    Returns:
+        tuple[dict, int, int]: ({name: translation}, cache hits, unique names).
+    """
+    batch_size = batch_size or TRANSLATION_BATCH_SIZE
+    cache = cache or get_cache()
+    unique = list(dict.fromkeys(n for n in names if n))
+    if not unique:
+        return {}, 0, 0
+
+    translations = cache.get_many(unique)
+    hits = len(translations)
+    missing = [n for n in unique if n not in translations]
+    if missing:
+        fresh = _generate(missing, batch_size)
+        cache.put_many(fresh)
+        translations.update(fresh)
+    return translations, hits, len(unique)
+
+
+def translate_name(name: str) -> str:
+    """Translate a single product name from NL -> EN"""
+    if not name:
+        return None
+    translations, _, _ = translate_names([name])
+    return translations[name]
+
+
+def translate_items(items: list[dict], postprocess=None, batch_size: int = None):
+    """
+    Fill in `name_translated` for scraped items using batched, cached translation.
+
+    Args:
+        items (List[Dict[str, Any]]): Items returned by a store parser.
+        postprocess (Callable[[str], str], optional): Store-specific cleanup of each translation.
+        batch_size (int, optional): Names per model.generate call.
+
+    Returns:
+        tuple[int, int]: (cache hits, unique names translated).
+    """
+    translations, hits, total = translate_names(
+        (item.get("name") for item in items), batch_size=batch_size
+    )
+    for item in items:
+        translated = translations.get(item.get("name"))
+        if translated and postprocess:
+            translated = postprocess(translated)
+        item["name_translated"] = translated
+    return hits, total
@@ -1,30 +1,17 @@
 import time
 import datetime
-from .watchdog import run_sync
-
-# Scheduled times in 24h format
-RUN_HOURS = [9, 14, 20]
+from .watchdog import run_sync, POLL_INTERVAL
 
 def main():
-    print("[LISTENER] Starting Google Sheets scheduler...")
-
-    # Run immediately at startup
-    print("[LISTENER] Initial sync on startup...")
-    run_sync()
+    # The bot trusts a synced pantry for PANTRY_MAX_AGE seconds, so syncs must come more often than that
+    print(f"[LISTENER] Starting Google Sheets sync every {POLL_INTERVAL}s...")
 
     while True:
-        now = datetime.datetime.now()
-        current_hour = now.hour
-        current_minute = now.minute
-
-        if current_hour in RUN_HOURS and current_minute == 0:
-            print(f"[LISTENER] Scheduled sync triggered at {now.strftime('%H:%M')}...")
-            run_sync()
-            # sleep a minute to avoid multiple runs within the same hour:minute
-            time.sleep(60)
-
-        # Check every 30 seconds
-        time.sleep(30)
+        started = time.monotonic()
+        print(f"[LISTENER] Sync triggered at {datetime.datetime.now().strftime('%H:%M')}...")
+        run_sync()
+        # Passes start POLL_INTERVAL apart however long a pass takes
+        time.sleep(max(0.0, POLL_INTERVAL - (time.monotonic() - started)))
 
 if __name__ == "__main__":
     main()
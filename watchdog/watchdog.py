@@ -1,15 +1,19 @@
-
+import os
+import time
 import hashlib
+import argparse
 from misc_utils.google_utils import fetch_sheet_as_df
 from db.sync_utils import (
     get_all_users,
     upsert_inventory,
+    delete_missing_items,
     get_user_sheet_hash,
-    upsert_user_sheet
+    record_sheet_sync
 )
 import pandas as pd
 
-POLL_INTERVAL = 60  # seconds
+# Seconds between sync passes (--loop and `python -m watchdog`); keep the bot's PANTRY_MAX_AGE well above it
+POLL_INTERVAL = int(os.getenv("WATCHDOG_INTERVAL", "900"))
 
 def df_hash(df):
     """Compute a hash of the DataFrame contents"""
@@ -30,27 +34,43 @@ def sync_sheet_for_user(user):
     last_hash = get_user_sheet_hash(user_id)
 
     if last_hash == current_hash:
-        print(f"[SYNC] User {user_id}: no changes detected, skipping.")
+        # Still refresh last_synced: $plan trusts the inventory while it is recent
+        if record_sheet_sync(user_id, sheet_url, current_hash):
+            print(f"[SYNC] User {user_id}: no changes detected, skipping.")
+        else:
+            print(f"[SYNC] User {user_id}: registered a new sheet during the sync, it is synced next pass.")
         return
 
     # Upsert inventory rows
+    item_keys = []
     for _, row in df.iterrows():
         item_key = row.get("item")
         if item_key:
             upsert_inventory(user_id, item_key, row.to_dict())
+            item_keys.append(item_key)
+    # Rows removed from the sheet leave the inventory too
+    delete_missing_items(user_id, item_keys)
 
-    # Update hash in Mongo
-    upsert_user_sheet(user_id, sheet_url, current_hash)
+    # Update hash and sync time in Mongo, unless the user registered another sheet meanwhile
+    if not record_sheet_sync(user_id, sheet_url, current_hash):
+        print(f"[SYNC] User {user_id}: registered a new sheet during the sync, it is synced next pass.")
+        return
     print(f"[SYNC] User {user_id}: {len(df)} records synced.")
 
 def run_sync():
     """Run sync for all users once"""
     users = get_all_users()
     for user in users:
-        sync_sheet_for_user(user)
+        try:
+            sync_sheet_for_user(user)
+        except Exception as e:
+            print(f"[SYNC] User {user.get('user_id')}: sync failed: {e}")
         
 if __name__ == "__main__":
-    users=get_all_users()
-    for user in users:
-        sync_sheet_for_user(user)
-    
+    parser = argparse.ArgumentParser(description="Mirror users' pantry sheets into the inventory collection")
+    parser.add_argument("--loop", action="store_true", help=f"Keep syncing every {POLL_INTERVAL}s")
+    args = parser.parse_args()
+    run_sync()
+    while args.loop:
+        time.sleep(POLL_INTERVAL)
+        run_sync()